@@ -0,0 +1,1039 @@
+from __future__ import annotations
+
+import csv
+import hashlib
+import html
+import json
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+# 技能根目录：scripts/narrative/ 的上两级，references/ 与 scripts/ 均相对它定位。
+SKILL_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# 值为门禁结果的 ASCII 键，供 ndjson 输出稳定引用。
+REQUIRED_FILES = {
+    "00-项目说明.md": "project_brief",
+    "01-总大纲.md": "outline",
+    "02-子大纲.md": "suboutline",
+    "04-设定集.md": "setting",
+    "05-长线伏笔.csv": "foreshadow_csv",
+    "07-当前角色状态.md": "role_state",
+}
+REQUIRED_DIRS = {"正文": "chapters", "风格参考": "style_refs"}
+REQUIRED_COLUMNS = [
+    "id",
+    "主线",
+    "伏笔内容",
+    "首次埋设章节",
+    "计划回收章节",
+    "实际回收章节",
+    "状态",
+    "关联人物",
+    "备注",
+]
+
+DONE_STATUSES = {"已回收"}
+INACTIVE_STATUSES = {"弃用"}
+
+CHAPTER_FILE_RE = re.compile(r"^第(\d{3,})章\.md$")
+CHAPTER_HEADING_RE = re.compile(r"^(?:#{1,6}\s*)?第\s*0*(\d+)\s*章[^\n]*", re.M)
+FORESHADOW_ID_RE = re.compile(r"\bF\d{3}\b")
+ROLE_ACTION_ROW_RE = re.compile(r"\|\s*第\s*0*(\d+)\s*章\s*\|")
+CHAPTER_CELL_RE = re.compile(r"第\s*0*(\d+)\s*章")
+MARKDOWN_HEADING_RE = re.compile(r"^(#{1,6})\s*(.+?)\s*$")
+TABLE_SEPARATOR_RE = re.compile(r"^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?$")
+HEADING_SUFFIX_RE = re.compile(r"[（(][^（）()]*[）)]$")
+ACTOR_COLUMN_RE = re.compile(r"^(.+?)关键动作$")
+READER_ANCHOR_RE = re.compile(r"^-\s*当前章节[：:]\s*第?\s*0*(\d+)", re.M)
+READER_ITEM_ID_RE = re.compile(r"^([IQ])\d{3,}$", re.I)
+
+INFO_CLOSED_STATUSES = {"已兑现", "废弃"}
+SUSPENSE_CLOSED_MARKERS = ("已回应", "已回收", "已解答", "已解决", "废弃")
+
+CACHE_SCHEMA_VERSION = "5"
+READER_LEDGER_VERSION = 1
+READER_LEDGER_MIGRATIONS: dict[int, Callable[[dict[str, Any]], dict[str, Any]]] = {
+    0: lambda payload: {
+        "version": 1,
+        "digest": "",
+        "anchor": payload.get("anchor"),
+        "settings": payload.get("settings", {}),
+        "overrides": payload.get("overrides", {}),
+        "items": payload.get("items", {}),
+    },
+}
+
+STYLE_ITEM_RE = re.compile(r"^(?:[-*]|\d+\.)\s+(.*)$")
+STYLE_FIELD_RE = re.compile(r"^([^：:（(]+?)\s*(?:[（(][^）)]*[）)])?\s*[：:]\s*(.*)$")
+STYLE_QUOTED_RE = re.compile(r"[“「『\"`]([^”」』\"`]{1,40})[”」』\"`]")
+STYLE_BANNED_KEY_RE = re.compile(r"禁用|禁止|不得出现|避免使用")
+STYLE_RANGE_RE = re.compile(r"(\d+)\s*%?\s*[-~～至到]\s*(\d+)")
+DIALOGUE_SPAN_RE = re.compile(r"[“「『]([^”」』]*)[”」』]")
+SENTENCE_SPLIT_RE = re.compile(r"[。！？!?…]+")
+WHITESPACE_RE = re.compile(r"\s+")
+SENTENCE_LENGTH_TARGETS = {"短句": (8, 20), "中句": (15, 35), "长句": (30, 60)}
+DIALOGUE_RATIO_TARGETS = {"低": (10, 25), "中": (25, 40), "高": (40, 60)}
+
+EMPHASIS_RE = re.compile(r"(\*\*|__)(.+?)\1")
+MARKDOWN_IMAGE_RE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+MARKDOWN_LINK_RE = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+MARKDOWN_INLINE_RE = re.compile(r"(\*\*|__|~~|`|\*)(\S(?:.*?\S)?)\1")
+MARKDOWN_BLOCK_PREFIX_RE = re.compile(r"^(?:>\s?)+|^(?:[-*+]|\d+\.)\s+")
+MARKDOWN_RULE_RE = re.compile(r"^(?:[-*_]\s*){3,}$")
+HTML_COMMENT_RE = re.compile(r"<!--.*?-->")
+MARKDOWN_ESCAPE_RE = re.compile(r"\\([\\`*_{}\[\]()#+\-.!<>|~])")
+# 转义字符在行内处理期间暂存为私用区字符，最后再还原，避免被当成强调等标记。
+MARKDOWN_ESCAPE_BASE = 0xE000
+MARKDOWN_UNESCAPE = {MARKDOWN_ESCAPE_BASE + code: chr(code) for code in range(128)}
+STRONG_OPEN = "\ue100"
+STRONG_CLOSE = "\ue101"
+PLAIN_TEXT_VERSION = "2"
+
+
+@dataclass
+class CheckResult:
+    key: str
+    name: str
+    status: str
+    detail: str
+
+
+@dataclass
+class MarkdownTable:
+    heading: str
+    header: list[str]
+    rows: list[list[str]]
+    lines: list[str]
+
+
+@dataclass
+class RoleRecord:
+    role: str
+    fields: dict[str, str]
+
+
+@dataclass
+class RoleAction:
+    chapter: int
+    role: str
+    fields: dict[str, str]
+    raw: str
+
+
+@dataclass
+class StyleRules:
+    pov: str
+    tense: str
+    sentence_length: tuple[int, int] | None
+    dialogue_ratio: tuple[int, int] | None
+    banned_phrases: list[str]
+    constraints: list[str]
+    unparsed_banned: list[str]
+
+
+@dataclass
+class ReaderItem:
+    item_id: str
+    kind: str
+    content: str
+    info_type: str
+    status: str
+    first_chapter: int
+    planned_chapter: int | None
+    closed_chapter: int | None
+
+
+@dataclass
+class ReaderLedger:
+    anchor: int | None
+    settings: dict[str, str]
+    overrides: dict[str, str]
+    items: dict[str, ReaderItem]
+
+    def open_items(self, kind: str, chapter: int) -> list[ReaderItem]:
+        return [
+            item
+            for _, item in sorted(self.items.items())
+            if item.kind == kind
+            and item.first_chapter <= chapter
+            and (item.closed_chapter is None or item.closed_chapter > chapter)
+        ]
+
+    def setting(self, prefix: str, chapter: int) -> int | None:
+        values = [self.settings]
+        if self.anchor == chapter:
+            values.insert(0, self.overrides)
+        for table in values:
+            for name, value in table.items():
+                if name.startswith(prefix):
+                    number = extract_chapter_num(value)
+                    if number is not None:
+                        return number
+        return None
+
+
+@dataclass
+class RoleStateIndex:
+    overview: dict[str, RoleRecord]
+    intel: dict[str, list[RoleRecord]]
+    modes: dict[str, dict[str, str]]
+    actions: list[RoleAction]
+    by_role: dict[str, list[RoleAction]]
+    by_chapter: dict[int, list[RoleAction]]
+
+    def role_names(self) -> list[str]:
+        names = list(self.overview)
+        names.extend(name for name in self.by_role if name and name not in self.overview)
+        return names
+
+
+def normalize_status(value: str) -> str:
+    text = (value or "").strip()
+    return text if text else "未标注"
+
+
+def normalize_id(value: str) -> str:
+    return (value or "").strip().upper()
+
+
+def extract_chapter_num(value: str) -> int | None:
+    text = (value or "").strip()
+    if not text:
+        return None
+    match = re.search(r"\d+", text)
+    return int(match.group()) if match else None
+
+
+def safe_cell(value: str) -> str:
+    return (value or "").replace("|", "\\|").strip()
+
+
+def markdown_blocks(text: str) -> Iterator[tuple[str, int, str]]:
+    # 块级处理：注释（含跨行）、表格分隔行、标题、分隔线、表格行、引用/列表前缀。
+    # 产出 (类型, 标题级别, 行内容)，类型为 heading/rule/table/text/blank；行内标记留给调用方处理。
+    in_comment = False
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if in_comment:
+            if "-->" not in line:
+                continue
+            line = line.split("-->", 1)[1].strip()
+            in_comment = False
+        line = HTML_COMMENT_RE.sub("", line)
+        if "<!--" in line:
+            line = line.split("<!--", 1)[0].strip()
+            in_comment = True
+        if "|" in line and TABLE_SEPARATOR_RE.match(line):
+            continue
+        line = MARKDOWN_ESCAPE_RE.sub(lambda match: chr(MARKDOWN_ESCAPE_BASE + ord(match.group(1))), line)
+        heading_match = MARKDOWN_HEADING_RE.match(line)
+        if heading_match:
+            yield "heading", len(heading_match.group(1)), heading_match.group(2)
+        elif MARKDOWN_RULE_RE.match(line):
+            yield "rule", 0, ""
+        elif line.startswith("|"):
+            yield "table", 0, "\u3000".join(cell for cell in split_table_row(line) if cell)
+        elif line:
+            yield "text", 0, MARKDOWN_BLOCK_PREFIX_RE.sub("", line)
+        else:
+            yield "blank", 0, ""
+
+
+def markdown_inline_plain(line: str) -> str:
+    line = MARKDOWN_IMAGE_RE.sub("", line)
+    line = MARKDOWN_LINK_RE.sub(r"\1", line)
+    return MARKDOWN_INLINE_RE.sub(r"\2", line).strip().translate(MARKDOWN_UNESCAPE)
+
+
+def markdown_inline_xhtml(line: str) -> str:
+    # 与纯文本同样去掉行内标记，只把加粗保留为 <strong>。
+    line = EMPHASIS_RE.sub(lambda match: f"{STRONG_OPEN}{match.group(2)}{STRONG_CLOSE}", line)
+    escaped = html.escape(markdown_inline_plain(line), quote=False)
+    return escaped.replace(STRONG_OPEN, "<strong>").replace(STRONG_CLOSE, "</strong>")
+
+
+@dataclass
+class PlainChapter:
+    text: str
+    prose: str
+    char_count: int
+
+
+def join_plain_lines(lines: list[str]) -> str:
+    # 段落间空行只保留一行，首尾空行去掉。
+    kept: list[str] = []
+    for line in lines:
+        if line or (kept and kept[-1]):
+            kept.append(line)
+    while kept and not kept[-1]:
+        kept.pop()
+    return "\n".join(kept)
+
+
+def normalize_markdown(text: str) -> str:
+    # 正文导出与字数统计共用：去掉标题符号、强调/行内代码标记、链接与图片、注释、转义符、
+    # 表格分隔行与引用/列表前缀，表格行改为以全角空格分隔的单元格；段落空行保留一行。
+    # 规则变化时递增 PLAIN_TEXT_VERSION，使导出缓存与清单失效。
+    return join_plain_lines(
+        [markdown_inline_plain(line) if kind != "rule" else "" for kind, _, line in markdown_blocks(text)]
+    )
+
+
+def plain_chapter(text: str) -> PlainChapter:
+    # 每章只规范化一次：完整纯文本用于字数，去掉标题的叙述部分用于风格指标。
+    lines: list[str] = []
+    prose: list[str] = []
+    for kind, _, line in markdown_blocks(text):
+        line = markdown_inline_plain(line) if kind != "rule" else ""
+        lines.append(line)
+        prose.append("" if kind == "heading" else line)
+    plain = join_plain_lines(lines)
+    return PlainChapter(plain, join_plain_lines(prose), count_non_whitespace(plain))
+
+
+def count_non_whitespace(text: str) -> int:
+    return len(WHITESPACE_RE.sub("", text))
+
+
+def chapter_file(project_dir: Path, chapter: int) -> Path:
+    return project_dir / "正文" / f"第{chapter:03d}章.md"
+
+
+def engine_dir(project_dir: Path) -> Path:
+    return project_dir / "正文" / ".engine"
+
+
+def context_file(project_dir: Path, chapter: int) -> Path:
+    return engine_dir(project_dir) / f"第{chapter:03d}章-上下文.md"
+
+
+def storyboard_file(project_dir: Path, chapter: int) -> Path:
+    return engine_dir(project_dir) / f"第{chapter:03d}章-分镜纲.md"
+
+
+def read_utf8(path: Path) -> str:
+    return path.read_text(encoding="utf-8")
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+_PARSE_MEMO: dict[tuple[str, str], tuple[str, Any]] = {}
+_PARSE_MEMO_LOCK = threading.Lock()
+_PARSE_BUILD_LOCKS: dict[tuple[str, str], threading.Lock] = {}
+
+
+def engine_cache_dir(project_dir: Path) -> Path:
+    return engine_dir(project_dir) / "cache"
+
+
+def write_cache_json(path: Path, payload: Any, **dump_options: Any) -> None:
+    # 门禁单元并发读写同一缓存：先写同目录临时文件再原子替换，读者只会看到完整的旧文件或新文件。
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    temp_path.write_text(
+        json.dumps(payload, ensure_ascii=False, **dump_options), encoding="utf-8", newline="\n"
+    )
+    os.replace(temp_path, path)
+
+
+def cached_parse(
+    project_dir: Path,
+    name: str,
+    source: Path,
+    parse: Callable[[str], Any],
+) -> Any:
+    # 解析结果按源文件哈希缓存：进程内复用，跨命令落盘到 .engine/cache/<name>.json。
+    raw = source.read_bytes() if source.is_file() else b""
+    digest = f"{CACHE_SCHEMA_VERSION}:{hashlib.sha256(raw).hexdigest()[:16]}"
+    return cached_build(
+        project_dir,
+        name,
+        (str(source), name),
+        digest,
+        lambda: parse(raw.decode("utf-8-sig")),
+    )
+
+
+def cached_build(
+    project_dir: Path,
+    name: str,
+    memo_key: tuple[str, str],
+    digest: str,
+    build: Callable[[], Any],
+) -> Any:
+    # 每个缓存项一把锁：并发单元请求同一输入时只构建一次；不同缓存项之间可嵌套调用。
+    with _PARSE_MEMO_LOCK:
+        memo = _PARSE_MEMO.get(memo_key)
+        if memo is not None and memo[0] == digest:
+            return memo[1]
+        build_lock = _PARSE_BUILD_LOCKS.setdefault(memo_key, threading.Lock())
+
+    with build_lock:
+        with _PARSE_MEMO_LOCK:
+            memo = _PARSE_MEMO.get(memo_key)
+        if memo is not None and memo[0] == digest:
+            return memo[1]
+        cache_path = engine_cache_dir(project_dir) / f"{name}.json"
+        data: Any = None
+        if cache_path.is_file():
+            try:
+                payload = json.loads(read_utf8(cache_path))
+            except (OSError, ValueError):
+                payload = {}
+            if payload.get("digest") == digest:
+                data = payload.get("data")
+        if data is None:
+            data = build()
+            write_cache_json(cache_path, {"digest": digest, "data": data})
+        with _PARSE_MEMO_LOCK:
+            _PARSE_MEMO[memo_key] = (digest, data)
+    return data
+
+
+def load_rows(csv_path: Path) -> list[dict[str, str]]:
+    with csv_path.open("r", encoding="utf-8-sig", newline="") as handle:
+        reader = csv.DictReader(handle)
+        if reader.fieldnames is None:
+            raise ValueError("CSV 为空或缺少表头。")
+        missing = [col for col in REQUIRED_COLUMNS if col not in reader.fieldnames]
+        if missing:
+            raise ValueError(f"CSV 缺少字段: {', '.join(missing)}")
+        return [dict(row) for row in reader]
+
+
+def collect_chapter_files(chapters_dir: Path) -> tuple[dict[int, Path], list[Path]]:
+    chapter_files: dict[int, Path] = {}
+    invalid_names: list[Path] = []
+    if not chapters_dir.exists():
+        return chapter_files, invalid_names
+    for path in sorted(chapters_dir.glob("*.md")):
+        match = CHAPTER_FILE_RE.match(path.name)
+        if not match:
+            invalid_names.append(path)
+            continue
+        chapter_num = int(match.group(1))
+        chapter_files[chapter_num] = path
+    return chapter_files, invalid_names
+
+
+def split_suboutline_sections(suboutline_text: str) -> dict[int, str]:
+    sections: dict[int, str] = {}
+    matches = list(CHAPTER_HEADING_RE.finditer(suboutline_text))
+    for index, match in enumerate(matches):
+        chapter_num = int(match.group(1))
+        start = match.start()
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(suboutline_text)
+        sections[chapter_num] = suboutline_text[start:end].strip()
+    return sections
+
+
+def parse_target_range(value: str, presets: dict[str, tuple[int, int]]) -> tuple[int, int] | None:
+    match = STYLE_RANGE_RE.search(value)
+    if match:
+        low, high = sorted((int(match.group(1)), int(match.group(2))))
+        return low, high
+    positions = [(value.find(label), label) for label in presets if label in value]
+    if positions:
+        return presets[min(positions)[1]]
+    return None
+
+
+def split_phrases(value: str) -> list[str]:
+    quoted = STYLE_QUOTED_RE.findall(value)
+    rest = STYLE_QUOTED_RE.sub("、", value)
+    rest_items = (item.strip(" \t“”「」『』\"`") for item in re.split(r"[、，,；;/]", rest))
+    return quoted + [item for item in rest_items if item]
+
+
+def compile_style_card(style_card_text: str) -> dict[str, Any]:
+    compiled: dict[str, Any] = {
+        "pov": "",
+        "tense": "",
+        "sentence_length": None,
+        "dialogue_ratio": None,
+        "banned_phrases": [],
+        "constraints": [],
+        "unparsed_banned": [],
+    }
+    banned: list[str] = []
+    heading = ""
+    for raw_line in style_card_text.splitlines():
+        line = raw_line.strip()
+        heading_match = MARKDOWN_HEADING_RE.match(line)
+        if heading_match:
+            heading = heading_match.group(2)
+            continue
+        item_match = STYLE_ITEM_RE.match(line)
+        if not item_match or not item_match.group(1).strip():
+            continue
+        item = item_match.group(1).strip()
+        field_match = STYLE_FIELD_RE.match(item)
+        key, value = (field_match.group(1).strip(), field_match.group(2).strip()) if field_match else ("", item)
+        if field_match and not value:
+            continue
+        compiled["constraints"].append(item)
+
+        if key == "视角":
+            compiled["pov"] = value
+        elif key == "时态":
+            compiled["tense"] = value
+        elif key.startswith("句长"):
+            compiled["sentence_length"] = parse_target_range(value, SENTENCE_LENGTH_TARGETS)
+        elif key.startswith("对话密度") or key.startswith("对话占比"):
+            compiled["dialogue_ratio"] = parse_target_range(value, DIALOGUE_RATIO_TARGETS)
+
+        # 禁用类字段（禁用风格/禁用表达/禁止出现…）的值按引号与 、，,；/ 分隔的清单解析；
+        # 其余含“禁”的条目是整句约束，只取其中加引号的短语。
+        if "禁用" in heading or STYLE_BANNED_KEY_RE.search(key):
+            phrases = split_phrases(value)
+        elif "禁" in item:
+            phrases = STYLE_QUOTED_RE.findall(item)
+        else:
+            continue
+        banned.extend(phrases)
+        if not phrases:
+            compiled["unparsed_banned"].append(item)
+    compiled["banned_phrases"] = sorted(set(banned), key=lambda phrase: (-len(phrase), phrase))
+    return compiled
+
+
+def load_style_rules(project_dir: Path) -> StyleRules:
+    data = cached_parse(
+        project_dir,
+        "style-rules",
+        project_dir / "风格参考" / "02-风格卡.md",
+        compile_style_card,
+    )
+    return StyleRules(
+        data["pov"],
+        data["tense"],
+        tuple(data["sentence_length"]) if data["sentence_length"] else None,
+        tuple(data["dialogue_ratio"]) if data["dialogue_ratio"] else None,
+        list(data["banned_phrases"]),
+        list(data["constraints"]),
+        list(data["unparsed_banned"]),
+    )
+
+
+def prose_metrics(body: str) -> tuple[float, float, float]:
+    # body 为 plain_chapter().prose，已去掉标题与 Markdown 标记。
+    total = count_non_whitespace(body)
+    dialogue = sum(count_non_whitespace(span) for span in DIALOGUE_SPAN_RE.findall(body))
+    narration = DIALOGUE_SPAN_RE.sub("", body)
+    sentences = [
+        count_non_whitespace(part) for part in SENTENCE_SPLIT_RE.split(narration) if part.strip()
+    ]
+    average = sum(sentences) / len(sentences) if sentences else 0.0
+    ratio = dialogue / total * 100.0 if total else 0.0
+    narration_chars = count_non_whitespace(narration)
+    first_person = narration.count("我") / narration_chars * 1000.0 if narration_chars else 0.0
+    return average, ratio, first_person
+
+
+def workspace_checks(project_dir: Path) -> list[CheckResult]:
+    checks: list[CheckResult] = []
+
+    for dirname, key in REQUIRED_DIRS.items():
+        target = project_dir / dirname
+        if target.is_dir():
+            checks.append(CheckResult(f"dir_{key}", f"目录存在：{dirname}", "PASS", str(target)))
+        else:
+            checks.append(
+                CheckResult(f"dir_{key}", f"目录存在：{dirname}", "FAIL", f"缺少目录：{target}")
+            )
+
+    for filename, key in REQUIRED_FILES.items():
+        target = project_dir / filename
+        if target.is_file():
+            checks.append(CheckResult(f"file_{key}", f"文件存在：{filename}", "PASS", str(target)))
+        else:
+            checks.append(
+                CheckResult(f"file_{key}", f"文件存在：{filename}", "FAIL", f"缺少文件：{target}")
+            )
+
+    csv_path = project_dir / "05-长线伏笔.csv"
+    if csv_path.exists():
+        try:
+            _ = load_rows(csv_path)
+            checks.append(CheckResult("foreshadow_csv_schema", "伏笔 CSV 结构", "PASS", "字段完整"))
+        except Exception as exc:  # noqa: BLE001
+            checks.append(CheckResult("foreshadow_csv_schema", "伏笔 CSV 结构", "FAIL", str(exc)))
+
+    chapters_dir = project_dir / "正文"
+    chapter_files, invalid_names = collect_chapter_files(chapters_dir)
+    if invalid_names:
+        names = ", ".join(path.name for path in invalid_names)
+        checks.append(CheckResult("chapter_naming", "章节命名规范", "FAIL", f"非法文件名：{names}"))
+    else:
+        checks.append(CheckResult("chapter_naming", "章节命名规范", "PASS", "符合 第NNN章.md 规则"))
+
+    if chapter_files:
+        sorted_nums = sorted(chapter_files)
+        gaps = [
+            str(num)
+            for num in range(sorted_nums[0], sorted_nums[-1] + 1)
+            if num not in chapter_files
+        ]
+        if gaps:
+            checks.append(
+                CheckResult("chapter_sequence", "章节连续性", "WARN", f"缺失章节：{', '.join(gaps)}")
+            )
+        else:
+            checks.append(CheckResult("chapter_sequence", "章节连续性", "PASS", "无缺号"))
+    else:
+        checks.append(CheckResult("chapter_sequence", "章节连续性", "WARN", "尚无已命名正文章节"))
+
+    suboutline_path = project_dir / "02-子大纲.md"
+    if suboutline_path.exists():
+        sections = split_suboutline_sections(read_utf8(suboutline_path))
+        if sections:
+            checks.append(
+                CheckResult("suboutline_parse", "子大纲可解析章节", "PASS", f"共 {len(sections)} 章")
+            )
+        else:
+            checks.append(
+                CheckResult(
+                    "suboutline_parse",
+                    "子大纲可解析章节",
+                    "WARN",
+                    "未识别到“第N章”标题，请检查子大纲结构。",
+                )
+            )
+
+    return checks
+
+
+def split_table_row(line: str) -> list[str]:
+    body = line.strip()
+    if body.startswith("|"):
+        body = body[1:]
+    if body.endswith("|") and not body.endswith("\\|"):
+        body = body[:-1]
+    return [cell.strip().replace("\\|", "|") for cell in re.split(r"(?<!\\)\|", body)]
+
+
+def parse_markdown_tables(text: str) -> list[MarkdownTable]:
+    tables: list[MarkdownTable] = []
+    heading = ""
+    lines = text.splitlines()
+    index = 0
+    while index < len(lines):
+        line = lines[index].strip()
+        heading_match = MARKDOWN_HEADING_RE.match(line)
+        if heading_match:
+            heading = HEADING_SUFFIX_RE.sub("", heading_match.group(2)).strip()
+            index += 1
+            continue
+        if (
+            line.startswith("|")
+            and index + 1 < len(lines)
+            and TABLE_SEPARATOR_RE.match(lines[index + 1].strip())
+        ):
+            table = MarkdownTable(heading, split_table_row(line), [], [])
+            index += 2
+            while index < len(lines) and lines[index].strip().startswith("|"):
+                row_line = lines[index].strip()
+                cells = split_table_row(row_line)
+                if any(cells):
+                    table.rows.append(cells)
+                    table.lines.append(row_line)
+                index += 1
+            tables.append(table)
+            continue
+        index += 1
+    return tables
+
+
+def table_records(table: MarkdownTable) -> list[dict[str, str]]:
+    return [
+        {column: cells[pos] if pos < len(cells) else "" for pos, column in enumerate(table.header)}
+        for cells in table.rows
+    ]
+
+
+def parse_role_state_tables(text: str) -> list[dict[str, Any]]:
+    return [
+        {"heading": table.heading, "header": table.header, "rows": table.rows, "lines": table.lines}
+        for table in parse_markdown_tables(text)
+    ]
+
+
+def build_role_state_index(tables: list[MarkdownTable]) -> RoleStateIndex:
+    index = RoleStateIndex({}, {}, {}, [], {}, {})
+    has_action_table = False
+    for table in tables:
+        records = table_records(table)
+        if "状态总览" in table.heading:
+            for record in records:
+                role = record.get("角色", "")
+                if role:
+                    index.overview[role] = RoleRecord(role, record)
+        elif "知晓情报" in table.heading:
+            for record in records:
+                role = record.get("角色", "")
+                if role:
+                    index.intel.setdefault(role, []).append(RoleRecord(role, record))
+        elif "行动模式词典" in table.heading:
+            for record in records:
+                mode = record.get("模式名", "")
+                if mode:
+                    index.modes[mode] = record
+        elif "行动记录" in table.heading:
+            has_action_table = True
+            actor_match = next(
+                (ACTOR_COLUMN_RE.match(column) for column in table.header if ACTOR_COLUMN_RE.match(column)),
+                None,
+            )
+            default_role = actor_match.group(1) if actor_match else ""
+            for record, raw in zip(records, table.lines):
+                chapter_match = CHAPTER_CELL_RE.search(record.get("章节", "") or raw)
+                if not chapter_match:
+                    continue
+                role = record.get("角色", "") or default_role
+                index.actions.append(RoleAction(int(chapter_match.group(1)), role, record, raw))
+
+    if not has_action_table:
+        # 非模板结构的角色状态文件：退回到按行匹配“| 第N章 |”。
+        for table in tables:
+            for raw in table.lines:
+                match = ROLE_ACTION_ROW_RE.search(raw)
+                if match:
+                    index.actions.append(RoleAction(int(match.group(1)), "", {}, raw))
+
+    for action in index.actions:
+        index.by_role.setdefault(action.role, []).append(action)
+        index.by_chapter.setdefault(action.chapter, []).append(action)
+    return index
+
+
+def load_role_state_index(project_dir: Path) -> RoleStateIndex:
+    data = cached_parse(
+        project_dir,
+        "role-state",
+        project_dir / "07-当前角色状态.md",
+        parse_role_state_tables,
+    )
+    tables = [
+        MarkdownTable(item["heading"], item["header"], item["rows"], item["lines"])
+        for item in data
+    ]
+    return build_role_state_index(tables)
+
+
+def parse_reader_info(text: str) -> dict[str, Any]:
+    anchor_match = READER_ANCHOR_RE.search(text)
+    parsed: dict[str, Any] = {
+        "anchor": int(anchor_match.group(1)) if anchor_match else None,
+        "settings": {},
+        "overrides": {},
+        "plans": [],
+        "results": [],
+        "suspense": [],
+    }
+    for table in parse_markdown_tables(text):
+        records = table_records(table)
+        if table.heading == "全局设置":
+            for record in records:
+                if record.get("设置项"):
+                    parsed["settings"][record["设置项"]] = record.get("全局值", "")
+        elif table.heading.startswith("本章全局设置覆盖"):
+            for record in records:
+                if record.get("设置项") and record.get("本章覆盖值"):
+                    parsed["overrides"][record["设置项"]] = record["本章覆盖值"]
+        elif table.heading.startswith("写前规划"):
+            parsed["plans"].extend(records)
+        elif table.heading.startswith("写后回填"):
+            parsed["results"].extend(records)
+        elif table.heading.startswith("章节悬念"):
+            parsed["suspense"].extend(records)
+    return parsed
+
+
+def column_value(record: dict[str, str], prefix: str) -> str:
+    for column, value in record.items():
+        if column.startswith(prefix):
+            return value
+    return ""
+
+
+def merge_reader_info(
+    items: dict[str, dict[str, Any]],
+    parsed: dict[str, Any],
+    anchor: int | None,
+) -> None:
+    # 章节号只取自文件本身：有“当前章节”锚点时按锚点记账；没有锚点时出现章节记为 0（视为一直存在），
+    # 关闭章节取条目的计划章节，缺失时记为出现章节。
+    def stamp(item: dict[str, Any]) -> int:
+        if anchor is not None:
+            return anchor
+        return item.get("planned_chapter") or item["first_chapter"]
+
+    for record in parsed["plans"]:
+        item_id = normalize_id(record.get("信息ID", ""))
+        if not READER_ITEM_ID_RE.match(item_id) or not record.get("信息内容"):
+            continue
+        item = items.setdefault(
+            item_id,
+            {"kind": "info", "status": "", "first_chapter": anchor or 0, "closed_chapter": None},
+        )
+        item["content"] = record["信息内容"]
+        item["info_type"] = column_value(record, "类型")
+        item["planned_chapter"] = extract_chapter_num(column_value(record, "预计揭示位置"))
+
+    for record in parsed["results"]:
+        item_id = normalize_id(record.get("信息ID", ""))
+        if item_id not in items:
+            continue
+        status = column_value(record, "状态")
+        items[item_id]["status"] = status
+        closed = any(marker in status for marker in INFO_CLOSED_STATUSES)
+        if not closed:
+            items[item_id]["closed_chapter"] = None
+        elif items[item_id]["closed_chapter"] is None:
+            items[item_id]["closed_chapter"] = stamp(items[item_id])
+
+    for record in parsed["suspense"]:
+        item_id = normalize_id(record.get("悬念ID", ""))
+        content = record.get("本章新增悬念", "")
+        if not READER_ITEM_ID_RE.match(item_id) or not content:
+            continue
+        item = items.setdefault(
+            item_id,
+            {"kind": "suspense", "first_chapter": anchor or 0, "closed_chapter": None},
+        )
+        item["content"] = content
+        item["info_type"] = column_value(record, "强度")
+        item["planned_chapter"] = extract_chapter_num(column_value(record, "计划回应章节"))
+        note = " ".join(
+            value for column, value in record.items() if column not in {"悬念ID", "本章新增悬念"}
+        )
+        closed = any(marker in note for marker in SUSPENSE_CLOSED_MARKERS)
+        item["status"] = "已回应" if closed else "未回应"
+        if not closed:
+            item["closed_chapter"] = None
+        elif item["closed_chapter"] is None:
+            item["closed_chapter"] = stamp(item)
+
+
+def reader_ledger_path(project_dir: Path) -> Path:
+    # 台账是唯一保存历史的地方，放在 .engine/ 而不是可随时删除的 cache/ 下，版本号也与派生缓存分开。
+    return engine_dir(project_dir) / "reader-ledger.json"
+
+
+def migrate_reader_ledger(payload: dict[str, Any]) -> dict[str, Any]:
+    # 逐版本升级，绝不因版本不符丢弃条目；旧版（位于 cache/ 且带 schema 字段）视为版本 0。
+    version = int(payload.get("version", 0))
+    while version < READER_LEDGER_VERSION:
+        payload = READER_LEDGER_MIGRATIONS[version](payload)
+        version = int(payload["version"])
+    return payload
+
+
+def read_reader_ledger(project_dir: Path) -> dict[str, Any]:
+    for path in (reader_ledger_path(project_dir), engine_cache_dir(project_dir) / "reader-ledger.json"):
+        if not path.is_file():
+            continue
+        try:
+            return migrate_reader_ledger(json.loads(read_utf8(path)))
+        except (OSError, ValueError):
+            continue
+    return {"version": READER_LEDGER_VERSION, "items": {}}
+
+
+def write_reader_ledger(project_dir: Path, payload: dict[str, Any]) -> None:
+    write_cache_json(reader_ledger_path(project_dir), payload, sort_keys=True, indent=1)
+    legacy = engine_cache_dir(project_dir) / "reader-ledger.json"
+    if legacy.is_file():
+        legacy.unlink()
+
+
+def sync_reader_ledger(project_dir: Path, rebuild: bool = False) -> dict[str, Any] | None:
+    # 读者面信息文件按章覆盖或追加；台账按文件哈希增量合并，保留已被删除行的历史。
+    source = project_dir / "09-读者面信息.md"
+    if not source.is_file():
+        return None
+    raw = source.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()[:16]
+    payload = {"version": READER_LEDGER_VERSION, "items": {}} if rebuild else read_reader_ledger(project_dir)
+    if rebuild or payload.get("digest") != digest or not reader_ledger_path(project_dir).is_file():
+        parsed = parse_reader_info(raw.decode("utf-8-sig"))
+        items = payload.get("items", {})
+        merge_reader_info(items, parsed, parsed["anchor"])
+        payload = {
+            "version": READER_LEDGER_VERSION,
+            "digest": digest,
+            "anchor": parsed["anchor"],
+            "settings": parsed["settings"],
+            "overrides": parsed["overrides"],
+            "items": items,
+        }
+        write_reader_ledger(project_dir, payload)
+    return payload
+
+
+def load_reader_ledger(project_dir: Path) -> ReaderLedger | None:
+    payload = sync_reader_ledger(project_dir)
+    if payload is None:
+        return None
+    return ReaderLedger(
+        payload.get("anchor"),
+        payload.get("settings", {}),
+        payload.get("overrides", {}),
+        {
+            item_id: ReaderItem(
+                item_id,
+                item.get("kind", ""),
+                item.get("content", ""),
+                item.get("info_type", ""),
+                item.get("status", ""),
+                item.get("first_chapter", 0),
+                item.get("planned_chapter"),
+                item.get("closed_chapter"),
+            )
+            for item_id, item in payload.get("items", {}).items()
+        },
+    )
+
+
+def load_suboutline_sections(project_dir: Path) -> dict[int, str]:
+    data = cached_parse(
+        project_dir,
+        "suboutline",
+        project_dir / "02-子大纲.md",
+        lambda text: {str(chapter): section for chapter, section in split_suboutline_sections(text).items()},
+    )
+    return {int(chapter): section for chapter, section in data.items()}
+
+
+def split_paragraphs(text: str) -> list[tuple[int, str]]:
+    paragraphs: list[tuple[int, str]] = []
+    block: list[str] = []
+    start = 0
+    for line_no, line in enumerate(text.splitlines() + [""], start=1):
+        stripped = line.strip()
+        if not stripped or stripped.startswith(("#", "|", "---", "<!--")):
+            if block:
+                paragraphs.append((start, "".join(block)))
+                block = []
+            continue
+        if not block:
+            start = line_no
+        block.append(stripped)
+    return paragraphs
+
+
+def open_cache_db(project_dir: Path, name: str, params: str, schema: str) -> sqlite3.Connection:
+    index_path = engine_cache_dir(project_dir) / f"{name}.sqlite3"
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(index_path))
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    row = conn.execute("SELECT value FROM meta WHERE key = 'params'").fetchone()
+    if row is None or row[0] != f"{CACHE_SCHEMA_VERSION}:{params}":
+        tables = [
+            item[0]
+            for item in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name != 'meta'"
+            )
+        ]
+        for table in tables:
+            conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+        conn.executescript(schema)
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('params', ?)",
+            (f"{CACHE_SCHEMA_VERSION}:{params}",),
+        )
+        conn.commit()
+    return conn
+
+
+def changed_chapter_files(
+    conn: sqlite3.Connection,
+    chapter_files: dict[int, Path],
+) -> tuple[dict[int, tuple[Path, str, int, int]], list[int]]:
+    # 先比对 size/mtime，只有变化的章节才读盘算哈希；哈希未变只刷新 stat。
+    known = {
+        chapter: (size, mtime_ns, digest)
+        for chapter, size, mtime_ns, digest in conn.execute(
+            "SELECT chapter, size, mtime_ns, digest FROM chapters"
+        )
+    }
+    changed: dict[int, tuple[Path, str, int, int]] = {}
+    for chapter, path in chapter_files.items():
+        stat = path.stat()
+        previous = known.get(chapter)
+        if previous is not None and previous[:2] == (stat.st_size, stat.st_mtime_ns):
+            continue
+        text = read_utf8(path)
+        if previous is not None and previous[2] == text_digest(text):
+            conn.execute(
+                "UPDATE chapters SET size = ?, mtime_ns = ? WHERE chapter = ?",
+                (stat.st_size, stat.st_mtime_ns, chapter),
+            )
+            continue
+        changed[chapter] = (path, text, stat.st_size, stat.st_mtime_ns)
+    removed = [chapter for chapter in known if chapter not in chapter_files]
+    return changed, removed
+
+
+def open_metrics_db(project_dir: Path) -> sqlite3.Connection:
+    return open_cache_db(
+        project_dir,
+        "chapter-metrics",
+        f"{FORESHADOW_ID_RE.pattern}:{CHAPTER_HEADING_RE.pattern}:{PLAIN_TEXT_VERSION}",
+        """
+        CREATE TABLE chapters (
+            chapter INTEGER PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT,
+            char_count INTEGER, heading INTEGER, foreshadow_ids TEXT
+        );
+        CREATE TABLE gate_runs (
+            chapter INTEGER PRIMARY KEY, digest TEXT, status TEXT,
+            passed INTEGER, warned INTEGER, failed INTEGER, run_at TEXT
+        );
+        """,
+    )
+
+
+def sync_chapter_metrics(conn: sqlite3.Connection, chapter_files: dict[int, Path]) -> int:
+    changed, removed = changed_chapter_files(conn, chapter_files)
+    for chapter in removed:
+        conn.execute("DELETE FROM chapters WHERE chapter = ?", (chapter,))
+    for chapter, (_, text, size, mtime_ns) in changed.items():
+        heading_match = CHAPTER_HEADING_RE.search(text)
+        ids = sorted({normalize_id(item) for item in FORESHADOW_ID_RE.findall(text)})
+        conn.execute(
+            "INSERT OR REPLACE INTO chapters VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                chapter,
+                size,
+                mtime_ns,
+                text_digest(text),
+                plain_chapter(text).char_count,
+                int(heading_match.group(1)) if heading_match else None,
+                ",".join(ids),
+            ),
+        )
+    conn.commit()
+    return len(changed) + len(removed)
+
+
+def results_summary(results: list[CheckResult]) -> tuple[int, int, int]:
+    passed = sum(1 for item in results if item.status == "PASS")
+    warned = sum(1 for item in results if item.status == "WARN")
+    failed = sum(1 for item in results if item.status == "FAIL")
+    return passed, warned, failed
+
+
+def print_results(results: list[CheckResult]) -> None:
+    for item in results:
+        print(f"[{item.status}] {item.name} - {item.detail}")
+
+
+def draft_template_path() -> Path:
+    return SKILL_ROOT / "references" / "draft-template.md"
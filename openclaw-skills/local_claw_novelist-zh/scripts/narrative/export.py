@@ -0,0 +1,1005 @@
+from __future__ import annotations
+
+import argparse
+import difflib
+import gzip
+import hashlib
+import html
+import json
+import lzma
+import os
+import re
+import shutil
+import sys
+import time
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+from .core import (
+    CHAPTER_HEADING_RE,
+    PLAIN_TEXT_VERSION,
+    cached_parse,
+    collect_chapter_files,
+    context_file,
+    count_non_whitespace,
+    engine_cache_dir,
+    load_suboutline_sections,
+    markdown_blocks,
+    markdown_inline_plain,
+    markdown_inline_xhtml,
+    normalize_markdown,
+    open_metrics_db,
+    plain_chapter,
+    prose_metrics,
+    read_utf8,
+    split_paragraphs,
+    storyboard_file,
+    text_digest,
+)
+
+EXPORT_DIFF_CONTEXT = 1
+EXPORT_DIFF_MAX_LINES = 20
+
+EXPORT_BUFFER_BYTES = 1 << 20
+EXPORT_BANNER = "=" * 50 + "\n小说全文导出\n" + "=" * 50 + "\n\n"
+EXPORT_SEPARATOR = "=" * 60
+EXPORT_MANIFEST_VERSION = 2
+EXPORT_FORMATS = {"txt": ".txt", "epub": ".epub", "jsonl-dataset": ".jsonl"}
+EXPORT_MULTI_FILE_FORMATS = ("txt-split", "jsonl-dataset")
+EXPORT_SHARD_SIZE = "256M"
+
+EXPORT_PARALLEL_MIN_CHAPTERS = 1000
+EXPORT_SPLIT_MODES = ("volume", "chars", "chapters")
+EXPORT_COMPRESSORS = {"xz": ".xz", "gz": ".gz"}
+EXPORT_COMPRESS_LEVEL = 6
+VOLUME_HEADING_RE = re.compile(r"^#{1,6}\s*(第\s*[0-9零〇一二两三四五六七八九十百千]+\s*卷.*?)\s*$")
+UNSAFE_FILENAME_RE = re.compile(r'[\\/:*?"<>|\s]+')
+EPUB_DEFAULT_EPOCH = 315532800  # 1980-01-01T00:00:00Z，zip 时间戳下限
+EPUB_STYLE = "body { line-height: 1.8; }\np { text-indent: 2em; margin: 0 0 0.6em 0; }\n"
+EPUB_CONTAINER = """<?xml version="1.0" encoding="utf-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+"""
+EPUB_CHAPTER_TEMPLATE = """<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" xml:lang="zh-CN" lang="zh-CN">
+<head>
+<title>{title}</title>
+<link rel="stylesheet" type="text/css" href="../style.css"/>
+</head>
+<body>
+<section epub:type="chapter">
+{body}
+</section>
+</body>
+</html>
+"""
+
+
+class ExportProgress:
+    # 终端下原地刷新一行进度；重定向到文件时只在每 10% 输出一行。
+    def __init__(self, total: int) -> None:
+        self.total = total
+        self.interactive = sys.stdout.isatty()
+        self.next_step = 0
+
+    def update(self, done: int) -> None:
+        if self.total == 0:
+            return
+        percent = done * 100 // self.total
+        if self.interactive:
+            print(f"\r[INFO] 导出进度 {done}/{self.total}（{percent}%）", end="", flush=True)
+            if done == self.total:
+                print()
+        elif percent >= self.next_step:
+            print(f"[INFO] 导出进度 {done}/{self.total}（{percent}%）")
+            self.next_step = percent // 10 * 10 + 10
+
+
+def export_manifest_path(output_path: Path, fmt: str = "") -> Path:
+    # 压缩包与数据集保留完整文件名，分卷导出另加 .split，避免与同名 TXT 导出的清单互相覆盖。
+    kind = ".split" if fmt.startswith("txt-split") else ""
+    if output_path.suffix != EXPORT_FORMATS["txt"]:
+        return output_path.with_name(f"{output_path.name}{kind}.manifest.json")
+    return output_path.with_suffix(f"{kind}.manifest.json")
+
+
+def load_export_manifest(output_path: Path, fmt: str) -> dict[str, Any] | None:
+    # 清单与输出文件大小对不上（被手改或上次导出中断）时视为失效，回退到全量导出。
+    manifest_path = export_manifest_path(output_path, fmt)
+    multi_file = fmt.startswith(EXPORT_MULTI_FILE_FORMATS)
+    if not manifest_path.is_file() or (not multi_file and not output_path.is_file()):
+        return None
+    try:
+        manifest = json.loads(read_utf8(manifest_path))
+    except (OSError, ValueError):
+        return None
+    if (
+        manifest.get("version") != EXPORT_MANIFEST_VERSION
+        or manifest.get("format") != fmt
+        or (fmt.startswith("txt") and manifest.get("plain_text") != PLAIN_TEXT_VERSION)
+        or (not multi_file and manifest.get("total_bytes") != output_path.stat().st_size)
+    ):
+        return None
+    return manifest
+
+
+def previous_export_parts(output_path: Path, fmt: str) -> set[str]:
+    # 只为清理旧分片读取文件列表，不要求清单仍可复用（版本或规范化规则变化后同样要清理）；
+    # 兼容分卷清单曾与整本 TXT 共用 <名>.manifest.json 的情况。
+    parts: set[str] = set()
+    for manifest_path in {export_manifest_path(output_path, fmt), export_manifest_path(output_path)}:
+        try:
+            manifest = json.loads(read_utf8(manifest_path))
+        except (OSError, ValueError):
+            continue
+        if str(manifest.get("format", "")).split("+")[0] == fmt.split("+")[0]:
+            parts.update(str(item.get("file", "")) for item in manifest.get("files", []))
+    parts.discard("")
+    return parts
+
+
+def prune_export_parts(output_path: Path, previous: set[str], written: set[str]) -> None:
+    for name in sorted(previous - written):
+        stale = output_path.with_name(Path(name).name)
+        if stale.is_file():
+            stale.unlink()
+
+
+def write_export_manifest(output_path: Path, manifest: dict[str, Any]) -> None:
+    manifest_path = export_manifest_path(output_path, manifest["format"])
+    temp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    temp_path.write_text(
+        json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8", newline="\n"
+    )
+    temp_path.replace(manifest_path)
+
+
+def stream_digest(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(EXPORT_BUFFER_BYTES), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()[:16]
+
+
+def unchanged_prefix(chapter_files: dict[int, Path], entries: list[dict[str, Any]]) -> int:
+    # 按顺序比对清单：size/mtime 相同直接认定未变，否则再比内容哈希；返回首个变化位置。
+    for position, chapter in enumerate(sorted(chapter_files)):
+        if position >= len(entries):
+            return position
+        entry = entries[position]
+        path = chapter_files[chapter]
+        if entry["chapter"] != chapter or entry["name"] != path.name:
+            return position
+        stat = path.stat()
+        if (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            continue
+        if entry["size"] != stat.st_size or entry["digest"] != stream_digest(path):
+            return position
+        entry["mtime_ns"] = stat.st_mtime_ns
+    return len(chapter_files)
+
+
+def prepare_plain_chapter(job: tuple[int, str, str]) -> tuple[int, str, int, int]:
+    # 进程池任务：规范化结果按原文哈希落盘到缓存目录，已存在则直接复用。
+    chapter, path_text, cache_dir = job
+    path = Path(path_text)
+    mtime_ns = path.stat().st_mtime_ns
+    raw = path.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()[:16]
+    plain_path = plain_cache_path(Path(cache_dir), digest)
+    if not plain_path.is_file():
+        temp_path = plain_path.with_name(f"{digest}.{os.getpid()}.tmp")
+        plain = normalize_markdown(raw.decode("utf-8-sig"))
+        temp_path.write_bytes((plain + "\n").encode("utf-8") if plain else b"")
+        temp_path.replace(plain_path)
+    return chapter, digest, len(raw), mtime_ns
+
+
+def plain_cache_path(cache_dir: Path, digest: str) -> Path:
+    return cache_dir / f"{digest}.v{PLAIN_TEXT_VERSION}.txt"
+
+
+def prune_plaintext_cache(cache_dir: Path, digests: set[str]) -> None:
+    keep = {plain_cache_path(cache_dir, digest).name for digest in digests}
+    for stale in cache_dir.glob("*.txt"):
+        if stale.name not in keep:
+            stale.unlink()
+
+
+def open_export_stream(path: Path, compress: str | None, level: int) -> Any:
+    # 压缩导出直接把章节流写进 lzma/gzip 写入器，不落地未压缩文件；gzip 头部时间固定为 0。
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if compress == "xz":
+        return lzma.open(path, "wb", preset=level)
+    if compress == "gz":
+        return gzip.GzipFile(str(path), "wb", compresslevel=level, mtime=0)
+    return path.open("wb", buffering=EXPORT_BUFFER_BYTES)
+
+
+def report_compression(paths: list[Path], raw_bytes: int, seconds: float, compress: str) -> None:
+    packed = sum(path.stat().st_size for path in paths)
+    ratio = packed / raw_bytes * 100.0 if raw_bytes else 0.0
+    throughput = raw_bytes / (1 << 20) / seconds if seconds > 0 else 0.0
+    print(
+        f"[INFO] {compress} 压缩：{raw_bytes} → {packed} 字节（{ratio:.1f}%），"
+        f"耗时 {seconds:.2f} 秒，吞吐 {throughput:.1f} MiB/s"
+    )
+
+
+def write_txt_block(outfile: Any, name: str, plain_path: Path) -> int:
+    header = f"\n{EXPORT_SEPARATOR}\n{name}\n{EXPORT_SEPARATOR}\n".encode("utf-8")
+    outfile.write(header)
+    with plain_path.open("rb") as infile:
+        shutil.copyfileobj(infile, outfile, EXPORT_BUFFER_BYTES)
+    outfile.write(b"\n")
+    return len(header) + plain_path.stat().st_size + 1
+
+
+def export_txt(
+    chapter_files: dict[int, Path],
+    output_path: Path,
+    cache_dir: Path,
+    full: bool = False,
+    jobs: int = 1,
+    compress: str | None = None,
+    level: int = EXPORT_COMPRESS_LEVEL,
+) -> tuple[str, int]:
+    # 按清单找到第一个变化的章节，从它在输出中的偏移处截断后续写；
+    # 尾部追加/删章只动文件末尾，中间改章只重写该章之后的部分。
+    # 压缩流无法原地截断，压缩导出总是全量写出，清单偏移对应解压后的内容。
+    fmt = f"txt+{compress}" if compress else "txt"
+    started = time.perf_counter()
+    manifest = None if full or compress else load_export_manifest(output_path, fmt)
+    entries: list[dict[str, Any]] = manifest["chapters"] if manifest else []
+    chapters = sorted(chapter_files)
+    keep = unchanged_prefix(chapter_files, entries) if manifest else 0
+    if manifest and keep == len(chapters) == len(entries):
+        write_export_manifest(output_path, manifest)
+        return "未变化", 0
+
+    banner = EXPORT_BANNER.encode("utf-8")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if manifest:
+        offset = entries[keep]["offset"] if keep < len(entries) else manifest["total_bytes"]
+        handle = output_path.open("r+b", buffering=EXPORT_BUFFER_BYTES)
+        handle.seek(offset)
+        handle.truncate()
+    else:
+        offset = len(banner)
+        handle = open_export_stream(output_path, compress, level)
+        handle.write(banner)
+
+    kept = entries[:keep]
+    progress = ExportProgress(len(chapters) - keep)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    plain_jobs = [(chapter, str(chapter_files[chapter]), str(cache_dir)) for chapter in chapters[keep:]]
+    with handle:
+        for done, (chapter, digest, size, mtime_ns) in enumerate(
+            ordered_parallel_map(prepare_plain_chapter, plain_jobs, jobs), start=1
+        ):
+            path = chapter_files[chapter]
+            length = write_txt_block(handle, path.name, plain_cache_path(cache_dir, digest))
+            kept.append(
+                {
+                    "chapter": chapter,
+                    "name": path.name,
+                    "size": size,
+                    "mtime_ns": mtime_ns,
+                    "digest": digest,
+                    "offset": offset,
+                    "length": length,
+                }
+            )
+            offset += length
+            progress.update(done)
+
+    write_export_manifest(
+        output_path,
+        {
+            "version": EXPORT_MANIFEST_VERSION,
+            "format": fmt,
+            "plain_text": PLAIN_TEXT_VERSION,
+            "output": output_path.name,
+            "total_bytes": offset,
+            "chapters": kept,
+        },
+    )
+    prune_plaintext_cache(cache_dir, {entry["digest"] for entry in kept})
+    if compress:
+        report_compression([output_path], offset, time.perf_counter() - started, compress)
+    if not manifest:
+        mode = "全量导出"
+    elif keep == len(entries):
+        mode = "尾部追加"
+    elif keep == len(chapters):
+        mode = "尾部截断"
+    else:
+        mode = f"自第{chapters[keep]:03d}章起重写"
+    return mode, len(chapters) - keep
+
+
+def parse_split_spec(value: str) -> tuple[str, int]:
+    mode, _, amount = value.partition(":")
+    if mode not in EXPORT_SPLIT_MODES:
+        raise argparse.ArgumentTypeError(f"未知分卷方式：{value}（可选 volume、chars:N、chapters:N）")
+    if mode == "volume":
+        if amount:
+            raise argparse.ArgumentTypeError("volume 不接受数值参数")
+        return mode, 0
+    if not amount.isdigit() or int(amount) <= 0:
+        raise argparse.ArgumentTypeError(f"{mode} 需要正整数，如 {mode}:200")
+    return mode, int(amount)
+
+
+def parse_volume_map(suboutline_text: str) -> list[list[Any]]:
+    # 子大纲里“第N卷”标题之后出现的章节标题都归入该卷；JSON 缓存不支持整数键，按 [章节, 卷名] 列表保存。
+    volume = ""
+    mapping: list[list[Any]] = []
+    for raw_line in suboutline_text.splitlines():
+        line = raw_line.strip()
+        volume_match = VOLUME_HEADING_RE.match(line)
+        if volume_match:
+            volume = volume_match.group(1)
+            continue
+        heading_match = CHAPTER_HEADING_RE.match(line)
+        if volume and heading_match and line.startswith("#"):
+            mapping.append([int(heading_match.group(1)), volume])
+    return mapping
+
+
+def load_volume_map(project_dir: Path) -> dict[int, str]:
+    data = cached_parse(project_dir, "volume-map", project_dir / "02-子大纲.md", parse_volume_map)
+    return {chapter: volume for chapter, volume in data}
+
+
+def split_output_path(output_path: Path, index: int, label: str, compress: str | None = None) -> Path:
+    base = output_path
+    if compress and base.suffix == EXPORT_COMPRESSORS[compress]:
+        base = base.with_suffix("")
+    suffix = f"-{UNSAFE_FILENAME_RE.sub('', label)[:30]}" if label else ""
+    packed = EXPORT_COMPRESSORS[compress] if compress else ""
+    return base.with_name(f"{base.stem}-{index:02d}{suffix}{base.suffix}{packed}")
+
+
+def export_split(
+    chapter_files: dict[int, Path],
+    output_path: Path,
+    cache_dir: Path,
+    split: tuple[str, int],
+    volumes: dict[int, str],
+    jobs: int,
+    compress: str | None = None,
+    level: int = EXPORT_COMPRESS_LEVEL,
+) -> list[dict[str, Any]]:
+    # 单遍顺序写：每章写入前判断是否需要换文件（换卷、字数超上限或章数满额），
+    # 整章不拆分；内存只保留当前章节的统计与清单条目。
+    mode, limit = split
+    fmt = f"txt-split+{compress}" if compress else "txt-split"
+    started = time.perf_counter()
+    previous_parts = previous_export_parts(output_path, fmt)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    plain_jobs = [
+        (chapter, str(chapter_files[chapter]), str(cache_dir)) for chapter in sorted(chapter_files)
+    ]
+    files: list[dict[str, Any]] = []
+    entries: list[dict[str, Any]] = []
+    handle: Any = None
+    volume = ""
+    offset = 0
+    progress = ExportProgress(len(plain_jobs))
+    banner = EXPORT_BANNER.encode("utf-8")
+    try:
+        for done, (chapter, digest, size, mtime_ns) in enumerate(
+            ordered_parallel_map(prepare_plain_chapter, plain_jobs, jobs), start=1
+        ):
+            plain_path = plain_cache_path(cache_dir, digest)
+            chars = count_non_whitespace(plain_path.read_text(encoding="utf-8"))
+            chapter_volume = volumes.get(chapter, volume)
+            current = files[-1] if files else None
+            rotate = current is None or (
+                (mode == "volume" and chapter_volume != volume)
+                or (mode == "chars" and current["chars"] and current["chars"] + chars > limit)
+                or (mode == "chapters" and current["chapters"] >= limit)
+            )
+            if rotate:
+                if handle is not None:
+                    handle.close()
+                volume = chapter_volume
+                label = volume if mode == "volume" else ""
+                part_path = split_output_path(output_path, len(files) + 1, label, compress)
+                handle = open_export_stream(part_path, compress, level)
+                handle.write(banner)
+                offset = len(banner)
+                current = {"file": part_path.name, "volume": label, "chapters": 0, "chars": 0, "bytes": 0}
+                files.append(current)
+            path = chapter_files[chapter]
+            length = write_txt_block(handle, path.name, plain_path)
+            entries.append(
+                {
+                    "chapter": chapter,
+                    "name": path.name,
+                    "size": size,
+                    "mtime_ns": mtime_ns,
+                    "digest": digest,
+                    "file": current["file"],
+                    "offset": offset,
+                    "length": length,
+                }
+            )
+            offset += length
+            current["chapters"] += 1
+            current["chars"] += chars
+            current["bytes"] = offset
+            progress.update(done)
+    finally:
+        if handle is not None:
+            handle.close()
+
+    prune_export_parts(output_path, previous_parts, {item["file"] for item in files})
+    split_label = mode if mode == "volume" else f"{mode}:{limit}"
+    manifest_path = export_manifest_path(output_path, fmt)
+    write_export_manifest(
+        output_path,
+        {
+            "version": EXPORT_MANIFEST_VERSION,
+            "format": fmt,
+            "plain_text": PLAIN_TEXT_VERSION,
+            "split_by": split_label,
+            "output": output_path.name,
+            "files": files,
+            "chapters": entries,
+        },
+    )
+    prune_plaintext_cache(cache_dir, {entry["digest"] for entry in entries})
+    if compress:
+        report_compression(
+            [output_path.with_name(item["file"]) for item in files],
+            sum(item["bytes"] for item in files),
+            time.perf_counter() - started,
+            compress,
+        )
+    print(f"[INFO] 分卷清单：{manifest_path}")
+    return files
+
+
+def markdown_to_xhtml(text: str, fallback_title: str) -> tuple[str, str]:
+    # 与 TXT 导出共用块级规范化，保证两种格式的正文内容一致；标题、分隔线与加粗保留结构。
+    title = ""
+    body: list[str] = []
+    for kind, level, line in markdown_blocks(text):
+        if kind == "heading":
+            title = title or markdown_inline_plain(line)
+            body.append(f"<h{level}>{markdown_inline_xhtml(line)}</h{level}>")
+        elif kind == "rule":
+            body.append("<hr/>")
+        elif kind in ("table", "text"):
+            paragraph = markdown_inline_xhtml(line)
+            if paragraph:
+                body.append(f"<p>{paragraph}</p>")
+    return title or fallback_title, "\n".join(body)
+
+
+def convert_chapter_epub(job: tuple[int, str]) -> tuple[int, str, bytes]:
+    chapter, path_text = job
+    path = Path(path_text)
+    title, body = markdown_to_xhtml(path.read_text(encoding="utf-8-sig"), path.stem)
+    document = EPUB_CHAPTER_TEMPLATE.format(title=html.escape(title, quote=False), body=body)
+    return chapter, title, document.encode("utf-8")
+
+
+def ordered_parallel_map(
+    func: Callable[[Any], Any],
+    items: list[Any],
+    jobs: int,
+) -> Iterator[Any]:
+    # 多进程转换但按输入顺序产出；在途任务数有上限，避免整本结果堆积在内存里。
+    if jobs <= 1:
+        for item in items:
+            yield func(item)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending: deque[Future[Any]] = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= jobs * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def export_jobs(requested: int | None, chapter_count: int) -> int:
+    if requested is not None:
+        return max(1, requested)
+    if chapter_count < EXPORT_PARALLEL_MIN_CHAPTERS:
+        return 1
+    return os.cpu_count() or 1
+
+
+def epub_epoch() -> int:
+    # 遵循 SOURCE_DATE_EPOCH 约定；未设置时用固定时间，保证相同输入得到相同字节。
+    value = os.environ.get("SOURCE_DATE_EPOCH", "")
+    return max(int(value), EPUB_DEFAULT_EPOCH) if value.isdigit() else EPUB_DEFAULT_EPOCH
+
+
+def zip_entry(name: str, compress: bool = True) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name, date_time=datetime.fromtimestamp(epub_epoch(), timezone.utc).timetuple()[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    info.create_system = 3
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def write_zip_lines(archive: zipfile.ZipFile, name: str, lines: Iterable[str]) -> None:
+    with archive.open(zip_entry(name), "w") as entry:
+        for line in lines:
+            entry.write(line.encode("utf-8"))
+
+
+def epub_package_lines(
+    title: str,
+    author: str,
+    identifier: str,
+    toc: list[tuple[int, str]],
+) -> Iterator[str]:
+    modified = datetime.fromtimestamp(epub_epoch(), timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    yield '<?xml version="1.0" encoding="utf-8"?>\n'
+    yield (
+        '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" '
+        'unique-identifier="book-id" xml:lang="zh-CN">\n'
+    )
+    yield '  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+    yield f'    <dc:identifier id="book-id">{identifier}</dc:identifier>\n'
+    yield f"    <dc:title>{html.escape(title, quote=False)}</dc:title>\n"
+    yield "    <dc:language>zh-CN</dc:language>\n"
+    if author:
+        yield f"    <dc:creator>{html.escape(author, quote=False)}</dc:creator>\n"
+    yield f'    <meta property="dcterms:modified">{modified}</meta>\n'
+    yield "  </metadata>\n  <manifest>\n"
+    yield '    <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>\n'
+    yield '    <item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>\n'
+    yield '    <item id="css" href="style.css" media-type="text/css"/>\n'
+    for chapter, _ in toc:
+        yield (
+            f'    <item id="ch{chapter:04d}" href="text/ch{chapter:04d}.xhtml" '
+            'media-type="application/xhtml+xml"/>\n'
+        )
+    yield '  </manifest>\n  <spine toc="ncx">\n'
+    for chapter, _ in toc:
+        yield f'    <itemref idref="ch{chapter:04d}"/>\n'
+    yield "  </spine>\n</package>\n"
+
+
+def epub_nav_lines(title: str, toc: list[tuple[int, str]]) -> Iterator[str]:
+    yield '<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n'
+    yield (
+        '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" '
+        'xml:lang="zh-CN" lang="zh-CN">\n'
+    )
+    yield f"<head><title>{html.escape(title, quote=False)}</title></head>\n<body>\n"
+    yield '<nav epub:type="toc" id="toc">\n<h1>目录</h1>\n<ol>\n'
+    for chapter, chapter_title in toc:
+        yield (
+            f'<li><a href="text/ch{chapter:04d}.xhtml">'
+            f"{html.escape(chapter_title, quote=False)}</a></li>\n"
+        )
+    yield "</ol>\n</nav>\n</body>\n</html>\n"
+
+
+def epub_ncx_lines(title: str, identifier: str, toc: list[tuple[int, str]]) -> Iterator[str]:
+    yield '<?xml version="1.0" encoding="utf-8"?>\n'
+    yield '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">\n'
+    yield f'<head><meta name="dtb:uid" content="{identifier}"/></head>\n'
+    yield f"<docTitle><text>{html.escape(title, quote=False)}</text></docTitle>\n<navMap>\n"
+    for order, (chapter, chapter_title) in enumerate(toc, start=1):
+        yield (
+            f'<navPoint id="nav{chapter:04d}" playOrder="{order}">'
+            f"<navLabel><text>{html.escape(chapter_title, quote=False)}</text></navLabel>"
+            f'<content src="text/ch{chapter:04d}.xhtml"/></navPoint>\n'
+        )
+    yield "</navMap>\n</ncx>\n"
+
+
+def export_epub(
+    chapter_files: dict[int, Path],
+    output_path: Path,
+    title: str,
+    author: str,
+    jobs: int,
+) -> int:
+    # 章节 XHTML 逐个写入 zip 条目，目录与 OPF 在最后按收集到的标题生成；
+    # 固定时间戳、权限与条目顺序，相同输入得到逐字节相同的文件。
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = output_path.with_name(output_path.name + ".tmp")
+    jobs_list = [(chapter, str(chapter_files[chapter])) for chapter in sorted(chapter_files)]
+    progress = ExportProgress(len(jobs_list))
+    identity = hashlib.sha256(title.encode("utf-8"))
+    toc: list[tuple[int, str]] = []
+    with zipfile.ZipFile(temp_path, "w") as archive:
+        archive.writestr(zip_entry("mimetype", compress=False), "application/epub+zip")
+        archive.writestr(zip_entry("META-INF/container.xml"), EPUB_CONTAINER)
+        archive.writestr(zip_entry("OEBPS/style.css"), EPUB_STYLE)
+        for done, (chapter, chapter_title, document) in enumerate(
+            ordered_parallel_map(convert_chapter_epub, jobs_list, jobs), start=1
+        ):
+            with archive.open(zip_entry(f"OEBPS/text/ch{chapter:04d}.xhtml"), "w") as entry:
+                entry.write(document)
+            identity.update(document)
+            toc.append((chapter, chapter_title))
+            progress.update(done)
+        identifier = f"urn:uuid:{uuid.UUID(bytes=identity.digest()[:16], version=5)}"
+        write_zip_lines(archive, "OEBPS/content.opf", epub_package_lines(title, author, identifier, toc))
+        write_zip_lines(archive, "OEBPS/nav.xhtml", epub_nav_lines(title, toc))
+        write_zip_lines(archive, "OEBPS/toc.ncx", epub_ncx_lines(title, identifier, toc))
+    temp_path.replace(output_path)
+    return len(toc)
+
+
+def build_dataset_record(job: tuple[int, str, str, str, str, dict[str, Any] | None]) -> tuple[int, str, bytes]:
+    # 进程池工作函数：读取单章正文与 .engine 中间件，返回一行 JSON 的字节串。
+    chapter, path_text, context_text, storyboard_text, suboutline, gate = job
+
+    def read_optional(path_value: str) -> str | None:
+        path = Path(path_value)
+        return path.read_text(encoding="utf-8-sig") if path.is_file() else None
+
+    path = Path(path_text)
+    text = path.read_text(encoding="utf-8-sig")
+    digest = text_digest(text)
+    heading_match = CHAPTER_HEADING_RE.search(text)
+    plain = plain_chapter(text)
+    average, ratio, first_person = prose_metrics(plain.prose)
+    if gate is not None:
+        gate = dict(gate, stale=gate.pop("digest") != digest)
+    record = {
+        "chapter": chapter,
+        "name": path.name,
+        "digest": digest,
+        "title": heading_match.group(0).lstrip("#").strip() if heading_match else "",
+        "context": read_optional(context_text),
+        "storyboard": read_optional(storyboard_text),
+        "suboutline": suboutline,
+        "text": text,
+        "metrics": {
+            "char_count": plain.char_count,
+            "paragraphs": len(split_paragraphs(text)),
+            "sentence_length": round(average, 2),
+            "dialogue_ratio": round(ratio, 2),
+            "first_person_per_mille": round(first_person, 2),
+            "gate": gate,
+        },
+    }
+    return chapter, digest, (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def load_gate_runs(project_dir: Path) -> dict[int, dict[str, Any]]:
+    conn = open_metrics_db(project_dir)
+    try:
+        rows = conn.execute(
+            "SELECT chapter, digest, status, passed, warned, failed, run_at FROM gate_runs"
+        ).fetchall()
+    finally:
+        conn.close()
+    return {
+        row[0]: {
+            "digest": row[1],
+            "status": row[2],
+            "passed": row[3],
+            "warned": row[4],
+            "failed": row[5],
+            "run_at": row[6],
+        }
+        for row in rows
+    }
+
+
+def export_dataset(
+    project_dir: Path,
+    chapter_files: dict[int, Path],
+    output_path: Path,
+    shard_bytes: int,
+    jobs: int,
+) -> list[dict[str, Any]]:
+    # 每章一行 JSON，按章节顺序写入分片；当前分片写满 shard_bytes 后换新文件，单行不拆分。
+    # 子大纲小节与门禁记录体积小，先在主进程读好随任务下发；正文与中间件由工作进程各自读取。
+    fmt = "jsonl-dataset"
+    previous_parts = previous_export_parts(output_path, fmt)
+    sections = load_suboutline_sections(project_dir)
+    gate_runs = load_gate_runs(project_dir)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    dataset_jobs = [
+        (
+            chapter,
+            str(chapter_files[chapter]),
+            str(context_file(project_dir, chapter)),
+            str(storyboard_file(project_dir, chapter)),
+            sections.get(chapter, ""),
+            gate_runs.get(chapter),
+        )
+        for chapter in sorted(chapter_files)
+    ]
+    files: list[dict[str, Any]] = []
+    entries: list[dict[str, Any]] = []
+    handle: Any = None
+    progress = ExportProgress(len(dataset_jobs))
+    try:
+        for done, (chapter, digest, line) in enumerate(
+            ordered_parallel_map(build_dataset_record, dataset_jobs, jobs), start=1
+        ):
+            current = files[-1] if files else None
+            if current is None or (current["records"] and current["bytes"] + len(line) > shard_bytes):
+                if handle is not None:
+                    handle.close()
+                shard_path = split_output_path(output_path, len(files) + 1, "")
+                handle = shard_path.open("wb")
+                current = {"file": shard_path.name, "records": 0, "bytes": 0}
+                files.append(current)
+            handle.write(line)
+            path = chapter_files[chapter]
+            stat = path.stat()
+            entries.append(
+                {
+                    "chapter": chapter,
+                    "name": path.name,
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "digest": digest,
+                    "file": current["file"],
+                    "offset": current["bytes"],
+                    "length": len(line),
+                }
+            )
+            current["records"] += 1
+            current["bytes"] += len(line)
+            progress.update(done)
+    finally:
+        if handle is not None:
+            handle.close()
+
+    prune_export_parts(output_path, previous_parts, {item["file"] for item in files})
+    write_export_manifest(
+        output_path,
+        {
+            "version": EXPORT_MANIFEST_VERSION,
+            "format": fmt,
+            "shard_bytes": shard_bytes,
+            "output": output_path.name,
+            "files": files,
+            "chapters": entries,
+        },
+    )
+    print(f"[INFO] 数据集清单：{export_manifest_path(output_path)}")
+    return files
+
+
+@dataclass
+class ExportSnapshot:
+    label: str
+    kind: str
+    base_dir: Path
+    chapters: dict[int, dict[str, Any]]
+    output: str = ""
+
+
+def load_export_snapshot(target: Path) -> ExportSnapshot | None:
+    # 快照可以是项目目录（现场计算各章哈希）、导出文件或其清单；清单里已有每章哈希与偏移，无需读全文。
+    chapters_dir = target / "正文" if (target / "正文").is_dir() else target
+    if target.is_dir():
+        chapter_files, _ = collect_chapter_files(chapters_dir)
+        chapters: dict[int, dict[str, Any]] = {}
+        for chapter, path in chapter_files.items():
+            raw = path.read_bytes()
+            chapters[chapter] = {
+                "chapter": chapter,
+                "name": path.name,
+                "digest": hashlib.sha256(raw).hexdigest()[:16],
+                "path": str(path),
+            }
+        return ExportSnapshot(str(target), "project", chapters_dir, chapters)
+    if target.name.endswith(".manifest.json"):
+        candidates = [target]
+    else:
+        # 同一输出路径可能分别做过整本与分卷导出，两份清单都在时取最近写入的一份。
+        candidates = [export_manifest_path(target), export_manifest_path(target, "txt-split")]
+    existing = [path for path in candidates if path.is_file()]
+    if not existing:
+        return None
+    manifest_path = max(existing, key=lambda path: path.stat().st_mtime_ns)
+    try:
+        manifest = json.loads(read_utf8(manifest_path))
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != EXPORT_MANIFEST_VERSION or "chapters" not in manifest:
+        return None
+    return ExportSnapshot(
+        str(target),
+        str(manifest.get("format", "")),
+        manifest_path.parent,
+        {int(entry["chapter"]): entry for entry in manifest["chapters"]},
+        str(manifest.get("output", "")),
+    )
+
+
+def read_snapshot_texts(snapshot: ExportSnapshot, chapters: list[int]) -> dict[int, str]:
+    # 只读取需要比对的章节：按文件分组、按偏移升序读取，压缩文件也只需向前解压一遍。
+    if snapshot.kind == "project":
+        return {
+            chapter: Path(snapshot.chapters[chapter]["path"]).read_text(encoding="utf-8-sig")
+            for chapter in chapters
+        }
+    by_file: dict[str, list[dict[str, Any]]] = {}
+    for chapter in chapters:
+        entry = snapshot.chapters[chapter]
+        by_file.setdefault(entry.get("file") or snapshot.output, []).append(entry)
+    texts: dict[int, str] = {}
+    for name, entries in by_file.items():
+        path = snapshot.base_dir / name
+        if path.suffix == EXPORT_COMPRESSORS["xz"]:
+            handle: Any = lzma.open(path, "rb")
+        elif path.suffix == EXPORT_COMPRESSORS["gz"]:
+            handle = gzip.open(path, "rb")
+        else:
+            handle = path.open("rb")
+        with handle:
+            for entry in sorted(entries, key=lambda item: item["offset"]):
+                handle.seek(entry["offset"])
+                block = handle.read(entry["length"]).decode("utf-8", errors="replace")
+                if snapshot.kind == "jsonl-dataset":
+                    texts[entry["chapter"]] = json.loads(block)["text"]
+                else:
+                    header = f"\n{EXPORT_SEPARATOR}\n{entry['name']}\n{EXPORT_SEPARATOR}\n"
+                    texts[entry["chapter"]] = block[len(header):-1] if block.startswith(header) else block
+    return texts
+
+
+def diff_chapter_lines(old: str, new: str, context: int) -> tuple[int, int, list[str]]:
+    lines = list(difflib.unified_diff(old.splitlines(), new.splitlines(), n=context, lineterm=""))[2:]
+    added = sum(1 for line in lines if line.startswith("+"))
+    removed = sum(1 for line in lines if line.startswith("-"))
+    return added, removed, lines
+
+
+def cmd_export_diff(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    snapshots: list[ExportSnapshot] = []
+    for target in (args.old, args.new):
+        snapshot = load_export_snapshot(Path(target).resolve())
+        if snapshot is None:
+            print(f"[FAIL] 无法读取快照：{target}（需要项目目录、带清单的导出文件或 .manifest.json）")
+            return 2
+        snapshots.append(snapshot)
+    old, new = snapshots
+    for snapshot, side in ((old, "旧"), (new, "新")):
+        print(f"[INFO] {side}：{snapshot.label}（{snapshot.kind}，{len(snapshot.chapters)} 章）")
+
+    modified = [
+        chapter
+        for chapter in sorted(old.chapters.keys() & new.chapters.keys())
+        if old.chapters[chapter]["digest"] != new.chapters[chapter]["digest"]
+    ]
+    added = sorted(new.chapters.keys() - old.chapters.keys())
+    removed = sorted(old.chapters.keys() - new.chapters.keys())
+    # 删掉的章节与新增章节内容相同，视为整章挪动了编号。
+    removed_by_digest = {old.chapters[chapter]["digest"]: chapter for chapter in removed}
+    moved = [
+        (removed_by_digest[new.chapters[chapter]["digest"]], chapter)
+        for chapter in added
+        if new.chapters[chapter]["digest"] in removed_by_digest
+    ]
+    added = [chapter for chapter in added if chapter not in {target for _, target in moved}]
+    removed = [chapter for chapter in removed if chapter not in {source for source, _ in moved}]
+    unchanged = len(old.chapters.keys() & new.chapters.keys()) - len(modified)
+
+    old_texts = read_snapshot_texts(old, modified)
+    new_texts = read_snapshot_texts(new, modified + added)
+    # 一侧是 TXT 纯文本导出、另一侧是 Markdown 原文时，先规范化再比，避免格式差异淹没内容改动。
+    mixed = old.kind.startswith("txt") != new.kind.startswith("txt")
+
+    def comparable(snapshot: ExportSnapshot, text: str) -> str:
+        return normalize_markdown(text) if mixed and not snapshot.kind.startswith("txt") else text
+
+    for chapter in modified:
+        plus, minus, lines = diff_chapter_lines(
+            comparable(old, old_texts[chapter]), comparable(new, new_texts[chapter]), args.context
+        )
+        print(f"第{chapter:03d}章  修改  +{plus} -{minus}")
+        if args.stat:
+            continue
+        for line in lines[: args.max_lines]:
+            print(f"  {line}")
+        if len(lines) > args.max_lines:
+            print(f"  …（另有 {len(lines) - args.max_lines} 行差异未显示）")
+    for chapter in added:
+        text = new_texts[chapter]
+        count = count_non_whitespace(text if new.kind.startswith("txt") else normalize_markdown(text))
+        print(f"第{chapter:03d}章  新增  {count} 字")
+    for chapter in removed:
+        print(f"第{chapter:03d}章  删除")
+    for source, target in moved:
+        print(f"第{source:03d}章 → 第{target:03d}章  移动（内容未变）")
+
+    changed = len(modified) + len(added) + len(removed) + len(moved)
+    summary = (
+        f"修改 {len(modified)} 章，新增 {len(added)} 章，删除 {len(removed)} 章，"
+        f"移动 {len(moved)} 章，未变 {unchanged} 章，耗时 {time.perf_counter() - started:.2f} 秒"
+    )
+    print(f"[{'WARN' if changed else 'PASS'}] {summary}")
+    return 1 if changed else 0
+
+
+def cmd_export(args: argparse.Namespace) -> int:
+    project_dir = Path(args.project).resolve()
+    chapters_dir = project_dir / "正文"
+    if not chapters_dir.is_dir():
+        print(f"[FAIL] 找不到正文目录：{chapters_dir}")
+        return 2
+    chapter_files, invalid_names = collect_chapter_files(chapters_dir)
+    if not chapter_files:
+        print(f"[FAIL] 未找到任何章节文件：{chapters_dir}")
+        return 2
+    if invalid_names:
+        print(f"[WARN] 跳过 {len(invalid_names)} 个不符合 第NNN章.md 命名的文件")
+    if args.format != "txt" and (args.split_by is not None or args.compress):
+        print("[FAIL] --split-by 与 --compress 仅支持 TXT 导出。")
+        return 2
+    packed = EXPORT_COMPRESSORS[args.compress] if args.compress else ""
+    output_path = (
+        Path(args.out).resolve()
+        if args.out
+        else project_dir / f"全文导出{EXPORT_FORMATS[args.format]}{packed}"
+    )
+    jobs = export_jobs(args.jobs, len(chapter_files))
+    if args.format == "epub":
+        written = export_epub(
+            chapter_files, output_path, args.title or project_dir.name, args.author, jobs
+        )
+        print(f"[PASS] 已导出 EPUB，共 {written} 章：{output_path}")
+        return 0
+    if args.format == "jsonl-dataset":
+        files = export_dataset(project_dir, chapter_files, output_path, args.shard_size, jobs)
+        for item in files:
+            print(f"[INFO] {item['file']}：{item['records']} 条，{item['bytes']} 字节")
+        print(f"[PASS] 已导出数据集 {len(chapter_files)} 条为 {len(files)} 个分片")
+        return 0
+    if args.split_by is not None:
+        volumes: dict[int, str] = {}
+        if args.split_by[0] == "volume":
+            volumes = load_volume_map(project_dir)
+            if not volumes:
+                print("[FAIL] 02-子大纲.md 中未找到“第N卷”标题，无法按卷拆分。")
+                return 2
+        files = export_split(
+            chapter_files,
+            output_path,
+            engine_cache_dir(project_dir) / "plaintext",
+            args.split_by,
+            volumes,
+            jobs,
+            args.compress,
+            args.level,
+        )
+        for item in files:
+            print(f"[INFO] {item['file']}：{item['chapters']} 章，{item['chars']} 字，{item['bytes']} 字节")
+        print(f"[PASS] 已拆分导出 {len(chapter_files)} 章为 {len(files)} 个文件")
+        return 0
+    mode, written = export_txt(
+        chapter_files,
+        output_path,
+        engine_cache_dir(project_dir) / "plaintext",
+        args.full,
+        jobs,
+        args.compress,
+        args.level,
+    )
+    print(f"[PASS] {mode}，写入 {written} 章：{output_path}")
+    return 0
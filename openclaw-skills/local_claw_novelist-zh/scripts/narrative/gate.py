@@ -0,0 +1,1618 @@
+from __future__ import annotations
+
+import argparse
+import bisect
+import csv
+import json
+import os
+import re
+import sqlite3
+import struct
+import subprocess
+import sys
+import zlib
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+from .core import (
+    CACHE_SCHEMA_VERSION,
+    CHAPTER_HEADING_RE,
+    DONE_STATUSES,
+    FORESHADOW_ID_RE,
+    HEADING_SUFFIX_RE,
+    INACTIVE_STATUSES,
+    SKILL_ROOT,
+    STYLE_FIELD_RE,
+    STYLE_ITEM_RE,
+    WHITESPACE_RE,
+    CheckResult,
+    PlainChapter,
+    ReaderLedger,
+    StyleRules,
+    cached_build,
+    cached_parse,
+    changed_chapter_files,
+    chapter_file,
+    collect_chapter_files,
+    count_non_whitespace,
+    extract_chapter_num,
+    load_reader_ledger,
+    load_role_state_index,
+    load_rows,
+    load_style_rules,
+    load_suboutline_sections,
+    normalize_id,
+    normalize_status,
+    open_cache_db,
+    open_metrics_db,
+    parse_markdown_tables,
+    plain_chapter,
+    print_results,
+    prose_metrics,
+    read_utf8,
+    results_summary,
+    safe_cell,
+    split_paragraphs,
+    split_phrases,
+    storyboard_file,
+    table_records,
+    text_digest,
+    workspace_checks,
+)
+
+PLACEHOLDER_SNIPPETS = [
+    "<章节标题>",
+    "（在此写正文）",
+    "(在此写正文)",
+    "在此写正文",
+]
+
+STORYBOARD_REQUIRED_HEADINGS = [
+    "## 场景清单",
+    "## 章节描写规约（硬约束）",
+]
+STORYBOARD_SCENE_HEADING_RE = re.compile(r"^###\s*场景\s*\d+", re.M)
+
+POV_FIRST_PERSON_LIMIT = 3.0
+
+PARAGRAPH_MIN_CHARS = 40
+SHINGLE_SIZE = 5
+MINHASH_BANDS = 8
+MINHASH_ROWS = 4
+MINHASH_PERMUTATIONS = MINHASH_BANDS * MINHASH_ROWS
+# 段落 LSH 索引的全部构建参数；任何一项变化都会使 paragraph-lsh 缓存整体重建。
+MINHASH_INDEX_PARAMS = (
+    f"shingle={SHINGLE_SIZE}:bands={MINHASH_BANDS}:rows={MINHASH_ROWS}:min={PARAGRAPH_MIN_CHARS}"
+)
+NEAR_DUPLICATE_THRESHOLD = 0.7
+NEAR_DUPLICATE_EXAMPLES = 5
+
+NGRAM_SIZE = 12
+NGRAM_WITHIN_THRESHOLD = 3
+NGRAM_CROSS_THRESHOLD = 3
+NGRAM_WINDOW_CHAPTERS = 10
+NGRAM_EXAMPLES = 5
+ROLLING_HASH_BASE = 1_000_003
+ROLLING_HASH_MOD = (1 << 61) - 1
+
+SETTING_TERM_COLUMNS = ("名称", "角色")
+SETTING_ALIAS_COLUMNS = ("别名", "曾用名")
+TERM_VARIANT_MIN_CHARS = 4
+TERM_EXAMPLES = 5
+TERM_CHAR_RE = re.compile(r"[\w\u3400-\u9fff]")
+
+PHRASE_LIST_FILE = "03-禁用表达.txt"
+PHRASE_HIT_EXAMPLES = 20
+
+SCENE_ALIGNMENT_FIELDS = ("时间/地点", "出场角色", "伏笔操作")
+SCENE_SEGMENT_CHARS = 300
+SCENE_ALIGNMENT_THRESHOLD = 0.35
+SIGNATURE_CHAR_RE = re.compile(r"[^\w\u3400-\u9fff]+")
+FORESHADOW_TOUCH_THRESHOLD = 0.6
+FORESHADOW_TOUCH_EXAMPLES = 5
+
+
+def check_style_rules(prose: str, rules: StyleRules) -> list[CheckResult]:
+    checks: list[CheckResult] = []
+    average, ratio, first_person = prose_metrics(prose)
+    if rules.sentence_length:
+        low, high = rules.sentence_length
+        status = "PASS" if low <= average <= high else "WARN"
+        checks.append(
+            CheckResult(
+                "style_sentence_length",
+                "风格卡句长",
+                status,
+                f"叙述平均句长 {average:.1f} 字，目标 {low}-{high} 字",
+            )
+        )
+    if rules.dialogue_ratio:
+        low, high = rules.dialogue_ratio
+        status = "PASS" if low <= ratio <= high else "WARN"
+        checks.append(
+            CheckResult(
+                "style_dialogue_ratio",
+                "风格卡对话占比",
+                status,
+                f"对话占比 {ratio:.1f}%，目标 {low}%-{high}%",
+            )
+        )
+    if rules.pov.startswith("第三") and first_person > POV_FIRST_PERSON_LIMIT:
+        checks.append(
+            CheckResult(
+                "style_pov",
+                "风格卡视角",
+                "WARN",
+                f"风格卡要求第三人称，但叙述中“我”出现密度为每千字 {first_person:.1f} 次。",
+            )
+        )
+    elif rules.pov.startswith("第一") and first_person == 0.0:
+        checks.append(CheckResult("style_pov", "风格卡视角", "WARN", "风格卡要求第一人称，但叙述中未出现“我”。"))
+    elif rules.pov:
+        checks.append(CheckResult("style_pov", "风格卡视角", "PASS", f"叙述视角与“{rules.pov}”一致"))
+    return checks
+
+
+def run_foreshadow_stats(project_dir: Path, chapter: int) -> tuple[bool, str]:
+    script_path = SKILL_ROOT / "scripts" / "foreshadow_stats.py"
+    csv_path = project_dir / "05-长线伏笔.csv"
+    out_path = project_dir / "06-长线统计.md"
+    command = [
+        sys.executable,
+        str(script_path),
+        "--csv",
+        str(csv_path),
+        "--out",
+        str(out_path),
+        "--current-chapter",
+        str(chapter),
+    ]
+    process = subprocess.run(command, capture_output=True, text=True)
+    if process.returncode != 0:
+        detail = process.stderr.strip() or process.stdout.strip() or "未知错误"
+        return False, detail
+    return True, process.stdout.strip() or f"已更新 {out_path}"
+
+
+def check_reader_budget(ledger: ReaderLedger, chapter: int) -> list[CheckResult]:
+    checks: list[CheckResult] = []
+    fresh = [item for item in ledger.items.values() if item.first_chapter == chapter]
+    fresh_info = [item for item in fresh if item.kind == "info"]
+    new_hard = sum(1 for item in fresh_info if "新增" in item.info_type)
+    misleading = sum(1 for item in fresh_info if "误导" in item.info_type)
+    new_suspense = sum(1 for item in fresh if item.kind == "suspense")
+    closed_suspense = sum(
+        1
+        for item in ledger.items.values()
+        if item.kind == "suspense" and item.closed_chapter == chapter
+    )
+
+    budgets = [
+        ("单章新增硬设定上限", "budget_new_hard_facts", "读者面预算：新增硬设定", new_hard, "max"),
+        ("单章新增悬念上限", "budget_new_suspense", "读者面预算：新增悬念", new_suspense, "max"),
+        (
+            "单章必须回收旧悬念下限",
+            "budget_closed_suspense",
+            "读者面预算：回收旧悬念",
+            closed_suspense,
+            "min",
+        ),
+    ]
+    for prefix, key, label, actual, bound in budgets:
+        limit = ledger.setting(prefix, chapter)
+        if limit is None:
+            continue
+        if bound == "max" and actual > limit:
+            checks.append(CheckResult(key, label, "WARN", f"本章 {actual} 条，超过上限 {limit}。"))
+        elif bound == "min" and actual < limit:
+            checks.append(CheckResult(key, label, "WARN", f"本章 {actual} 条，低于下限 {limit}。"))
+        else:
+            checks.append(CheckResult(key, label, "PASS", f"本章 {actual} 条，限额 {limit}。"))
+
+    misleading_limit = ledger.setting("误导信息占比上限", chapter)
+    if misleading_limit is not None and fresh_info:
+        ratio = misleading / len(fresh_info) * 100.0
+        if ratio > misleading_limit:
+            checks.append(
+                CheckResult(
+                    "budget_misleading_ratio",
+                    "读者面预算：误导信息占比",
+                    "WARN",
+                    f"本章误导信息占比 {ratio:.0f}%，超过上限 {misleading_limit}%。",
+                )
+            )
+        else:
+            checks.append(
+                CheckResult(
+                    "budget_misleading_ratio",
+                    "读者面预算：误导信息占比",
+                    "PASS",
+                    f"本章误导信息占比 {ratio:.0f}%，上限 {misleading_limit}%。",
+                )
+            )
+
+    overdue = [
+        item.item_id
+        for item in ledger.open_items("suspense", chapter)
+        if item.planned_chapter is not None and item.planned_chapter < chapter
+    ]
+    if overdue:
+        checks.append(
+            CheckResult(
+                "suspense_overdue",
+                "读者面悬念逾期",
+                "WARN",
+                f"存在 {len(overdue)} 条超过计划回应章节的悬念：{', '.join(overdue[:10])}",
+            )
+        )
+    return checks
+
+
+def check_storyboard_quality(storyboard_text: str, min_scenes: int) -> list[CheckResult]:
+    checks: list[CheckResult] = []
+    missing_headings = [
+        heading for heading in STORYBOARD_REQUIRED_HEADINGS if heading not in storyboard_text
+    ]
+    if missing_headings:
+        checks.append(
+            CheckResult(
+                "storyboard_sections",
+                "分镜纲结构完整性",
+                "FAIL",
+                f"缺少区块：{', '.join(missing_headings)}",
+            )
+        )
+    else:
+        checks.append(CheckResult("storyboard_sections", "分镜纲结构完整性", "PASS", "结构完整"))
+
+    scene_count = len(STORYBOARD_SCENE_HEADING_RE.findall(storyboard_text))
+    if scene_count < min_scenes:
+        checks.append(
+            CheckResult(
+                "storyboard_scene_count",
+                "分镜场景数",
+                "FAIL",
+                f"仅识别到 {scene_count} 个场景，低于门禁下限 {min_scenes}。",
+            )
+        )
+    else:
+        checks.append(
+            CheckResult("storyboard_scene_count", "分镜场景数", "PASS", f"已识别 {scene_count} 个场景")
+        )
+
+    field_checks = {
+        "场景目的：": ("purpose", "场景目的字段"),
+        "冲突/阻力：": ("conflict", "冲突字段"),
+        "信息投放（新增/确认/误导/保留）：": ("information", "信息投放字段"),
+        "结尾钩子（把角色推入下一场景）：": ("hook", "结尾钩子字段"),
+    }
+    for token, (key, label) in field_checks.items():
+        count = storyboard_text.count(token)
+        if count < scene_count:
+            checks.append(
+                CheckResult(
+                    f"storyboard_field_{key}",
+                    f"分镜字段覆盖：{label}",
+                    "WARN",
+                    f"字段出现 {count} 次，少于场景数 {scene_count}。",
+                )
+            )
+        else:
+            checks.append(CheckResult(f"storyboard_field_{key}", f"分镜字段覆盖：{label}", "PASS", "覆盖完整"))
+    return checks
+
+
+def char_bigrams(text: str) -> set[str]:
+    compact = SIGNATURE_CHAR_RE.sub("", text)
+    return {compact[pos : pos + 2] for pos in range(len(compact) - 1)}
+
+
+def parse_storyboard_scenes(storyboard_text: str) -> list[dict[str, Any]]:
+    scenes: list[dict[str, Any]] = []
+    current: dict[str, Any] | None = None
+    for raw_line in storyboard_text.splitlines():
+        line = raw_line.strip()
+        if STORYBOARD_SCENE_HEADING_RE.match(line):
+            current = {"title": HEADING_SUFFIX_RE.sub("", line.lstrip("#").strip()), "fields": {}}
+            scenes.append(current)
+            continue
+        if line.startswith("#"):
+            current = None
+            continue
+        item_match = STYLE_ITEM_RE.match(line)
+        if current is None or not item_match:
+            continue
+        field_match = STYLE_FIELD_RE.match(item_match.group(1).strip())
+        if field_match and field_match.group(2).strip():
+            current["fields"][field_match.group(1).strip()] = field_match.group(2).strip()
+    return scenes
+
+
+def chapter_segments(text: str) -> list[dict[str, Any]]:
+    # 按段落累积到约 SCENE_SEGMENT_CHARS 字切分正文，每段保存字符二元组签名。
+    segments: list[dict[str, Any]] = []
+    line = 0
+    block: list[str] = []
+    for paragraph_line, paragraph in split_paragraphs(text):
+        if not block:
+            line = paragraph_line
+        block.append(paragraph)
+        if count_non_whitespace("".join(block)) >= SCENE_SEGMENT_CHARS:
+            segments.append({"line": line, "grams": sorted(char_bigrams("".join(block)))})
+            block = []
+    if block:
+        segments.append({"line": line, "grams": sorted(char_bigrams("".join(block)))})
+    return segments
+
+
+def align_scenes(scores: list[list[float]]) -> list[int]:
+    # 场景在正文中应按顺序出现：动态规划求段落下标单调不减、覆盖率之和最大的对齐。
+    if not scores or not scores[0]:
+        return []
+    best = [scores[0][:]]
+    choice: list[list[int]] = [[0] * len(scores[0])]
+    for row in scores[1:]:
+        previous = best[-1]
+        prefix_max = 0
+        totals: list[float] = []
+        picks: list[int] = []
+        for segment, score in enumerate(row):
+            if previous[segment] > previous[prefix_max]:
+                prefix_max = segment
+            totals.append(previous[prefix_max] + score)
+            picks.append(prefix_max)
+        best.append(totals)
+        choice.append(picks)
+    segment = max(range(len(best[-1])), key=lambda pos: best[-1][pos])
+    path = [segment]
+    for picks in reversed(choice[1:]):
+        segment = picks[segment]
+        path.append(segment)
+    return path[::-1]
+
+
+def build_foreshadow_signatures(csv_text: str) -> dict[str, Any]:
+    # 每行伏笔内容的字符二元组建倒排表，匹配时只对命中过二元组的行计分。
+    rows: list[dict[str, Any]] = []
+    postings: dict[str, list[int]] = {}
+    for row in csv.DictReader(csv_text.splitlines()):
+        row_id = normalize_id(row.get("id", "") or "")
+        status = normalize_status(row.get("状态", "") or "")
+        grams = sorted(char_bigrams(row.get("伏笔内容", "") or ""))
+        if not row_id or not grams or status in INACTIVE_STATUSES:
+            continue
+        for gram in grams:
+            postings.setdefault(gram, []).append(len(rows))
+        rows.append(
+            {
+                "id": row_id,
+                "content": (row.get("伏笔内容", "") or "").strip(),
+                "people": [
+                    name for name in split_phrases(row.get("关联人物", "") or "") if len(name) >= 2
+                ],
+                "planted": extract_chapter_num(row.get("首次埋设章节", "") or ""),
+                "recovered": extract_chapter_num(row.get("实际回收章节", "") or ""),
+                "size": len(grams),
+            }
+        )
+    return {"rows": rows, "postings": postings}
+
+
+def find_foreshadow_touches(
+    signatures: dict[str, Any],
+    text: str,
+) -> list[tuple[int, int, float]]:
+    rows: list[dict[str, Any]] = signatures["rows"]
+    postings: dict[str, list[int]] = signatures["postings"]
+    best: dict[int, tuple[int, int, float]] = {}
+    for line, paragraph in split_paragraphs(text):
+        hits: dict[int, int] = {}
+        for gram in char_bigrams(paragraph):
+            for index in postings.get(gram, ()):
+                hits[index] = hits.get(index, 0) + 1
+        for index, count in hits.items():
+            score = count / rows[index]["size"]
+            if score >= FORESHADOW_TOUCH_THRESHOLD and (index not in best or score > best[index][2]):
+                best[index] = (index, line, score)
+    touches: list[tuple[int, int, float]] = []
+    for index, line, score in best.values():
+        people = rows[index]["people"]
+        if people and not any(name in text for name in people):
+            continue
+        touches.append((index, line, score))
+    return sorted(touches, key=lambda item: (item[1], item[0]))
+
+
+def check_foreshadow_touches(project_dir: Path, chapter: int, text: str) -> list[CheckResult]:
+    signatures = cached_parse(
+        project_dir,
+        "foreshadow-signatures",
+        project_dir / "05-长线伏笔.csv",
+        build_foreshadow_signatures,
+    )
+    if not signatures["rows"]:
+        return []
+    explicit = {normalize_id(item) for item in FORESHADOW_ID_RE.findall(text)}
+    unrecorded: list[str] = []
+    for index, line, score in find_foreshadow_touches(signatures, text):
+        row = signatures["rows"][index]
+        if row["id"] in explicit or chapter in (row["planted"], row["recovered"]):
+            continue
+        kind = "埋设" if row["planted"] is None or row["planted"] > chapter else "推进/回收"
+        unrecorded.append(
+            f"第{line}行疑似{kind} {row['id']}（{score:.2f}，“{row['content'][:20]}”）"
+        )
+    if unrecorded:
+        return [
+            CheckResult(
+                "foreshadow_implicit_touch",
+                "伏笔隐式触及",
+                "WARN",
+                f"{len(unrecorded)} 条伏笔在正文中疑似被触及但 CSV 未记录本章："
+                f"{'；'.join(unrecorded[:FORESHADOW_TOUCH_EXAMPLES])}",
+            )
+        ]
+    return [CheckResult("foreshadow_implicit_touch", "伏笔隐式触及", "PASS", "未发现未登记的伏笔触及")]
+
+
+def check_scene_alignment(project_dir: Path, chapter: int) -> list[CheckResult]:
+    storyboard_path = storyboard_file(project_dir, chapter)
+    scenes = cached_parse(
+        project_dir,
+        f"storyboard-scenes/{chapter:03d}",
+        storyboard_path,
+        parse_storyboard_scenes,
+    )
+    segments = cached_parse(
+        project_dir,
+        f"chapter-segments/{chapter:03d}",
+        chapter_file(project_dir, chapter),
+        chapter_segments,
+    )
+    csv_path = project_dir / "05-长线伏笔.csv"
+    foreshadow_text = {
+        normalize_id(row.get("id", "")): row.get("伏笔内容", "")
+        for row in (load_rows(csv_path) if csv_path.exists() else [])
+    }
+
+    targets: list[tuple[str, list[str], set[str]]] = []
+    for scene in scenes:
+        phrases: list[str] = []
+        for field in SCENE_ALIGNMENT_FIELDS:
+            value = scene["fields"].get(field, "")
+            ids = [normalize_id(item) for item in FORESHADOW_ID_RE.findall(value)]
+            value = FORESHADOW_ID_RE.sub("", value)
+            phrases.extend(phrase for phrase in split_phrases(value) if len(phrase) >= 2)
+            phrases.extend(foreshadow_text[item] for item in ids if foreshadow_text.get(item))
+        grams = set().union(*(char_bigrams(phrase) for phrase in phrases)) if phrases else set()
+        if grams:
+            targets.append((scene["title"], phrases, grams))
+    if not targets or not segments:
+        return []
+
+    segment_grams = [set(segment["grams"]) for segment in segments]
+    scores = [
+        [len(grams & other) / len(grams) for other in segment_grams]
+        for _, _, grams in targets
+    ]
+    chapter_text = read_utf8(chapter_file(project_dir, chapter))
+    unrealized: list[str] = []
+    alignment: list[str] = []
+    for (title, phrases, _), row, segment in zip(targets, scores, align_scenes(scores)):
+        alignment.append(f"{title}→第{segments[segment]['line']}行")
+        if row[segment] >= SCENE_ALIGNMENT_THRESHOLD:
+            continue
+        missing = [phrase for phrase in phrases if phrase not in chapter_text]
+        detail = f"{title}（对齐第{segments[segment]['line']}行，覆盖率 {row[segment]:.2f}"
+        if missing:
+            detail += f"，正文未出现：{'、'.join(missing[:5])}"
+        unrealized.append(detail + "）")
+    if unrealized:
+        return [
+            CheckResult(
+                "storyboard_scene_coverage",
+                "分镜场景落实",
+                "WARN",
+                f"{len(unrealized)}/{len(targets)} 个场景未在正文中落实：{'；'.join(unrealized)}",
+            )
+        ]
+    return [
+        CheckResult(
+            "storyboard_scene_coverage",
+            "分镜场景落实",
+            "PASS",
+            f"{len(targets)} 个场景均已落实：{'；'.join(alignment)}",
+        )
+    ]
+
+
+def minhash_signature(paragraph: str) -> tuple[int, ...] | None:
+    # 单次置换 MinHash（one permutation hashing）：按哈希低位分桶取桶内最小值，
+    # 每个 shingle 只处理一次；空桶向右借用最近的非空桶（densification）。
+    compact = re.sub(r"\s+", "", paragraph)
+    if len(compact) < SHINGLE_SIZE:
+        return None
+    empty = 0xFFFFFFFF
+    bins = [empty] * MINHASH_PERMUTATIONS
+    for pos in range(len(compact) - SHINGLE_SIZE + 1):
+        value = zlib.crc32(compact[pos : pos + SHINGLE_SIZE].encode("utf-8"))
+        slot = value % MINHASH_PERMUTATIONS
+        if value < bins[slot]:
+            bins[slot] = value
+    # 只从原始非空桶借值；至少有一个 shingle，循环必然终止。
+    original = tuple(bins)
+    for slot in range(MINHASH_PERMUTATIONS):
+        offset = 1
+        while bins[slot] == empty:
+            bins[slot] = original[(slot + offset) % MINHASH_PERMUTATIONS]
+            offset += 1
+    return tuple(bins)
+
+
+def minhash_bands(signature: tuple[int, ...]) -> list[int]:
+    return [
+        zlib.crc32(struct.pack(f"<{MINHASH_ROWS}I", *signature[band * MINHASH_ROWS : (band + 1) * MINHASH_ROWS]))
+        for band in range(MINHASH_BANDS)
+    ]
+
+
+def open_paragraph_index(project_dir: Path) -> sqlite3.Connection:
+    return open_cache_db(
+        project_dir,
+        "paragraph-lsh",
+        MINHASH_INDEX_PARAMS,
+        """
+        CREATE TABLE chapters (chapter INTEGER PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT);
+        CREATE TABLE paragraphs (
+            chapter INTEGER, idx INTEGER, line INTEGER, preview TEXT, signature BLOB,
+            PRIMARY KEY (chapter, idx)
+        );
+        CREATE TABLE bands (band INTEGER, key INTEGER, chapter INTEGER, idx INTEGER);
+        CREATE INDEX bands_lookup ON bands (band, key);
+        CREATE INDEX bands_chapter ON bands (chapter);
+        """,
+    )
+
+
+def sync_paragraph_index(conn: sqlite3.Connection, chapter_files: dict[int, Path]) -> int:
+    changed, removed = changed_chapter_files(conn, chapter_files)
+    for chapter in removed + list(changed):
+        conn.execute("DELETE FROM chapters WHERE chapter = ?", (chapter,))
+        conn.execute("DELETE FROM paragraphs WHERE chapter = ?", (chapter,))
+        conn.execute("DELETE FROM bands WHERE chapter = ?", (chapter,))
+    for chapter, (_, text, size, mtime_ns) in changed.items():
+        paragraph_rows = []
+        band_rows = []
+        for idx, (line, paragraph) in enumerate(split_paragraphs(text), start=1):
+            if count_non_whitespace(paragraph) < PARAGRAPH_MIN_CHARS:
+                continue
+            signature = minhash_signature(paragraph)
+            if signature is None:
+                continue
+            packed = struct.pack(f"<{MINHASH_PERMUTATIONS}I", *signature)
+            paragraph_rows.append((chapter, idx, line, paragraph[:24], packed))
+            band_rows.extend(
+                (band, key, chapter, idx) for band, key in enumerate(minhash_bands(signature))
+            )
+        conn.executemany("INSERT INTO paragraphs VALUES (?, ?, ?, ?, ?)", paragraph_rows)
+        conn.executemany("INSERT INTO bands VALUES (?, ?, ?, ?)", band_rows)
+        conn.execute(
+            "INSERT INTO chapters VALUES (?, ?, ?, ?)",
+            (chapter, size, mtime_ns, text_digest(text)),
+        )
+    conn.commit()
+    return len(changed) + len(removed)
+
+
+def find_near_duplicates(
+    conn: sqlite3.Connection,
+    chapter: int,
+) -> list[tuple[int, int, int, int, float, str]]:
+    matches: list[tuple[int, int, int, int, float, str]] = []
+    rows = conn.execute(
+        "SELECT idx, line, signature FROM paragraphs WHERE chapter = ? ORDER BY idx", (chapter,)
+    ).fetchall()
+    for idx, line, packed in rows:
+        signature = struct.unpack(f"<{MINHASH_PERMUTATIONS}I", packed)
+        candidates: set[tuple[int, int]] = set()
+        for band, key in enumerate(minhash_bands(signature)):
+            candidates.update(
+                conn.execute(
+                    "SELECT chapter, idx FROM bands WHERE band = ? AND key = ?", (band, key)
+                ).fetchall()
+            )
+        candidates.discard((chapter, idx))
+        best: tuple[int, int, int, int, float, str] | None = None
+        for other_chapter, other_idx in candidates:
+            other = conn.execute(
+                "SELECT line, preview, signature FROM paragraphs WHERE chapter = ? AND idx = ?",
+                (other_chapter, other_idx),
+            ).fetchone()
+            if other is None:
+                continue
+            other_signature = struct.unpack(f"<{MINHASH_PERMUTATIONS}I", other[2])
+            similarity = sum(
+                1 for left, right in zip(signature, other_signature) if left == right
+            ) / MINHASH_PERMUTATIONS
+            if similarity >= NEAR_DUPLICATE_THRESHOLD and (best is None or similarity > best[4]):
+                best = (line, idx, other_chapter, other[0], similarity, other[1])
+        if best is not None:
+            matches.append(best)
+    return matches
+
+
+def check_near_duplicates(project_dir: Path, chapter: int) -> list[CheckResult]:
+    chapter_files, _ = collect_chapter_files(project_dir / "正文")
+    conn = open_paragraph_index(project_dir)
+    try:
+        sync_paragraph_index(conn, chapter_files)
+        matches = find_near_duplicates(conn, chapter)
+    finally:
+        conn.close()
+    if not matches:
+        return [CheckResult("near_duplicate_paragraph", "近重复段落", "PASS", "未发现与全书其他段落近重复的段落")]
+    cross = sum(1 for match in matches if match[2] != chapter)
+    examples = "；".join(
+        f"第{line}行 ≈ 第{other_chapter:03d}章第{other_line}行（{similarity:.2f}，“{preview}…”）"
+        for line, _, other_chapter, other_line, similarity, preview in matches[:NEAR_DUPLICATE_EXAMPLES]
+    )
+    return [
+        CheckResult(
+            "near_duplicate_paragraph",
+            "近重复段落",
+            "WARN",
+            f"{len(matches)} 个段落与其他段落近重复（跨章 {cross} 个）：{examples}",
+        )
+    ]
+
+
+def compact_prose(text: str) -> str:
+    # 每段去掉空白后以换行相连；换行作为段落哨兵，rolling_hashes 不会让 n-gram 跨过它。
+    return "\n".join(WHITESPACE_RE.sub("", paragraph) for _, paragraph in split_paragraphs(text))
+
+
+def rolling_hashes(text: str, size: int = NGRAM_SIZE) -> list[tuple[int, int]]:
+    # Rabin–Karp 多项式滚动哈希：逐段计算，每个字符 O(1) 更新，返回 (起始偏移, 哈希)。
+    power = pow(ROLLING_HASH_BASE, size - 1, ROLLING_HASH_MOD)
+    hashes: list[tuple[int, int]] = []
+    offset = 0
+    for segment in text.split("\n"):
+        if len(segment) >= size:
+            codes = [ord(char) for char in segment]
+            value = 0
+            for code in codes[:size]:
+                value = (value * ROLLING_HASH_BASE + code) % ROLLING_HASH_MOD
+            hashes.append((offset, value))
+            for pos in range(size, len(codes)):
+                value = (
+                    (value - codes[pos - size] * power) * ROLLING_HASH_BASE + codes[pos]
+                ) % ROLLING_HASH_MOD
+                hashes.append((offset + pos - size + 1, value))
+        offset += len(segment) + 1
+    return hashes
+
+
+def open_ngram_index(project_dir: Path) -> sqlite3.Connection:
+    return open_cache_db(
+        project_dir,
+        "ngram-index",
+        f"{NGRAM_SIZE}:{ROLLING_HASH_BASE}:paragraph",
+        """
+        CREATE TABLE chapters (
+            chapter INTEGER PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT, hashes BLOB
+        );
+        """,
+    )
+
+
+def sync_ngram_index(conn: sqlite3.Connection, chapter_files: dict[int, Path]) -> int:
+    changed, removed = changed_chapter_files(conn, chapter_files)
+    for chapter in removed:
+        conn.execute("DELETE FROM chapters WHERE chapter = ?", (chapter,))
+    for chapter, (_, text, size, mtime_ns) in changed.items():
+        unique = sorted({value for _, value in rolling_hashes(compact_prose(text))})
+        conn.execute(
+            "INSERT OR REPLACE INTO chapters VALUES (?, ?, ?, ?, ?)",
+            (chapter, size, mtime_ns, text_digest(text), struct.pack(f"<{len(unique)}Q", *unique)),
+        )
+    conn.commit()
+    return len(changed) + len(removed)
+
+
+def merge_repeated_spans(
+    prose: str,
+    positions: dict[int, int],
+) -> list[tuple[str, int]]:
+    # 长句重复会命中一串相邻 n-gram，合并成最长片段后再报告。
+    spans: list[tuple[str, int]] = []
+    ordered = sorted(positions)
+    index = 0
+    while index < len(ordered):
+        start = ordered[index]
+        end = start
+        count = positions[start]
+        while index + 1 < len(ordered) and ordered[index + 1] <= end + 1:
+            index += 1
+            end = ordered[index]
+            count = min(count, positions[end])
+        spans.append((prose[start : end + NGRAM_SIZE], count))
+        index += 1
+    return spans
+
+
+def find_repeated_phrases(
+    conn: sqlite3.Connection,
+    chapter: int,
+    text: str,
+    window: int,
+) -> tuple[list[tuple[str, int]], list[tuple[str, int]]]:
+    prose = compact_prose(text)
+    first_pos: dict[int, int] = {}
+    counts: dict[int, int] = {}
+    for pos, value in rolling_hashes(prose):
+        counts[value] = counts.get(value, 0) + 1
+        first_pos.setdefault(value, pos)
+
+    within = {
+        first_pos[value]: count
+        for value, count in counts.items()
+        if count >= NGRAM_WITHIN_THRESHOLD
+    }
+
+    chapter_hits: dict[int, int] = {value: 1 for value in counts}
+    rows = conn.execute(
+        "SELECT hashes FROM chapters WHERE chapter >= ? AND chapter < ?",
+        (chapter - window, chapter),
+    ).fetchall()
+    for (blob,) in rows:
+        other = struct.unpack(f"<{len(blob) // 8}Q", blob)
+        for value in chapter_hits.keys() & set(other):
+            chapter_hits[value] += 1
+    cross = {
+        first_pos[value]: hits
+        for value, hits in chapter_hits.items()
+        if hits >= NGRAM_CROSS_THRESHOLD
+    }
+    return merge_repeated_spans(prose, within), merge_repeated_spans(prose, cross)
+
+
+def check_repeated_phrases(
+    project_dir: Path,
+    chapter: int,
+    text: str,
+    window: int = NGRAM_WINDOW_CHAPTERS,
+) -> list[CheckResult]:
+    chapter_files, _ = collect_chapter_files(project_dir / "正文")
+    conn = open_ngram_index(project_dir)
+    try:
+        sync_ngram_index(conn, chapter_files)
+        within, cross = find_repeated_phrases(conn, chapter, text, window)
+    finally:
+        conn.close()
+
+    def describe(spans: list[tuple[str, int]], unit: str) -> str:
+        ranked = sorted(spans, key=lambda item: (-item[1], -len(item[0])))[:NGRAM_EXAMPLES]
+        return "；".join(
+            f"“{phrase[:30]}{'…' if len(phrase) > 30 else ''}”×{count}{unit}"
+            for phrase, count in ranked
+        )
+
+    checks: list[CheckResult] = []
+    if within:
+        checks.append(
+            CheckResult(
+                "repeated_in_chapter",
+                "章内重复短语",
+                "WARN",
+                f"{len(within)} 处片段在本章重复 {NGRAM_WITHIN_THRESHOLD} 次以上：{describe(within, '次')}",
+            )
+        )
+    else:
+        checks.append(
+            CheckResult("repeated_in_chapter", "章内重复短语", "PASS", f"无 {NGRAM_SIZE} 字以上片段重复")
+        )
+    if cross:
+        checks.append(
+            CheckResult(
+                "repeated_across_chapters",
+                "跨章重复短语",
+                "WARN",
+                f"{len(cross)} 处片段在最近 {window} 章中出现于 {NGRAM_CROSS_THRESHOLD} 章以上："
+                f"{describe(cross, '章')}",
+            )
+        )
+    else:
+        checks.append(
+            CheckResult("repeated_across_chapters", "跨章重复短语", "PASS", f"最近 {window} 章无高频复用片段")
+        )
+    return checks
+
+
+def build_aho_corasick(words: list[str]) -> dict[str, Any]:
+    # 标准 Aho-Corasick：trie + BFS 失配指针，输出集合沿失配链合并，扫描时单次线性遍历。
+    goto: list[dict[str, int]] = [{}]
+    out: list[list[int]] = [[]]
+    for index, word in enumerate(words):
+        state = 0
+        for char in word:
+            nxt = goto[state].get(char)
+            if nxt is None:
+                nxt = len(goto)
+                goto[state][char] = nxt
+                goto.append({})
+                out.append([])
+            state = nxt
+        out[state].append(index)
+
+    fail = [0] * len(goto)
+    queue = list(goto[0].values())
+    head = 0
+    while head < len(queue):
+        state = queue[head]
+        head += 1
+        for char, nxt in goto[state].items():
+            queue.append(nxt)
+            back = fail[state]
+            while back and char not in goto[back]:
+                back = fail[back]
+            fail[nxt] = goto[back].get(char, 0)
+            out[nxt] = out[nxt] + out[fail[nxt]]
+    return {"goto": goto, "fail": fail, "out": out}
+
+
+def scan_aho_corasick(automaton: dict[str, Any], text: str) -> list[tuple[int, int]]:
+    goto = automaton["goto"]
+    fail = automaton["fail"]
+    out = automaton["out"]
+    hits: list[tuple[int, int]] = []
+    state = 0
+    for pos, char in enumerate(text):
+        while state and char not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(char, 0)
+        for index in out[state]:
+            hits.append((pos, index))
+    return hits
+
+
+def compile_setting_terms(setting_text: str) -> dict[str, Any]:
+    # 设定集表格首列（名称/角色）为规范术语，别名列为合法变体；
+    # 长术语再拆成前后两半作为模式，用于定位只错一个字的疑似误写。
+    canonical: dict[str, str] = {}
+    for table in parse_markdown_tables(setting_text):
+        if not table.header or table.header[0] not in SETTING_TERM_COLUMNS:
+            continue
+        for record in table_records(table):
+            term = record.get(table.header[0], "").strip()
+            if len(term) < 2:
+                continue
+            canonical.setdefault(term, term)
+            for column in SETTING_ALIAS_COLUMNS:
+                for alias in split_phrases(record.get(column, "")):
+                    if len(alias) >= 2:
+                        canonical.setdefault(alias, term)
+
+    patterns: list[list[str]] = [[surface, term, "term"] for surface, term in canonical.items()]
+    for term in sorted(set(canonical.values())):
+        if len(term) < TERM_VARIANT_MIN_CHARS:
+            continue
+        half = len(term) // 2
+        patterns.append([term[:half], term, "head"])
+        patterns.append([term[half:], term, "tail"])
+    return {
+        "surfaces": canonical,
+        "patterns": patterns,
+        "automaton": build_aho_corasick([pattern[0] for pattern in patterns]),
+    }
+
+
+def load_setting_terms(project_dir: Path) -> dict[str, Any]:
+    return cached_parse(project_dir, "setting-terms", project_dir / "04-设定集.md", compile_setting_terms)
+
+
+def scan_setting_terms(
+    compiled: dict[str, Any],
+    text: str,
+) -> tuple[dict[str, tuple[int, int]], list[tuple[str, str, int]]]:
+    surfaces: dict[str, str] = compiled["surfaces"]
+    patterns: list[list[str]] = compiled["patterns"]
+    newlines = [pos for pos, char in enumerate(text) if char == "\n"]
+
+    def line_of(pos: int) -> int:
+        return bisect.bisect_left(newlines, pos) + 1
+
+    occurrences: dict[str, tuple[int, int]] = {}
+    exact_starts: set[int] = set()
+    fragments: list[tuple[int, str, str]] = []
+    for end, index in scan_aho_corasick(compiled["automaton"], text):
+        surface, term, kind = patterns[index]
+        start = end - len(surface) + 1
+        if kind == "term":
+            count, first_line = occurrences.get(term, (0, line_of(start)))
+            occurrences[term] = (count + 1, first_line)
+            exact_starts.add(start)
+        elif kind == "head":
+            fragments.append((start, term, kind))
+        else:
+            fragments.append((end - len(term) + 1, term, kind))
+
+    variants: dict[tuple[str, int], tuple[str, str, int]] = {}
+    for start, term, _ in fragments:
+        if start < 0 or start in exact_starts or (term, start) in variants:
+            continue
+        window = text[start : start + len(term)]
+        if len(window) != len(term) or window in surfaces:
+            continue
+        diffs = [(left, right) for left, right in zip(window, term) if left != right]
+        if len(diffs) == 1 and TERM_CHAR_RE.match(diffs[0][0]):
+            variants[(term, start)] = (window, term, line_of(start))
+    return occurrences, sorted(variants.values(), key=lambda item: item[2])
+
+
+def open_term_index(project_dir: Path, compiled: dict[str, Any]) -> sqlite3.Connection:
+    return open_cache_db(
+        project_dir,
+        "term-index",
+        text_digest(json.dumps(compiled["patterns"], ensure_ascii=False)),
+        """
+        CREATE TABLE chapters (chapter INTEGER PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT);
+        CREATE TABLE occurrences (chapter INTEGER, term TEXT, count INTEGER, first_line INTEGER);
+        CREATE INDEX occurrences_term ON occurrences (term);
+        CREATE TABLE variants (chapter INTEGER, variant TEXT, term TEXT, line INTEGER);
+        """,
+    )
+
+
+def sync_term_index(
+    conn: sqlite3.Connection,
+    chapter_files: dict[int, Path],
+    compiled: dict[str, Any],
+) -> int:
+    changed, removed = changed_chapter_files(conn, chapter_files)
+    for chapter in removed + list(changed):
+        conn.execute("DELETE FROM chapters WHERE chapter = ?", (chapter,))
+        conn.execute("DELETE FROM occurrences WHERE chapter = ?", (chapter,))
+        conn.execute("DELETE FROM variants WHERE chapter = ?", (chapter,))
+    for chapter, (_, text, size, mtime_ns) in changed.items():
+        occurrences, variants = scan_setting_terms(compiled, text)
+        conn.executemany(
+            "INSERT INTO occurrences VALUES (?, ?, ?, ?)",
+            [(chapter, term, count, line) for term, (count, line) in occurrences.items()],
+        )
+        conn.executemany(
+            "INSERT INTO variants VALUES (?, ?, ?, ?)",
+            [(chapter, variant, term, line) for variant, term, line in variants],
+        )
+        conn.execute(
+            "INSERT INTO chapters VALUES (?, ?, ?, ?)",
+            (chapter, size, mtime_ns, text_digest(text)),
+        )
+    conn.commit()
+    return len(changed) + len(removed)
+
+
+def check_setting_terms(project_dir: Path, chapter: int) -> list[CheckResult]:
+    compiled = load_setting_terms(project_dir)
+    if not compiled["surfaces"]:
+        return []
+    chapter_files, _ = collect_chapter_files(project_dir / "正文")
+    conn = open_term_index(project_dir, compiled)
+    try:
+        sync_term_index(conn, chapter_files, compiled)
+        variants = conn.execute(
+            "SELECT variant, term, line FROM variants WHERE chapter = ? ORDER BY line",
+            (chapter,),
+        ).fetchall()
+        used = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(count), 0) FROM occurrences WHERE chapter = ?",
+            (chapter,),
+        ).fetchone()
+    finally:
+        conn.close()
+    if variants:
+        examples = "；".join(
+            f"第{line}行“{variant}”→“{term}”" for variant, term, line in variants[:TERM_EXAMPLES]
+        )
+        return [
+            CheckResult(
+                "setting_term_typo",
+                "设定术语疑似误写",
+                "WARN",
+                f"{len(variants)} 处与设定集术语仅差一字（未登记为别名）：{examples}",
+            )
+        ]
+    return [
+        CheckResult(
+            "setting_term_typo",
+            "设定术语疑似误写",
+            "PASS",
+            f"本章命中设定术语 {used[0]} 个、共 {used[1]} 次，未发现疑似误写",
+        )
+    ]
+
+
+def parse_phrase_list(text: str) -> list[list[str]]:
+    # 每行一个短语；“# 分类”行切换后续短语的分类。
+    entries: list[list[str]] = []
+    category = "禁用表达"
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        if line.startswith("#"):
+            category = line.lstrip("#").strip() or "禁用表达"
+            continue
+        entries.append([line, category])
+    return entries
+
+
+def load_phrase_scanner(project_dir: Path) -> dict[str, Any]:
+    # 占位符、项目禁用表达清单与风格卡禁用项合并编译为同一个自动机，同一短语以先出现的分类为准。
+    entries = [[marker, "占位符"] for marker in PLACEHOLDER_SNIPPETS]
+    entries.extend(
+        cached_parse(
+            project_dir,
+            "phrase-list",
+            project_dir / "风格参考" / PHRASE_LIST_FILE,
+            parse_phrase_list,
+        )
+    )
+    if (project_dir / "风格参考" / "02-风格卡.md").exists():
+        entries.extend([phrase, "风格卡"] for phrase in load_style_rules(project_dir).banned_phrases)
+    patterns: list[list[str]] = []
+    seen: set[str] = set()
+    for phrase, category in entries:
+        if phrase not in seen:
+            seen.add(phrase)
+            patterns.append([phrase, category])
+    digest = f"{CACHE_SCHEMA_VERSION}:{text_digest(json.dumps(patterns, ensure_ascii=False))}"
+    return cached_build(
+        project_dir,
+        "phrase-scanner",
+        (str(project_dir), "phrase-scanner"),
+        digest,
+        lambda: {
+            "patterns": patterns,
+            "automaton": build_aho_corasick([phrase for phrase, _ in patterns]),
+        },
+    )
+
+
+def scan_phrases(scanner: dict[str, Any], text: str) -> list[tuple[int, int, str, str]]:
+    # 单次扫描后按“最左最长、不重叠”取命中，返回 (行, 列, 短语, 分类)。
+    patterns: list[list[str]] = scanner["patterns"]
+    spans = sorted(
+        (end - len(patterns[index][0]) + 1, -len(patterns[index][0]), index)
+        for end, index in scan_aho_corasick(scanner["automaton"], text)
+    )
+    newlines = [pos for pos, char in enumerate(text) if char == "\n"]
+    hits: list[tuple[int, int, str, str]] = []
+    covered = 0
+    for start, negative_length, index in spans:
+        if start < covered:
+            continue
+        covered = start - negative_length
+        line = bisect.bisect_left(newlines, start)
+        column = start - (newlines[line - 1] if line else -1)
+        hits.append((line + 1, column, patterns[index][0], patterns[index][1]))
+    return hits
+
+
+def format_phrase_hits(hits: list[tuple[int, int, str, str]]) -> str:
+    examples = "；".join(
+        f"第{line}行第{column}列“{phrase}”" for line, column, phrase, _ in hits[:PHRASE_HIT_EXAMPLES]
+    )
+    if len(hits) > PHRASE_HIT_EXAMPLES:
+        examples += f"；等 {len(hits)} 处"
+    return examples
+
+
+def check_phrases(project_dir: Path, text: str) -> list[CheckResult]:
+    scanner = load_phrase_scanner(project_dir)
+    hits = scan_phrases(scanner, text)
+    placeholder_hits = [hit for hit in hits if hit[3] == "占位符"]
+    banned_hits = [hit for hit in hits if hit[3] != "占位符"]
+
+    checks: list[CheckResult] = []
+    if placeholder_hits:
+        checks.append(
+            CheckResult(
+                "placeholder_cleanup",
+                "章节占位符清理",
+                "FAIL",
+                f"检测到占位符：{format_phrase_hits(placeholder_hits)}",
+            )
+        )
+    else:
+        checks.append(CheckResult("placeholder_cleanup", "章节占位符清理", "PASS", "未发现模板占位符"))
+
+    banned_total = sum(1 for _, category in scanner["patterns"] if category != "占位符")
+    if banned_hits:
+        by_category: dict[str, int] = {}
+        for hit in banned_hits:
+            by_category[hit[3]] = by_category.get(hit[3], 0) + 1
+        tally = "、".join(f"{category}×{count}" for category, count in by_category.items())
+        checks.append(
+            CheckResult(
+                "banned_phrases",
+                "禁用表达",
+                "WARN",
+                f"命中 {len(banned_hits)} 处（{tally}）：{format_phrase_hits(banned_hits)}",
+            )
+        )
+    elif banned_total:
+        checks.append(CheckResult("banned_phrases", "禁用表达", "PASS", f"未命中 {banned_total} 条禁用表达"))
+
+    unparsed = load_style_rules(project_dir).unparsed_banned
+    if unparsed:
+        checks.append(
+            CheckResult(
+                "banned_unparsed",
+                "风格卡禁用项解析",
+                "WARN",
+                f"{len(unparsed)} 条禁用条目未解析出任何短语（请给短语加引号或写成“禁用表达：A、B”）："
+                + "；".join(f"“{item[:30]}{'…' if len(item) > 30 else ''}”" for item in unparsed[:5]),
+            )
+        )
+    return checks
+
+
+def record_gate_run(project_dir: Path, chapter: int, text: str, results: list[CheckResult]) -> None:
+    passed, warned, failed = results_summary(results)
+    status = "FAIL" if failed else "WARN" if warned else "PASS"
+    conn = open_metrics_db(project_dir)
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO gate_runs VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                chapter,
+                text_digest(text),
+                status,
+                passed,
+                warned,
+                failed,
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            ),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def emit_ndjson(record: dict[str, Any]) -> None:
+    print(json.dumps(record, ensure_ascii=False), flush=True)
+
+
+def silence_stdout() -> None:
+    # 读者已关闭管道：stdout 指向 devnull，避免解释器退出刷新缓冲时再抛 BrokenPipeError。
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+
+
+def print_results_ndjson(check_id: str, results: list[CheckResult]) -> None:
+    for item in results:
+        emit_ndjson(
+            {
+                "type": "check",
+                "id": f"{check_id}/{item.key}",
+                "unit": check_id,
+                "name": item.name,
+                "status": item.status,
+                "detail": item.detail,
+            }
+        )
+
+
+def write_gate_report(
+    report_path: Path,
+    chapter: int,
+    chapter_path: Path,
+    char_count: int | None,
+    results: list[CheckResult],
+) -> None:
+    passed, warned, failed = results_summary(results)
+    lines: list[str] = []
+    lines.append("# 叙事引擎门禁报告")
+    lines.append("")
+    lines.append(f"- 生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    lines.append(f"- 目标章节：第{chapter:03d}章")
+    lines.append(f"- 正文文件：{chapter_path}")
+    if char_count is not None:
+        lines.append(f"- 正文非空白字符数：{char_count}")
+    lines.append(f"- 检查结果：PASS {passed} / WARN {warned} / FAIL {failed}")
+    lines.append("")
+    lines.append("| 项目 | 状态 | 说明 |")
+    lines.append("| --- | --- | --- |")
+    for item in results:
+        lines.append(
+            f"| {safe_cell(item.name)} | {item.status} | {safe_cell(item.detail)} |"
+        )
+    lines.append("")
+    lines.append("## 结论")
+    lines.append("")
+    if failed > 0:
+        lines.append("- 门禁未通过：请先修复所有 `FAIL` 项。")
+    elif warned > 0:
+        lines.append("- 门禁通过（含警告）：建议修复 `WARN` 项后再交付。")
+    else:
+        lines.append("- 门禁通过：可进入交付环节。")
+    lines.append("")
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text("\n".join(lines), encoding="utf-8", newline="\n")
+
+
+@dataclass
+class GateContext:
+    project_dir: Path
+    chapter: int
+    chapter_path: Path
+    args: argparse.Namespace
+    text: str | None = None
+    plain: PlainChapter | None = None
+    char_count: int | None = None
+
+
+@dataclass
+class GateCheck:
+    check_id: str
+    depends: tuple[str, ...]
+    run: Callable[[GateContext], list[CheckResult]]
+
+
+# 门禁检查单元按注册顺序输出报告；depends 声明的单元全部完成后才会调度。
+GATE_CHECKS: list[GateCheck] = []
+
+
+def gate_check(
+    check_id: str,
+    depends: tuple[str, ...] = (),
+) -> Callable[[Callable[[GateContext], list[CheckResult]]], Callable[[GateContext], list[CheckResult]]]:
+    def register(
+        func: Callable[[GateContext], list[CheckResult]],
+    ) -> Callable[[GateContext], list[CheckResult]]:
+        GATE_CHECKS.append(GateCheck(check_id, depends, func))
+        return func
+
+    return register
+
+
+@gate_check("workspace")
+def gate_workspace(ctx: GateContext) -> list[CheckResult]:
+    return workspace_checks(ctx.project_dir)
+
+
+@gate_check("chapter")
+def gate_chapter(ctx: GateContext) -> list[CheckResult]:
+    if not ctx.chapter_path.exists():
+        return [CheckResult("chapter_exists", "目标章节存在", "FAIL", f"找不到文件：{ctx.chapter_path}")]
+    ctx.text = read_utf8(ctx.chapter_path)
+    ctx.plain = plain_chapter(ctx.text)
+    ctx.char_count = ctx.plain.char_count
+    return [CheckResult("chapter_exists", "目标章节存在", "PASS", str(ctx.chapter_path))]
+
+
+@gate_check("previous", depends=("chapter",))
+def gate_previous(ctx: GateContext) -> list[CheckResult]:
+    if ctx.text is None:
+        return []
+    if ctx.chapter > 1 and not chapter_file(ctx.project_dir, ctx.chapter - 1).exists():
+        return [
+            CheckResult(
+                "previous_exists",
+                "前序章节存在",
+                "WARN",
+                f"缺少第{ctx.chapter - 1:03d}章，可能导致连贯性风险。",
+            )
+        ]
+    return [CheckResult("previous_exists", "前序章节存在", "PASS", "前序章节可用")]
+
+
+@gate_check("phrases", depends=("chapter",))
+def gate_phrases(ctx: GateContext) -> list[CheckResult]:
+    if ctx.text is None:
+        return []
+    return check_phrases(ctx.project_dir, ctx.text)
+
+
+@gate_check("style", depends=("chapter",))
+def gate_style(ctx: GateContext) -> list[CheckResult]:
+    style_card_path = ctx.project_dir / "风格参考" / "02-风格卡.md"
+    if ctx.plain is None or not style_card_path.exists():
+        return []
+    return check_style_rules(ctx.plain.prose, load_style_rules(ctx.project_dir))
+
+
+@gate_check("near_duplicate", depends=("chapter",))
+def gate_near_duplicate(ctx: GateContext) -> list[CheckResult]:
+    if ctx.text is None:
+        return []
+    return check_near_duplicates(ctx.project_dir, ctx.chapter)
+
+
+@gate_check("repeated_phrase", depends=("chapter",))
+def gate_repeated_phrase(ctx: GateContext) -> list[CheckResult]:
+    if ctx.text is None:
+        return []
+    return check_repeated_phrases(ctx.project_dir, ctx.chapter, ctx.text, ctx.args.repeat_window)
+
+
+@gate_check("setting_terms", depends=("chapter",))
+def gate_setting_terms(ctx: GateContext) -> list[CheckResult]:
+    if ctx.text is None or not (ctx.project_dir / "04-设定集.md").exists():
+        return []
+    return check_setting_terms(ctx.project_dir, ctx.chapter)
+
+
+@gate_check("heading", depends=("chapter",))
+def gate_heading(ctx: GateContext) -> list[CheckResult]:
+    if ctx.text is None:
+        return []
+    heading_match = CHAPTER_HEADING_RE.search(ctx.text)
+    if heading_match and int(heading_match.group(1)) == ctx.chapter:
+        return [CheckResult("heading_matches", "章节标题匹配", "PASS", "标题章节号匹配")]
+    if heading_match:
+        return [
+            CheckResult(
+                "heading_matches",
+                "章节标题匹配",
+                "WARN",
+                f"正文标题为第{int(heading_match.group(1)):03d}章，与目标章节不一致。",
+            )
+        ]
+    return [CheckResult("heading_matches", "章节标题匹配", "WARN", "未识别到“第N章”标题，建议补充。")]
+
+
+@gate_check("length", depends=("chapter",))
+def gate_length(ctx: GateContext) -> list[CheckResult]:
+    if ctx.char_count is None:
+        return []
+    char_count = ctx.char_count
+    if char_count < ctx.args.min_chars:
+        return [
+            CheckResult(
+                "length_range",
+                "章节长度建议",
+                "WARN",
+                f"当前非空白字符数 {char_count}，低于建议下限 {ctx.args.min_chars}。",
+            )
+        ]
+    if char_count > ctx.args.max_chars:
+        return [
+            CheckResult(
+                "length_range",
+                "章节长度建议",
+                "WARN",
+                f"当前非空白字符数 {char_count}，高于建议上限 {ctx.args.max_chars}。",
+            )
+        ]
+    return [CheckResult("length_range", "章节长度建议", "PASS", f"字符数 {char_count} 在建议区间内")]
+
+
+@gate_check("suboutline", depends=("chapter",))
+def gate_suboutline(ctx: GateContext) -> list[CheckResult]:
+    if ctx.text is None or not (ctx.project_dir / "02-子大纲.md").exists():
+        return []
+    if ctx.chapter in load_suboutline_sections(ctx.project_dir):
+        return [CheckResult("suboutline_covers_chapter", "子大纲覆盖本章", "PASS", "已找到对应章节子大纲")]
+    return [CheckResult("suboutline_covers_chapter", "子大纲覆盖本章", "FAIL", "子大纲未找到该章节，请先补全。")]
+
+
+@gate_check("storyboard", depends=("chapter",))
+def gate_storyboard(ctx: GateContext) -> list[CheckResult]:
+    if ctx.text is None:
+        return []
+    chapter_storyboard_path = storyboard_file(ctx.project_dir, ctx.chapter)
+    if not chapter_storyboard_path.exists():
+        return [
+            CheckResult(
+                "storyboard_present",
+                "分镜纲中间件",
+                "FAIL",
+                f"缺少分镜纲：{chapter_storyboard_path}（先运行 storyboard 命令）",
+            )
+        ]
+    checks = [CheckResult("storyboard_present", "分镜纲中间件", "PASS", str(chapter_storyboard_path))]
+    storyboard_text = read_utf8(chapter_storyboard_path)
+    checks.extend(check_storyboard_quality(storyboard_text, ctx.args.min_scenes))
+    checks.extend(check_scene_alignment(ctx.project_dir, ctx.chapter))
+    return checks
+
+
+@gate_check("foreshadow", depends=("chapter",))
+def gate_foreshadow(ctx: GateContext) -> list[CheckResult]:
+    csv_path = ctx.project_dir / "05-长线伏笔.csv"
+    if ctx.text is None or not csv_path.exists():
+        return []
+    checks: list[CheckResult] = []
+    rows = load_rows(csv_path)
+    known_ids = {normalize_id(row.get("id", "")) for row in rows if row.get("id")}
+    used_ids = {normalize_id(item) for item in FORESHADOW_ID_RE.findall(ctx.text)}
+    unknown_ids = sorted(item for item in used_ids if item not in known_ids)
+    if unknown_ids:
+        checks.append(
+            CheckResult(
+                "foreshadow_ids_registered",
+                "伏笔ID合法性",
+                "FAIL",
+                f"正文出现未登记ID：{', '.join(unknown_ids)}",
+            )
+        )
+    else:
+        checks.append(CheckResult("foreshadow_ids_registered", "伏笔ID合法性", "PASS", "正文中的伏笔ID均已登记"))
+
+    overdue_rows = []
+    for row in rows:
+        status = normalize_status(row.get("状态", ""))
+        if status in DONE_STATUSES or status in INACTIVE_STATUSES:
+            continue
+        target = extract_chapter_num(row.get("计划回收章节", ""))
+        if target is not None and target <= ctx.chapter:
+            overdue_rows.append(row)
+    if overdue_rows:
+        ids = ", ".join(
+            normalize_id(row.get("id", "")) or "<空ID>" for row in overdue_rows[:10]
+        )
+        checks.append(
+            CheckResult(
+                "foreshadow_overdue",
+                "逾期伏笔提醒",
+                "WARN",
+                f"存在 {len(overdue_rows)} 条逾期待回收伏笔：{ids}",
+            )
+        )
+    else:
+        checks.append(CheckResult("foreshadow_overdue", "逾期伏笔提醒", "PASS", "无逾期待回收伏笔"))
+    checks.extend(check_foreshadow_touches(ctx.project_dir, ctx.chapter, ctx.text))
+    return checks
+
+
+@gate_check("role_state", depends=("chapter",))
+def gate_role_state(ctx: GateContext) -> list[CheckResult]:
+    if ctx.text is None or not (ctx.project_dir / "07-当前角色状态.md").exists():
+        return []
+    if ctx.chapter in load_role_state_index(ctx.project_dir).by_chapter:
+        return [CheckResult("role_actions_updated", "角色状态回写", "PASS", "本章行动记录已更新")]
+    return [
+        CheckResult(
+            "role_actions_updated",
+            "角色状态回写",
+            "FAIL",
+            "07-当前角色状态.md 未记录本章行动。",
+        )
+    ]
+
+
+@gate_check("reader_budget", depends=("chapter",))
+def gate_reader_budget(ctx: GateContext) -> list[CheckResult]:
+    if ctx.text is None:
+        return []
+    reader_ledger = load_reader_ledger(ctx.project_dir)
+    if reader_ledger is None:
+        return []
+    return check_reader_budget(reader_ledger, ctx.chapter)
+
+
+@gate_check("foreshadow_stats")
+def gate_foreshadow_stats(ctx: GateContext) -> list[CheckResult]:
+    stats_ok, stats_detail = run_foreshadow_stats(ctx.project_dir, ctx.chapter)
+    if stats_ok:
+        return [CheckResult("stats_refreshed", "长线统计刷新", "PASS", stats_detail)]
+    return [CheckResult("stats_refreshed", "长线统计刷新", "FAIL", stats_detail)]
+
+
+def run_gate_checks(
+    ctx: GateContext,
+    checks: list[GateCheck],
+    jobs: int | None,
+    on_finished: Callable[[GateCheck, list[CheckResult]], None],
+) -> list[CheckResult]:
+    finished: dict[str, list[CheckResult]] = {}
+    pending = list(checks)
+    running: dict[Future[list[CheckResult]], GateCheck] = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        try:
+            while pending or running:
+                ready = [check for check in pending if all(dep in finished for dep in check.depends)]
+                for check in ready:
+                    pending.remove(check)
+                    running[pool.submit(check.run, ctx)] = check
+                if not running:
+                    for check in pending:
+                        missing = ", ".join(dep for dep in check.depends if dep not in finished)
+                        finished[check.check_id] = [
+                            CheckResult(
+                                "unsatisfied_dependency",
+                                f"门禁检查调度：{check.check_id}",
+                                "FAIL",
+                                f"依赖无法满足：{missing}",
+                            )
+                        ]
+                        on_finished(check, finished[check.check_id])
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    check = running.pop(future)
+                    try:
+                        items = future.result()
+                    except Exception as exc:  # noqa: BLE001
+                        items = [
+                            CheckResult(
+                                "unit_error",
+                                f"门禁检查异常：{check.check_id}",
+                                "FAIL",
+                                f"{type(exc).__name__}: {exc}",
+                            )
+                        ]
+                    finished[check.check_id] = items
+                    on_finished(check, items)
+        except BaseException:
+            # 输出端中途关闭（如 ndjson 读者拿到首个 FAIL 即退出）时，撤销尚未开始的单元再向上抛出。
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+    return [item for check in checks for item in finished.get(check.check_id, [])]
+
+
+def cmd_gate(args: argparse.Namespace) -> int:
+    project_dir = Path(args.project).resolve()
+    chapter = int(args.chapter)
+    chapter_path = chapter_file(project_dir, chapter)
+    report_path = (
+        Path(args.report).resolve()
+        if args.report
+        else project_dir / "08-叙事引擎报告.md"
+    )
+
+    ndjson = args.format == "ndjson"
+    ctx = GateContext(project_dir, chapter, chapter_path, args)
+    emitted_fail = False
+
+    def on_finished(check: GateCheck, items: list[CheckResult]) -> None:
+        nonlocal emitted_fail
+        if ndjson:
+            print_results_ndjson(check.check_id, items)
+            emitted_fail = emitted_fail or any(item.status == "FAIL" for item in items)
+        else:
+            print_results(items)
+
+    try:
+        results = run_gate_checks(ctx, GATE_CHECKS, args.jobs, on_finished)
+    except BrokenPipeError:
+        if not ndjson:
+            raise
+        # 读者提前退出时结果不完整，不写报告也不记录门禁。
+        silence_stdout()
+        return 2 if emitted_fail else 1
+
+    write_gate_report(report_path, chapter, chapter_path, ctx.char_count, results)
+    if ctx.text is not None:
+        record_gate_run(project_dir, chapter, ctx.text, results)
+
+    passed, warned, failed = results_summary(results)
+    if failed > 0:
+        exit_code = 2
+    elif warned > 0 and args.strict:
+        exit_code = 1
+    else:
+        exit_code = 0
+    if ndjson:
+        try:
+            emit_ndjson(
+                {
+                    "type": "summary",
+                    "chapter": chapter,
+                    "char_count": ctx.char_count,
+                    "pass": passed,
+                    "warn": warned,
+                    "fail": failed,
+                    "report": str(report_path),
+                    "exit_code": exit_code,
+                }
+            )
+        except BrokenPipeError:
+            silence_stdout()
+    else:
+        print(f"[PASS] 已写入门禁报告：{report_path}")
+    return exit_code
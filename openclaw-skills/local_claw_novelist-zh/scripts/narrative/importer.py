@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import argparse
+import re
+import time
+from pathlib import Path
+
+from .core import (
+    chapter_file,
+    collect_chapter_files,
+    count_non_whitespace,
+    draft_template_path,
+    open_metrics_db,
+    sync_chapter_metrics,
+)
+from .search_index import open_search_index, sync_search_index
+
+IMPORT_NUMERAL_CLASS = "0-9０-９零〇一二两三四五六七八九十百千万"
+IMPORT_HEADING_RE = re.compile(
+    rf"^(?:#{{1,6}}\s*)?第\s*([{IMPORT_NUMERAL_CLASS}]+)\s*章\s*[:：、.．]?\s*(.*)$"
+)
+IMPORT_VOLUME_RE = re.compile(rf"^(?:#{{1,6}}\s*)?(第\s*[{IMPORT_NUMERAL_CLASS}]+\s*[卷部].*)$")
+IMPORT_HEADING_MAX_CHARS = 40
+IMPORT_BATCH_CHAPTERS = 200
+IMPORT_SNIFF_BYTES = 1 << 16
+CHINESE_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+CHINESE_UNITS = {"十": 10, "百": 100, "千": 1000}
+FULLWIDTH_DIGITS = str.maketrans("０１２３４５６７８９", "0123456789")
+
+
+def is_untouched_template(chapter_path: Path) -> bool:
+    # init_story_workspace.py 与 context --create-chapter 写入的模板章节，尚未写入正文。
+    template_path = draft_template_path()
+    return template_path.is_file() and chapter_path.read_bytes() == template_path.read_bytes()
+
+
+def parse_chapter_numeral(token: str) -> int:
+    token = token.translate(FULLWIDTH_DIGITS)
+    if token.isdigit():
+        return int(token)
+    if not any(ch in CHINESE_UNITS or ch == "万" for ch in token):
+        # 逐位写法：第一〇二章
+        return int("".join(str(CHINESE_DIGITS.get(ch, 0)) for ch in token))
+    total = section = number = 0
+    for ch in token:
+        if ch in CHINESE_DIGITS:
+            number = CHINESE_DIGITS[ch]
+        elif ch in CHINESE_UNITS:
+            section += (number or 1) * CHINESE_UNITS[ch]
+            number = 0
+        elif ch == "万":
+            total += (section + number) * 10000
+            section = number = 0
+        elif ch.isdigit():
+            number = number * 10 + int(ch)
+    return total + section + number
+
+
+def detect_text_encoding(path: Path, requested: str) -> str:
+    if requested != "auto":
+        return requested
+    with path.open("rb") as handle:
+        head = handle.read(IMPORT_SNIFF_BYTES)
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as exc:
+        # 截断在多字节字符中间不算失败；其余按国内 TXT 常见的 GB 编码读取。
+        if exc.start < len(head) - 3:
+            return "gb18030"
+    return "utf-8-sig"
+
+
+def write_import_batch(chapters_dir: Path, batch: list[tuple[int, str, list[str]]]) -> dict[int, Path]:
+    written: dict[int, Path] = {}
+    for chapter, title, paragraphs in batch:
+        path = chapter_file(chapters_dir.parent, chapter)
+        heading = f"# 第{chapter:03d}章 {title}".rstrip()
+        path.write_text(
+            "\n\n".join([heading] + paragraphs) + "\n", encoding="utf-8", newline="\n"
+        )
+        written[chapter] = path
+    return written
+
+
+def import_txt(
+    project_dir: Path,
+    source: Path,
+    encoding: str,
+    batch_size: int,
+) -> tuple[int, int, list[tuple[int, str]], list[tuple[int, int]], str]:
+    # 逐行读取，遇到章节标题就把上一章放进待写批次；批次满后落盘并增量更新仪表盘指标与搜索索引。
+    # 内存只保留当前章节与一个批次。章节号按出现顺序连续编号，原标题号不一致时只记录不采用。
+    chapters_dir = project_dir / "正文"
+    chapters_dir.mkdir(parents=True, exist_ok=True)
+    chapter_files, _ = collect_chapter_files(chapters_dir)
+    metrics_conn = open_metrics_db(project_dir)
+    search_conn = open_search_index(project_dir)
+    batch: list[tuple[int, str, list[str]]] = []
+    volumes: list[tuple[int, str]] = []
+    renumbered: list[tuple[int, int]] = []
+    preface: list[str] = []
+    current: tuple[int, str, list[str]] | None = None
+    chapter = 0
+    chars = 0
+
+    def flush() -> None:
+        chapter_files.update(write_import_batch(chapters_dir, batch))
+        print(f"[INFO] 已写入至第{batch[-1][0]:03d}章")
+        batch.clear()
+        sync_chapter_metrics(metrics_conn, chapter_files)
+        sync_search_index(search_conn, chapter_files)
+
+    try:
+        with source.open("r", encoding=encoding, errors="replace") as handle:
+            for raw_line in handle:
+                line = raw_line.strip()
+                if not line:
+                    continue
+                heading_match = (
+                    IMPORT_HEADING_RE.match(line) if len(line) <= IMPORT_HEADING_MAX_CHARS else None
+                )
+                if heading_match:
+                    if current is not None:
+                        batch.append(current)
+                        if len(batch) >= batch_size:
+                            flush()
+                    chapter += 1
+                    number = parse_chapter_numeral(heading_match.group(1))
+                    if number != chapter:
+                        renumbered.append((chapter, number))
+                    current = (chapter, heading_match.group(2).strip(), [])
+                    continue
+                if len(line) <= IMPORT_HEADING_MAX_CHARS and IMPORT_VOLUME_RE.match(line):
+                    volumes.append((chapter + 1, IMPORT_VOLUME_RE.match(line).group(1)))
+                    continue
+                chars += count_non_whitespace(line)
+                if current is None:
+                    preface.append(line)
+                else:
+                    current[2].append(line)
+        if current is not None:
+            batch.append(current)
+        if batch:
+            flush()
+    finally:
+        metrics_conn.close()
+        search_conn.close()
+    return chapter, chars, volumes, renumbered, "\n\n".join(preface)
+
+
+def cmd_import(args: argparse.Namespace) -> int:
+    project_dir = Path(args.project).resolve()
+    source = Path(args.source).resolve()
+    if not source.is_file():
+        print(f"[FAIL] 找不到待导入的 TXT：{source}")
+        return 2
+    if not project_dir.is_dir():
+        print(f"[FAIL] 找不到项目目录：{project_dir}（可先用 init_story_workspace.py 初始化）")
+        return 2
+    existing, _ = collect_chapter_files(project_dir / "正文")
+    existing = {chapter: path for chapter, path in existing.items() if not is_untouched_template(path)}
+    if existing and not args.force:
+        print(f"[FAIL] 正文目录已有 {len(existing)} 个章节文件，使用 --force 覆盖。")
+        return 2
+    encoding = detect_text_encoding(source, args.encoding)
+    started = time.perf_counter()
+    count, chars, volumes, renumbered, preface = import_txt(
+        project_dir, source, encoding, max(1, args.batch)
+    )
+    if not count:
+        print(f"[FAIL] 未在 {source.name} 中识别到“第N章”标题。")
+        return 2
+    if preface:
+        preface_path = project_dir / "00-导入前置内容.md"
+        preface_path.write_text(preface + "\n", encoding="utf-8", newline="\n")
+        print(f"[INFO] 首个章节标题之前的内容已写入：{preface_path.name}")
+    if volumes:
+        listed = "、".join(f"{name}（第{chapter:03d}章起）" for chapter, name in volumes[:10])
+        more = f" 等 {len(volumes)} 卷" if len(volumes) > 10 else ""
+        print(f"[INFO] 识别到分卷标题：{listed}{more}（未写入正文，可补充到 02-子大纲.md）")
+    if renumbered:
+        examples = "、".join(f"第{new:03d}章（原第{old}章）" for new, old in renumbered[:5])
+        print(f"[WARN] {len(renumbered)} 章的原标题序号与出现顺序不一致，已按顺序重新编号：{examples}")
+    stale = [chapter for chapter in existing if chapter > count]
+    if stale:
+        print(f"[WARN] 正文目录中仍有 {len(stale)} 个编号大于 {count} 的旧章节文件，请确认后手动删除。")
+    elapsed = time.perf_counter() - started
+    print(
+        f"[PASS] 已导入 {count} 章，共 {chars} 字（{encoding}），耗时 {elapsed:.2f} 秒："
+        f"{project_dir / '正文'}"
+    )
+    return 0
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import argparse
+import math
+import sqlite3
+import time
+from pathlib import Path
+
+from .core import (
+    changed_chapter_files,
+    collect_chapter_files,
+    normalize_markdown,
+    open_cache_db,
+    split_paragraphs,
+    text_digest,
+)
+
+SEARCH_ROWID_STRIDE = 100_000
+SEARCH_SNIPPET_CHARS = 24
+SEARCH_BM25_K1 = 1.2
+SEARCH_BM25_B = 0.75
+SEARCH_TRIGRAM_MIN_CHARS = 3
+
+
+def open_search_index(project_dir: Path) -> sqlite3.Connection:
+    # 段落 rowid = 章节 × SEARCH_ROWID_STRIDE + 段序，整章删除走 rowid 区间而不是扫描 UNINDEXED 列。
+    return open_cache_db(
+        project_dir,
+        "search-index",
+        f"fts5-trigram:{SEARCH_ROWID_STRIDE}",
+        """
+        CREATE TABLE chapters (chapter INTEGER PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT);
+        CREATE VIRTUAL TABLE paragraphs USING fts5(
+            body, chapter UNINDEXED, idx UNINDEXED, line UNINDEXED, tokenize = 'trigram'
+        );
+        """,
+    )
+
+
+def sync_search_index(conn: sqlite3.Connection, chapter_files: dict[int, Path]) -> tuple[int, int]:
+    changed, removed = changed_chapter_files(conn, chapter_files)
+    for chapter in removed + list(changed):
+        conn.execute("DELETE FROM chapters WHERE chapter = ?", (chapter,))
+        conn.execute(
+            "DELETE FROM paragraphs WHERE rowid >= ? AND rowid < ?",
+            (chapter * SEARCH_ROWID_STRIDE, (chapter + 1) * SEARCH_ROWID_STRIDE),
+        )
+    paragraphs = 0
+    for chapter, (_, text, size, mtime_ns) in changed.items():
+        rows = []
+        for idx, (line, paragraph) in enumerate(split_paragraphs(text), start=1):
+            body = normalize_markdown(paragraph)
+            if body:
+                rows.append((chapter * SEARCH_ROWID_STRIDE + idx, body, chapter, idx, line))
+        conn.executemany(
+            "INSERT INTO paragraphs (rowid, body, chapter, idx, line) VALUES (?, ?, ?, ?, ?)", rows
+        )
+        conn.execute(
+            "INSERT INTO chapters VALUES (?, ?, ?, ?)",
+            (chapter, size, mtime_ns, text_digest(text)),
+        )
+        paragraphs += len(rows)
+    conn.commit()
+    return len(changed) + len(removed), paragraphs
+
+
+def highlight_snippet(body: str, terms: list[str]) -> str:
+    # 命中区间在 Python 中按原文计算并合并重叠/相邻部分，避免 trigram snippet() 在重叠命中时重复原文。
+    spans: list[list[int]] = []
+    for term in terms:
+        start = body.find(term)
+        while start >= 0:
+            spans.append([start, start + len(term)])
+            start = body.find(term, start + 1)
+    spans.sort()
+    merged: list[list[int]] = []
+    for span in spans:
+        if merged and span[0] <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], span[1])
+        else:
+            merged.append(span)
+    if not merged:
+        return body[: SEARCH_SNIPPET_CHARS * 2]
+    window_start = max(0, merged[0][0] - SEARCH_SNIPPET_CHARS)
+    window_end = min(len(body), merged[0][1] + SEARCH_SNIPPET_CHARS)
+    pieces: list[str] = ["…"] if window_start else []
+    cursor = window_start
+    for span_start, span_end in merged:
+        if span_start >= window_end:
+            break
+        span_end = min(span_end, window_end)
+        pieces.append(body[cursor:span_start])
+        pieces.append(f"【{body[span_start:span_end]}】")
+        cursor = span_end
+    pieces.append(body[cursor:window_end])
+    if window_end < len(body):
+        pieces.append("…")
+    return "".join(pieces)
+
+
+def search_paragraphs(
+    conn: sqlite3.Connection,
+    query: str,
+    limit: int,
+) -> list[tuple[int, int, int, str]]:
+    # 每个关键词至少 3 字时走 FTS5 trigram MATCH 并按 bm25 排序；
+    # 含 1–2 字关键词（常见于人名）时 trigram 无法建索引，退回 LIKE 扫描，并在 Python 中按同样的 BM25 公式排序。
+    terms = query.split()
+    if not terms:
+        return []
+    if all(len(term) >= SEARCH_TRIGRAM_MIN_CHARS for term in terms):
+        match = " AND ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        rows = conn.execute(
+            """
+            SELECT chapter, idx, line, body FROM paragraphs WHERE paragraphs MATCH ?
+            ORDER BY bm25(paragraphs) LIMIT ?
+            """,
+            (match, limit),
+        ).fetchall()
+        return [(chapter, idx, line, highlight_snippet(body, terms)) for chapter, idx, line, body in rows]
+
+    def like_pattern(term: str) -> str:
+        escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"%{escaped}%"
+
+    condition = "body LIKE ? ESCAPE '\\'"
+    total, average = conn.execute("SELECT COUNT(*), AVG(LENGTH(body)) FROM paragraphs").fetchone()
+    if not total:
+        return []
+    idf = {}
+    for term in set(terms):
+        containing = conn.execute(
+            f"SELECT COUNT(*) FROM paragraphs WHERE {condition}", (like_pattern(term),)
+        ).fetchone()[0]
+        idf[term] = math.log((total - containing + 0.5) / (containing + 0.5) + 1.0)
+    rows = conn.execute(
+        f"SELECT chapter, idx, line, body FROM paragraphs WHERE {' AND '.join(condition for _ in terms)}",
+        [like_pattern(term) for term in terms],
+    ).fetchall()
+
+    def score(body: str) -> float:
+        norm = SEARCH_BM25_K1 * (1.0 - SEARCH_BM25_B + SEARCH_BM25_B * len(body) / average)
+        return sum(
+            idf[term] * body.count(term) * (SEARCH_BM25_K1 + 1.0) / (body.count(term) + norm)
+            for term in terms
+        )
+
+    ranked = sorted(rows, key=lambda row: (-score(row[3]), row[0], row[1]))[:limit]
+    return [(chapter, idx, line, highlight_snippet(body, terms)) for chapter, idx, line, body in ranked]
+
+
+def cmd_index(args: argparse.Namespace) -> int:
+    project_dir = Path(args.project).resolve()
+    chapters_dir = project_dir / "正文"
+    if not chapters_dir.is_dir():
+        print(f"[FAIL] 找不到正文目录：{chapters_dir}")
+        return 2
+    chapter_files, _ = collect_chapter_files(chapters_dir)
+    started = time.perf_counter()
+    conn = open_search_index(project_dir)
+    try:
+        updated, paragraphs = sync_search_index(conn, chapter_files)
+        total = conn.execute("SELECT COUNT(*) FROM paragraphs").fetchone()[0]
+    finally:
+        conn.close()
+    print(
+        f"[PASS] 搜索索引已更新：重建 {updated} 章（{paragraphs} 段），"
+        f"索引共 {len(chapter_files)} 章 {total} 段，耗时 {time.perf_counter() - started:.2f} 秒"
+    )
+    return 0
+
+
+def cmd_search(args: argparse.Namespace) -> int:
+    project_dir = Path(args.project).resolve()
+    chapter_files, _ = collect_chapter_files(project_dir / "正文")
+    started = time.perf_counter()
+    conn = open_search_index(project_dir)
+    try:
+        sync_search_index(conn, chapter_files)
+        results = search_paragraphs(conn, args.query, args.limit)
+    finally:
+        conn.close()
+    elapsed = (time.perf_counter() - started) * 1000.0
+    if not results:
+        print(f"[WARN] 未找到：{args.query}（{elapsed:.0f} ms）")
+        return 1
+    for chapter, idx, line, snippet in results:
+        print(f"第{chapter:03d}章 第{idx}段（第{line}行）：{snippet}")
+    print(f"[INFO] 共 {len(results)} 条结果，耗时 {elapsed:.0f} ms")
+    return 0
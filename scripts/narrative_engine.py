@@ -2,144 +2,116 @@
 from __future__ import annotations
 
 import argparse
-import csv
+import hashlib
+import json
 import re
-import subprocess
-import sys
-from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-
-REQUIRED_FILES = [
-    "00-项目说明.md",
-    "01-总大纲.md",
-    "02-子大纲.md",
-    "04-设定集.md",
-    "05-长线伏笔.csv",
-    "07-当前角色状态.md",
-]
-REQUIRED_DIRS = ["正文", "风格参考"]
-REQUIRED_COLUMNS = [
-    "id",
-    "主线",
-    "伏笔内容",
-    "首次埋设章节",
-    "计划回收章节",
-    "实际回收章节",
-    "状态",
-    "关联人物",
-    "备注",
-]
-
-DONE_STATUSES = {"已回收"}
-INACTIVE_STATUSES = {"弃用"}
-
-CHAPTER_FILE_RE = re.compile(r"^第(\d{3})章\.md$")
-CHAPTER_HEADING_RE = re.compile(r"^(?:#{1,6}\s*)?第\s*0*(\d+)\s*章[^\n]*", re.M)
-FORESHADOW_ID_RE = re.compile(r"\bF\d{3}\b")
-ROLE_ACTION_ROW_RE = re.compile(r"\|\s*第\s*0*(\d+)\s*章\s*\|")
-
-PLACEHOLDER_SNIPPETS = [
-    "<章节标题>",
-    "（在此写正文）",
-    "(在此写正文)",
-    "在此写正文",
-]
-
-STORYBOARD_REQUIRED_HEADINGS = [
-    "## 场景清单",
-    "## 章节描写规约（硬约束）",
+from typing import Any
+
+from narrative.core import (
+    DONE_STATUSES,
+    FORESHADOW_ID_RE,
+    INACTIVE_STATUSES,
+    RoleAction,
+    RoleStateIndex,
+    StyleRules,
+    chapter_file,
+    collect_chapter_files,
+    context_file,
+    draft_template_path,
+    extract_chapter_num,
+    load_reader_ledger,
+    load_role_state_index,
+    load_rows,
+    load_style_rules,
+    load_suboutline_sections,
+    normalize_id,
+    normalize_status,
+    open_metrics_db,
+    print_results,
+    read_utf8,
+    reader_ledger_path,
+    results_summary,
+    safe_cell,
+    storyboard_file,
+    sync_chapter_metrics,
+    sync_reader_ledger,
+    text_digest,
+    workspace_checks,
+    write_reader_ledger,
+)
+from narrative.export import (
+    EXPORT_COMPRESSORS,
+    EXPORT_COMPRESS_LEVEL,
+    EXPORT_DIFF_CONTEXT,
+    EXPORT_DIFF_MAX_LINES,
+    EXPORT_FORMATS,
+    EXPORT_PARALLEL_MIN_CHAPTERS,
+    EXPORT_SHARD_SIZE,
+    cmd_export,
+    cmd_export_diff,
+    parse_split_spec,
+)
+from narrative.gate import NGRAM_WINDOW_CHAPTERS, cmd_gate
+from narrative.importer import IMPORT_BATCH_CHAPTERS, cmd_import
+from narrative.search_index import cmd_index, cmd_search
+
+CONTEXT_LAYOUTS = ["default", "stable"]
+ENGINE_ARTIFACT_VERSION = "2"
+
+FINGERPRINT_RE = re.compile(r"^<!-- engine-fingerprint: (\{.*\}) -->$", re.M)
+FINGERPRINT_LABELS = {
+    "version": "引擎版本",
+    "layout": "上下文布局",
+    "suboutline": "子大纲章节",
+    "previous_tail": "上一章结尾",
+    "csv": "伏笔CSV",
+    "role_state": "角色状态",
+    "style_card": "风格卡",
+    "setting": "设定集",
+    "context": "本章上下文",
+    "target_chars": "目标字数",
+    "reader_info": "读者面信息",
+}
+SETTING_EXCERPT_CHARS = 2000
+
+DASHBOARD_BUCKET_CHARS = 1000
+DASHBOARD_TABLE_HEADER = [
+    "| 章节 | 字数 | 标题 | 门禁 | 分镜纲 | 伏笔ID | 角色状态 |",
+    "| --- | --- | --- | --- | --- | --- | --- |",
 ]
-STORYBOARD_SCENE_HEADING_RE = re.compile(r"^###\s*场景\s*\d+", re.M)
 
+SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
 
-@dataclass
-class CheckResult:
-    name: str
-    status: str
-    detail: str
 
+def file_digest(path: Path) -> str:
+    if not path.is_file():
+        return "-"
+    return hashlib.sha256(path.read_bytes()).hexdigest()[:16]
 
-def normalize_status(value: str) -> str:
-    text = (value or "").strip()
-    return text if text else "未标注"
 
+def embed_fingerprint(markdown: str, inputs: dict[str, str]) -> str:
+    payload = {"inputs": inputs, "body": text_digest(markdown)}
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return f"{markdown}\n<!-- engine-fingerprint: {encoded} -->\n"
 
-def normalize_id(value: str) -> str:
-    return (value or "").strip().upper()
 
-
-def extract_chapter_num(value: str) -> int | None:
-    text = (value or "").strip()
-    if not text:
+def read_fingerprint(text: str) -> tuple[dict[str, str], bool] | None:
+    match = FINGERPRINT_RE.search(text)
+    if not match:
         return None
-    match = re.search(r"\d+", text)
-    return int(match.group()) if match else None
-
-
-def safe_cell(value: str) -> str:
-    return (value or "").replace("|", "\\|").strip()
-
-
-def count_non_whitespace(text: str) -> int:
-    return len(re.sub(r"\s+", "", text))
-
-
-def chapter_file(project_dir: Path, chapter: int) -> Path:
-    return project_dir / "正文" / f"第{chapter:03d}章.md"
-
-
-def engine_dir(project_dir: Path) -> Path:
-    return project_dir / "正文" / ".engine"
-
-
-def context_file(project_dir: Path, chapter: int) -> Path:
-    return engine_dir(project_dir) / f"第{chapter:03d}章-上下文.md"
-
-
-def storyboard_file(project_dir: Path, chapter: int) -> Path:
-    return engine_dir(project_dir) / f"第{chapter:03d}章-分镜纲.md"
-
-
-def read_utf8(path: Path) -> str:
-    return path.read_text(encoding="utf-8")
-
-
-def load_rows(csv_path: Path) -> list[dict[str, str]]:
-    with csv_path.open("r", encoding="utf-8-sig", newline="") as handle:
-        reader = csv.DictReader(handle)
-        if reader.fieldnames is None:
-            raise ValueError("CSV 为空或缺少表头。")
-        missing = [col for col in REQUIRED_COLUMNS if col not in reader.fieldnames]
-        if missing:
-            raise ValueError(f"CSV 缺少字段: {', '.join(missing)}")
-        return [dict(row) for row in reader]
-
-
-def collect_chapter_files(chapters_dir: Path) -> tuple[dict[int, Path], list[Path]]:
-    chapter_files: dict[int, Path] = {}
-    invalid_names: list[Path] = []
-    if not chapters_dir.exists():
-        return chapter_files, invalid_names
-    for path in sorted(chapters_dir.glob("*.md")):
-        match = CHAPTER_FILE_RE.match(path.name)
-        if not match:
-            invalid_names.append(path)
-            continue
-        chapter_num = int(match.group(1))
-        chapter_files[chapter_num] = path
-    return chapter_files, invalid_names
+    try:
+        payload = json.loads(match.group(1))
+    except json.JSONDecodeError:
+        return None
+    body = text[: match.start()].rstrip("\n") + "\n"
+    return dict(payload.get("inputs", {})), payload.get("body") == text_digest(body)
 
 
-def split_suboutline_sections(suboutline_text: str) -> dict[int, str]:
-    sections: dict[int, str] = {}
-    matches = list(CHAPTER_HEADING_RE.finditer(suboutline_text))
-    for index, match in enumerate(matches):
-        chapter_num = int(match.group(1))
-        start = match.start()
-        end = matches[index + 1].start() if index + 1 < len(matches) else len(suboutline_text)
-        sections[chapter_num] = suboutline_text[start:end].strip()
-    return sections
+def changed_inputs(old: dict[str, str], new: dict[str, str]) -> list[str]:
+    keys = sorted(set(old) | set(new))
+    return [FINGERPRINT_LABELS.get(key, key) for key in keys if old.get(key) != new.get(key)]
 
 
 def infer_next_chapter(chapter_files: dict[int, Path]) -> int:
@@ -148,10 +120,6 @@ def infer_next_chapter(chapter_files: dict[int, Path]) -> int:
     return max(chapter_files) + 1
 
 
-def find_placeholders(text: str) -> list[str]:
-    return [marker for marker in PLACEHOLDER_SNIPPETS if marker in text]
-
-
 def infer_scene_count(target_chars: int) -> int:
     if target_chars <= 1500:
         return 2
@@ -172,375 +140,516 @@ def scene_weight_distribution(scene_count: int) -> list[int]:
     return [18, 24, 24, 20, 14]
 
 
-def extract_style_constraints(style_card_text: str, max_items: int = 4) -> list[str]:
-    lines = [line.strip() for line in style_card_text.splitlines()]
-    candidates: list[str] = []
-    for line in lines:
-        if not line:
-            continue
-        if line.startswith(("- ", "* ")):
-            candidates.append(line[2:].strip())
-            continue
-        if re.match(r"^\d+\.\s+", line):
-            candidates.append(re.sub(r"^\d+\.\s+", "", line).strip())
-    return [item for item in candidates if item][:max_items]
-
-
-def workspace_checks(project_dir: Path) -> list[CheckResult]:
-    checks: list[CheckResult] = []
+def format_style_rules(rules: StyleRules) -> list[str]:
+    lines: list[str] = []
+    if rules.pov or rules.tense:
+        lines.append(f"- 视角/时态：{rules.pov or '未指定'} / {rules.tense or '未指定'}")
+    if rules.sentence_length:
+        lines.append(f"- 平均句长目标：{rules.sentence_length[0]}-{rules.sentence_length[1]} 字")
+    if rules.dialogue_ratio:
+        lines.append(f"- 对话占比目标：{rules.dialogue_ratio[0]}%-{rules.dialogue_ratio[1]}%")
+    if rules.banned_phrases:
+        lines.append(f"- 禁用表达：{'、'.join(rules.banned_phrases)}")
+    return lines
+
+
+def roles_in_text(index: RoleStateIndex, text: str) -> list[str]:
+    return [name for name in index.role_names() if name in text]
+
+
+def find_recent_role_actions(
+    index: RoleStateIndex,
+    roles: list[str] | None = None,
+    max_rows: int = 5,
+) -> list[RoleAction]:
+    if roles:
+        selected = [action for role in roles for action in index.by_role.get(role, [])]
+        selected.sort(key=lambda action: action.chapter)
+        return selected[-max_rows:]
+    return index.actions[-max_rows:]
+
+
+def extract_setting_excerpt(setting_text: str, max_chars: int = SETTING_EXCERPT_CHARS) -> str:
+    lines = [line.rstrip() for line in setting_text.strip().splitlines()]
+    if lines and lines[0].startswith("# "):
+        lines = lines[1:]
+    # 摘录嵌入在二级标题下，原标题整体下沉一级。
+    lines = ["#" + line if line.startswith("#") else line for line in lines]
+    excerpt = "\n".join(lines).strip()
+    if len(excerpt) > max_chars:
+        excerpt = excerpt[:max_chars].rstrip() + "\n\n（已截断）"
+    return excerpt
+
+
+def shared_prefix_length(left: str, right: str) -> int:
+    limit = min(len(left), len(right))
+    index = 0
+    while index < limit and left[index] == right[index]:
+        index += 1
+    return index
+
+
+def format_foreshadow_row(row: dict[str, str]) -> str:
+    return "| {id} | {main} | {detail} | {target} | {status} |".format(
+        id=safe_cell(normalize_id(row.get("id", ""))),
+        main=safe_cell(row.get("主线", "")),
+        detail=safe_cell(row.get("伏笔内容", "")),
+        target=safe_cell(row.get("计划回收章节", "")),
+        status=safe_cell(normalize_status(row.get("状态", ""))),
+    )
 
-    for dirname in REQUIRED_DIRS:
-        target = project_dir / dirname
-        if target.is_dir():
-            checks.append(CheckResult(f"目录存在：{dirname}", "PASS", str(target)))
-        else:
-            checks.append(CheckResult(f"目录存在：{dirname}", "FAIL", f"缺少目录：{target}"))
 
-    for filename in REQUIRED_FILES:
-        target = project_dir / filename
-        if target.is_file():
-            checks.append(CheckResult(f"文件存在：{filename}", "PASS", str(target)))
-        else:
-            checks.append(CheckResult(f"文件存在：{filename}", "FAIL", f"缺少文件：{target}"))
+def previous_chapter_tail(project_dir: Path, chapter: int) -> str:
+    previous_path = chapter_file(project_dir, chapter - 1)
+    if not previous_path.exists():
+        return "（无上一章正文或未命名为第NNN章.md）"
+    previous_text = read_utf8(previous_path).strip()
+    return previous_text[-1200:] if len(previous_text) > 1200 else previous_text
 
-    csv_path = project_dir / "05-长线伏笔.csv"
-    if csv_path.exists():
-        try:
-            _ = load_rows(csv_path)
-            checks.append(CheckResult("伏笔 CSV 结构", "PASS", "字段完整"))
-        except Exception as exc:  # noqa: BLE001
-            checks.append(CheckResult("伏笔 CSV 结构", "FAIL", str(exc)))
 
-    chapters_dir = project_dir / "正文"
-    chapter_files, invalid_names = collect_chapter_files(chapters_dir)
-    if invalid_names:
-        names = ", ".join(path.name for path in invalid_names)
-        checks.append(CheckResult("章节命名规范", "FAIL", f"非法文件名：{names}"))
-    else:
-        checks.append(CheckResult("章节命名规范", "PASS", "符合 第NNN章.md 规则"))
-
-    if chapter_files:
-        sorted_nums = sorted(chapter_files)
-        gaps = [
-            str(num)
-            for num in range(sorted_nums[0], sorted_nums[-1] + 1)
-            if num not in chapter_files
-        ]
-        if gaps:
-            checks.append(CheckResult("章节连续性", "WARN", f"缺失章节：{', '.join(gaps)}"))
-        else:
-            checks.append(CheckResult("章节连续性", "PASS", "无缺号"))
-    else:
-        checks.append(CheckResult("章节连续性", "WARN", "尚无已命名正文章节"))
+def suboutline_section(project_dir: Path, chapter: int) -> str:
+    sections = load_suboutline_sections(project_dir)
+    return sections.get(chapter, "（未在 02-子大纲.md 中找到对应章节）")
 
-    suboutline_path = project_dir / "02-子大纲.md"
-    if suboutline_path.exists():
-        sections = split_suboutline_sections(read_utf8(suboutline_path))
-        if sections:
-            checks.append(CheckResult("子大纲可解析章节", "PASS", f"共 {len(sections)} 章"))
-        else:
-            checks.append(
-                CheckResult(
-                    "子大纲可解析章节",
-                    "WARN",
-                    "未识别到“第N章”标题，请检查子大纲结构。",
-                )
-            )
 
-    return checks
+def context_inputs(project_dir: Path, chapter: int, layout: str) -> dict[str, str]:
+    inputs = {
+        "version": ENGINE_ARTIFACT_VERSION,
+        "layout": layout,
+        "suboutline": text_digest(suboutline_section(project_dir, chapter)),
+        "previous_tail": text_digest(previous_chapter_tail(project_dir, chapter)),
+        "csv": file_digest(project_dir / "05-长线伏笔.csv"),
+        "role_state": file_digest(project_dir / "07-当前角色状态.md"),
+        "reader_info": file_digest(project_dir / "09-读者面信息.md"),
+    }
+    if layout == "stable":
+        inputs["style_card"] = file_digest(project_dir / "风格参考" / "02-风格卡.md")
+        inputs["setting"] = file_digest(project_dir / "04-设定集.md")
+    return inputs
+
+
+def storyboard_inputs(project_dir: Path, chapter: int, target_chars: int) -> dict[str, str]:
+    return {
+        "version": ENGINE_ARTIFACT_VERSION,
+        "suboutline": text_digest(suboutline_section(project_dir, chapter)),
+        "context": file_digest(context_file(project_dir, chapter)),
+        "style_card": file_digest(project_dir / "风格参考" / "02-风格卡.md"),
+        "target_chars": str(target_chars),
+    }
 
 
-def run_foreshadow_stats(project_dir: Path, chapter: int) -> tuple[bool, str]:
-    skill_root = Path(__file__).resolve().parent.parent
-    script_path = skill_root / "scripts" / "foreshadow_stats.py"
-    csv_path = project_dir / "05-长线伏笔.csv"
-    out_path = project_dir / "06-长线统计.md"
-    command = [
-        sys.executable,
-        str(script_path),
-        "--csv",
-        str(csv_path),
-        "--out",
-        str(out_path),
-        "--current-chapter",
-        str(chapter),
-    ]
-    process = subprocess.run(command, capture_output=True, text=True)
-    if process.returncode != 0:
-        detail = process.stderr.strip() or process.stdout.strip() or "未知错误"
-        return False, detail
-    return True, process.stdout.strip() or f"已更新 {out_path}"
-
-
-def find_recent_role_actions(role_state_text: str, max_rows: int = 5) -> list[str]:
-    rows = [
-        line.strip()
-        for line in role_state_text.splitlines()
-        if ROLE_ACTION_ROW_RE.search(line)
-    ]
-    return rows[-max_rows:]
-
-
-def build_context_markdown(project_dir: Path, chapter: int) -> str:
-    suboutline_path = project_dir / "02-子大纲.md"
-    role_state_path = project_dir / "07-当前角色状态.md"
+def build_context_markdown(project_dir: Path, chapter: int, layout: str = "default") -> str:
     csv_path = project_dir / "05-长线伏笔.csv"
 
-    suboutline_text = read_utf8(suboutline_path) if suboutline_path.exists() else ""
-    role_state_text = read_utf8(role_state_path) if role_state_path.exists() else ""
-
-    sections = split_suboutline_sections(suboutline_text) if suboutline_text else {}
-    section_text = sections.get(chapter, "（未在 02-子大纲.md 中找到对应章节）")
-
-    chapter_files, _ = collect_chapter_files(project_dir / "正文")
-    previous_chapter = chapter - 1
-    previous_path = chapter_files.get(previous_chapter)
-    previous_tail = ""
-    if previous_path and previous_path.exists():
-        previous_text = read_utf8(previous_path).strip()
-        previous_tail = previous_text[-1200:] if len(previous_text) > 1200 else previous_text
-    else:
-        previous_tail = "（无上一章正文或未命名为第NNN章.md）"
+    role_index = load_role_state_index(project_dir)
+    section_text = suboutline_section(project_dir, chapter)
+    previous_tail = previous_chapter_tail(project_dir, chapter)
 
+    rows: list[dict[str, str]] = load_rows(csv_path) if csv_path.exists() else []
     active_rows: list[dict[str, str]] = []
-    if csv_path.exists():
-        rows = load_rows(csv_path)
-        for row in rows:
-            status = normalize_status(row.get("状态", ""))
-            if status in DONE_STATUSES or status in INACTIVE_STATUSES:
-                continue
-            first_chapter = extract_chapter_num(row.get("首次埋设章节", ""))
-            if first_chapter is None or first_chapter <= chapter:
-                active_rows.append(row)
-
-    recent_actions = find_recent_role_actions(role_state_text)
-    lines: list[str] = []
-    lines.append(f"# 第{chapter:03d}章写作上下文")
-    lines.append("")
-    lines.append(f"- 生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    lines.append(f"- 目标章节：第{chapter:03d}章")
-    lines.append("")
-    lines.append("## 本章子大纲")
-    lines.append("")
-    lines.append(section_text)
-    lines.append("")
-    lines.append("## 上一章结尾参考（最多1200字）")
-    lines.append("")
-    lines.append(previous_tail)
-    lines.append("")
-    lines.append("## 活跃伏笔（未完成）")
-    lines.append("")
-    lines.append("| ID | 主线 | 伏笔内容 | 计划回收章节 | 状态 |")
-    lines.append("| --- | --- | --- | --- | --- |")
-    if active_rows:
-        for row in active_rows:
-            lines.append(
-                "| {id} | {main} | {detail} | {target} | {status} |".format(
-                    id=safe_cell(normalize_id(row.get("id", ""))),
-                    main=safe_cell(row.get("主线", "")),
-                    detail=safe_cell(row.get("伏笔内容", "")),
-                    target=safe_cell(row.get("计划回收章节", "")),
-                    status=safe_cell(normalize_status(row.get("状态", ""))),
+    for row in rows:
+        status = normalize_status(row.get("状态", ""))
+        if status in DONE_STATUSES or status in INACTIVE_STATUSES:
+            continue
+        first_chapter = extract_chapter_num(row.get("首次埋设章节", ""))
+        if first_chapter is None or first_chapter <= chapter:
+            active_rows.append(row)
+
+    reader_ledger = load_reader_ledger(project_dir)
+    chapter_roles = roles_in_text(role_index, section_text)
+    recent_actions = find_recent_role_actions(role_index, chapter_roles)
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    chapter_lines: list[str] = []
+    chapter_lines.append("## 本章子大纲")
+    chapter_lines.append("")
+    chapter_lines.append(section_text)
+    chapter_lines.append("")
+    chapter_lines.append("## 上一章结尾参考（最多1200字）")
+    chapter_lines.append("")
+    chapter_lines.append(previous_tail)
+    chapter_lines.append("")
+    if layout == "stable":
+        # 稳定布局只列本章相关的增量：到期/逾期、本章埋设、子大纲点名的伏笔；
+        # 完整登记表随 CSV 每章变化，放进前缀会使缓存失效，故不再输出。
+        outline_ids = {normalize_id(item) for item in FORESHADOW_ID_RE.findall(section_text)}
+        shown_rows = [
+            row
+            for row in active_rows
+            if normalize_id(row.get("id", "")) in outline_ids
+            or extract_chapter_num(row.get("首次埋设章节", "")) == chapter
+            or (extract_chapter_num(row.get("计划回收章节", "")) or chapter + 1) <= chapter
+        ]
+        chapter_lines.append("## 本章相关伏笔（到期、本章埋设或子大纲点名）")
+    else:
+        shown_rows = active_rows
+        chapter_lines.append("## 活跃伏笔（未完成）")
+    chapter_lines.append("")
+    chapter_lines.append("| ID | 主线 | 伏笔内容 | 计划回收章节 | 状态 |")
+    chapter_lines.append("| --- | --- | --- | --- | --- |")
+    if shown_rows:
+        chapter_lines.extend(format_foreshadow_row(row) for row in shown_rows)
+    elif layout == "stable":
+        chapter_lines.append("| - | - | 本章无到期或点名的伏笔 | - | - |")
+    else:
+        chapter_lines.append("| - | - | 当前无活跃伏笔 | - | - |")
+    if layout == "stable" and len(active_rows) > len(shown_rows):
+        chapter_lines.append("")
+        chapter_lines.append(
+            f"- 其余 {len(active_rows) - len(shown_rows)} 条未完成伏笔见 `05-长线伏笔.csv`。"
+        )
+    chapter_lines.append("")
+    if chapter_roles:
+        chapter_lines.append("## 本章出场角色状态")
+        chapter_lines.append("")
+        overview = [role_index.overview[role] for role in chapter_roles if role in role_index.overview]
+        if overview:
+            columns = list(overview[0].fields)
+            chapter_lines.append("| " + " | ".join(safe_cell(column) for column in columns) + " |")
+            chapter_lines.append("| " + " | ".join("---" for _ in columns) + " |")
+            for record in overview:
+                chapter_lines.append(
+                    "| " + " | ".join(safe_cell(record.fields.get(column, "")) for column in columns) + " |"
                 )
-            )
+            chapter_lines.append("")
+        for role in chapter_roles:
+            for record in role_index.intel.get(role, []):
+                chapter_lines.append(
+                    "- {role} 已知情报 {intel_id}：{content}（可信度：{credibility}）".format(
+                        role=role,
+                        intel_id=record.fields.get("情报ID", "") or "-",
+                        content=record.fields.get("情报内容", ""),
+                        credibility=record.fields.get("可信度", "") or "未标注",
+                    )
+                )
+        if any(role_index.intel.get(role) for role in chapter_roles):
+            chapter_lines.append("")
+    if chapter_roles:
+        chapter_lines.append(f"## 角色行动记录（{'、'.join(chapter_roles)}，最近5条）")
     else:
-        lines.append("| - | - | 当前无活跃伏笔 | - | - |")
-    lines.append("")
-    lines.append("## 角色行动记录（最近5条）")
-    lines.append("")
+        chapter_lines.append("## 角色行动记录（最近5条）")
+    chapter_lines.append("")
     if recent_actions:
-        for row in recent_actions:
-            lines.append(f"- `{row}`")
+        for action in recent_actions:
+            chapter_lines.append(f"- `{action.raw}`")
     else:
-        lines.append("- （未在 07-当前角色状态.md 中识别到章节行动记录）")
-    lines.append("")
-    lines.append("## 本章执行清单")
-    lines.append("")
-    lines.append("- 完成正文后更新 `07-当前角色状态.md` 的本章行动记录。")
-    lines.append("- 完成正文后更新 `05-长线伏笔.csv`。")
-    lines.append(
+        chapter_lines.append("- （未在 07-当前角色状态.md 中识别到章节行动记录）")
+    chapter_lines.append("")
+    if reader_ledger is not None:
+        open_info = reader_ledger.open_items("info", chapter)
+        open_suspense = reader_ledger.open_items("suspense", chapter)
+        chapter_lines.append("## 读者面未决信息")
+        chapter_lines.append("")
+        for item in open_info:
+            planned = f"，预计第{item.planned_chapter}章揭示" if item.planned_chapter else ""
+            chapter_lines.append(
+                f"- {item.item_id}（{item.info_type or '未标注'}{planned}）：{item.content}"
+            )
+        for item in open_suspense:
+            planned = f"，计划第{item.planned_chapter}章回应" if item.planned_chapter else ""
+            chapter_lines.append(
+                f"- {item.item_id}（强度{item.info_type or '未标注'}{planned}）：{item.content}"
+            )
+        if not open_info and not open_suspense:
+            chapter_lines.append("- （当前无未兑现信息与未回应悬念）")
+        chapter_lines.append("")
+    chapter_lines.append("## 本章执行清单")
+    chapter_lines.append("")
+    chapter_lines.append("- 完成正文后更新 `07-当前角色状态.md` 的本章行动记录。")
+    chapter_lines.append("- 完成正文后更新 `05-长线伏笔.csv`。")
+    chapter_lines.append(
         f"- 运行 `python scripts/narrative_engine.py gate --project \"{project_dir}\" --chapter {chapter}` 做门禁验收。"
     )
-    lines.append("")
-    return "\n".join(lines).rstrip() + "\n"
-
-
-def build_storyboard_markdown(project_dir: Path, chapter: int, target_chars: int) -> str:
-    suboutline_path = project_dir / "02-子大纲.md"
-    style_card_path = project_dir / "风格参考" / "02-风格卡.md"
-    context_path = context_file(project_dir, chapter)
-
-    suboutline_text = read_utf8(suboutline_path) if suboutline_path.exists() else ""
-    sections = split_suboutline_sections(suboutline_text) if suboutline_text else {}
-    section_text = sections.get(chapter, "（未在 02-子大纲.md 中找到对应章节）")
-    context_text = read_utf8(context_path) if context_path.exists() else "（未生成上下文文件）"
-    style_card_text = read_utf8(style_card_path) if style_card_path.exists() else ""
-
-    scene_count = infer_scene_count(target_chars)
-    weights = scene_weight_distribution(scene_count)
-    style_constraints = extract_style_constraints(style_card_text)
+    chapter_lines.append("")
 
     lines: list[str] = []
-    lines.append(f"# 第{chapter:03d}章分镜纲")
-    lines.append("")
-    lines.append(f"- 生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    lines.append(f"- 目标章节：第{chapter:03d}章")
-    lines.append(f"- 目标字数：约 {target_chars} 字")
-    lines.append(f"- 建议场景数：{scene_count}")
-    lines.append("")
-    lines.append("## 本章输入摘要")
-    lines.append("")
-    lines.append("### 子大纲摘录")
-    lines.append("")
-    lines.append(section_text)
+    if layout != "stable":
+        lines.append(f"# 第{chapter:03d}章写作上下文")
+        lines.append("")
+        lines.append(f"- 生成时间：{timestamp}")
+        lines.append(f"- 目标章节：第{chapter:03d}章")
+        lines.append("")
+        lines.extend(chapter_lines)
+        return "\n".join(lines).rstrip() + "\n"
+
+    # 稳定前缀布局：慢变材料在前且字节稳定，逐章变化的内容与时间戳放到末尾，
+    # 以便连续章节的上下文共享尽量长的前缀，命中服务端提示词缓存。
+    setting_path = project_dir / "04-设定集.md"
+    setting_text = read_utf8(setting_path) if setting_path.exists() else ""
+    style_constraints = load_style_rules(project_dir).constraints
+    setting_excerpt = extract_setting_excerpt(setting_text)
+    lines.append("# 写作上下文（稳定前缀布局）")
     lines.append("")
-    lines.append("### 上下文摘录（首段）")
+    lines.append("## 风格卡约束")
     lines.append("")
-    context_excerpt = context_text.strip().splitlines()
-    if context_excerpt:
-        lines.extend(context_excerpt[:16])
+    if style_constraints:
+        lines.extend(f"- {item}" for item in style_constraints)
     else:
-        lines.append("（无）")
+        lines.append("- （未在 风格参考/02-风格卡.md 中识别到约束条目）")
     lines.append("")
-    lines.append(f"## 场景清单（共{scene_count}场）")
+    lines.append("## 设定集摘录")
     lines.append("")
-    for idx in range(scene_count):
-        scene_index = idx + 1
-        ratio = weights[idx] if idx < len(weights) else 20
-        lines.append(f"### 场景{scene_index}（建议占比 {ratio}%）")
-        lines.append("- 场景目的：")
-        lines.append("- 时间/地点：")
-        lines.append("- 出场角色：")
-        lines.append("- 冲突/阻力：")
-        lines.append("- 场景动作链（按先后写动作，不写总结）：")
-        lines.append("- 感官锚点（视觉/听觉/触觉至少二选一）：")
-        lines.append("- 对话任务（每段对话必须推动关系或信息）：")
-        lines.append("- 信息投放（新增/确认/误导/保留）：")
-        lines.append("- 伏笔操作（埋设/回收，引用ID）：")
-        lines.append("- 结尾钩子（把角色推入下一场景）：")
-        lines.append("")
-    lines.append("## 章节描写规约（硬约束）")
+    lines.append(setting_excerpt or "（04-设定集.md 为空或不存在）")
     lines.append("")
-    lines.append("- 前20%必须出现冲突、异常或代价信号，禁止日常流水开场。")
-    lines.append("- 每个场景至少落地1个可视动作与1个可感知异常，不得只讲结论。")
-    lines.append("- 对话字数占比建议 30%-45%，超出时必须删空话与复述。")
-    lines.append("- 心理描写必须绑定外部动作或环境触发，不得连续空想。")
-    lines.append("- 章末必须给出“不可回避的下一步行动”，而非抽象感想。")
-    if style_constraints:
-        lines.append("")
-        lines.append("### 风格卡约束（自动摘录）")
-        lines.append("")
-        for item in style_constraints:
-            lines.append(f"- {item}")
+    lines.append(f"# 第{chapter:03d}章")
     lines.append("")
-    lines.append("## 写后回写提醒")
+    lines.extend(chapter_lines)
+    lines.append("---")
     lines.append("")
-    lines.append("- 写完正文后回写 `07-当前角色状态.md` 本章行动记录。")
-    lines.append("- 写完正文后回写 `05-长线伏笔.csv` 并刷新统计。")
-    lines.append(
-        f"- 运行 `python scripts/narrative_engine.py gate --project \"{project_dir}\" --chapter {chapter}`。"
-    )
+    lines.append(f"- 目标章节：第{chapter:03d}章")
+    lines.append(f"- 生成时间：{timestamp}")
     lines.append("")
     return "\n".join(lines).rstrip() + "\n"
 
 
-def check_storyboard_quality(storyboard_text: str, min_scenes: int) -> list[CheckResult]:
-    checks: list[CheckResult] = []
-    missing_headings = [
-        heading for heading in STORYBOARD_REQUIRED_HEADINGS if heading not in storyboard_text
-    ]
-    if missing_headings:
-        checks.append(
-            CheckResult(
-                "分镜纲结构完整性",
-                "FAIL",
-                f"缺少区块：{', '.join(missing_headings)}",
-            )
-        )
-    else:
-        checks.append(CheckResult("分镜纲结构完整性", "PASS", "结构完整"))
+STORYBOARD_SCENE_TEMPLATE = """### 场景{index}（建议占比 {ratio}%）
+- 场景目的：
+- 时间/地点：
+- 出场角色：
+- 冲突/阻力：
+- 场景动作链（按先后写动作，不写总结）：
+- 感官锚点（视觉/听觉/触觉至少二选一）：
+- 对话任务（每段对话必须推动关系或信息）：
+- 信息投放（新增/确认/误导/保留）：
+- 伏笔操作（埋设/回收，引用ID）：
+- 结尾钩子（把角色推入下一场景）：
+"""
 
-    scene_count = len(STORYBOARD_SCENE_HEADING_RE.findall(storyboard_text))
-    if scene_count < min_scenes:
-        checks.append(
-            CheckResult(
-                "分镜场景数",
-                "FAIL",
-                f"仅识别到 {scene_count} 个场景，低于门禁下限 {min_scenes}。",
-            )
-        )
-    else:
-        checks.append(CheckResult("分镜场景数", "PASS", f"已识别 {scene_count} 个场景"))
+STORYBOARD_TEMPLATE = """# 第{chapter:03d}章分镜纲
 
-    field_checks = {
-        "场景目的：": "场景目的字段",
-        "冲突/阻力：": "冲突字段",
-        "信息投放（新增/确认/误导/保留）：": "信息投放字段",
-        "结尾钩子（把角色推入下一场景）：": "结尾钩子字段",
-    }
-    for token, label in field_checks.items():
-        count = storyboard_text.count(token)
-        if count < scene_count:
-            checks.append(
-                CheckResult(
-                    f"分镜字段覆盖：{label}",
-                    "WARN",
-                    f"字段出现 {count} 次，少于场景数 {scene_count}。",
-                )
-            )
-        else:
-            checks.append(CheckResult(f"分镜字段覆盖：{label}", "PASS", "覆盖完整"))
-    return checks
+- 生成时间：{timestamp}
+- 目标章节：第{chapter:03d}章
+- 目标字数：约 {target_chars} 字
+- 建议场景数：{scene_count}
+
+## 本章输入摘要
+
+### 子大纲摘录
+
+{section_text}
+
+### 上下文摘录（首段）
 
+{context_excerpt}
 
-def results_summary(results: list[CheckResult]) -> tuple[int, int, int]:
-    passed = sum(1 for item in results if item.status == "PASS")
-    warned = sum(1 for item in results if item.status == "WARN")
-    failed = sum(1 for item in results if item.status == "FAIL")
-    return passed, warned, failed
+## 场景清单（共{scene_count}场）
 
+{scenes}
+## 章节描写规约（硬约束）
 
-def print_results(results: list[CheckResult]) -> None:
-    for item in results:
-        print(f"[{item.status}] {item.name} - {item.detail}")
+- 前20%必须出现冲突、异常或代价信号，禁止日常流水开场。
+- 每个场景至少落地1个可视动作与1个可感知异常，不得只讲结论。
+- 对话字数占比建议 {dialogue_low}%-{dialogue_high}%，超出时必须删空话与复述。
+- 心理描写必须绑定外部动作或环境触发，不得连续空想。
+- 章末必须给出“不可回避的下一步行动”，而非抽象感想。{style_block}
+
+## 写后回写提醒
+
+- 写完正文后回写 `07-当前角色状态.md` 本章行动记录。
+- 写完正文后回写 `05-长线伏笔.csv` 并刷新统计。
+- 运行 `python scripts/narrative_engine.py gate --project "{project_dir}" --chapter {chapter}`。
+"""
+
+
+def storyboard_shared_fields(project_dir: Path, target_chars: int) -> dict[str, Any]:
+    # 与章节无关的部分（场景骨架、风格卡规则）只渲染一次，批量生成时各章复用。
+    scene_count = infer_scene_count(target_chars)
+    weights = scene_weight_distribution(scene_count)
+    scenes = "\n".join(
+        STORYBOARD_SCENE_TEMPLATE.format(
+            index=idx + 1,
+            ratio=weights[idx] if idx < len(weights) else 20,
+        )
+        for idx in range(scene_count)
+    )
+    style_rules = load_style_rules(project_dir)
+    dialogue_low, dialogue_high = style_rules.dialogue_ratio or (30, 45)
+    style_lines: list[str] = []
+    compiled_rules = format_style_rules(style_rules)
+    if compiled_rules:
+        style_lines.extend(["", "### 风格卡规则（编译结果，门禁据此检查）", ""])
+        style_lines.extend(compiled_rules)
+    if style_rules.constraints:
+        style_lines.extend(["", "### 风格卡约束（自动摘录）", ""])
+        style_lines.extend(f"- {item}" for item in style_rules.constraints)
+    return {
+        "project_dir": project_dir,
+        "target_chars": target_chars,
+        "scene_count": scene_count,
+        "scenes": scenes,
+        "dialogue_low": dialogue_low,
+        "dialogue_high": dialogue_high,
+        "style_block": "\n" + "\n".join(style_lines) if style_lines else "",
+    }
 
 
-def write_gate_report(
-    report_path: Path,
+def build_storyboard_markdown(
+    project_dir: Path,
     chapter: int,
-    chapter_path: Path,
-    char_count: int | None,
-    results: list[CheckResult],
-) -> None:
-    passed, warned, failed = results_summary(results)
+    target_chars: int,
+    shared: dict[str, Any] | None = None,
+) -> str:
+    if shared is None:
+        shared = storyboard_shared_fields(project_dir, target_chars)
+    context_path = context_file(project_dir, chapter)
+    context_text = read_utf8(context_path) if context_path.exists() else "（未生成上下文文件）"
+    context_excerpt = context_text.strip().splitlines()[:16]
+    markdown = STORYBOARD_TEMPLATE.format(
+        chapter=chapter,
+        timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        section_text=suboutline_section(project_dir, chapter),
+        context_excerpt="\n".join(context_excerpt) if context_excerpt else "（无）",
+        **shared,
+    )
+    return markdown.rstrip() + "\n"
+
+
+def build_dashboard_markdown(project_dir: Path) -> tuple[str, int, dict[int, str]]:
+    chapter_files, _ = collect_chapter_files(project_dir / "正文")
+    conn = open_metrics_db(project_dir)
+    try:
+        recomputed = sync_chapter_metrics(conn, chapter_files)
+        metrics = conn.execute(
+            "SELECT chapter, digest, char_count, heading, foreshadow_ids FROM chapters ORDER BY chapter"
+        ).fetchall()
+        gate_runs = {
+            row[0]: row[1:]
+            for row in conn.execute(
+                "SELECT chapter, digest, status, warned, failed, run_at FROM gate_runs"
+            )
+        }
+    finally:
+        conn.close()
+
+    role_chapters: set[int] = set()
+    if (project_dir / "07-当前角色状态.md").exists():
+        role_chapters = set(load_role_state_index(project_dir).by_chapter)
+    csv_path = project_dir / "05-长线伏笔.csv"
+    registered = {
+        normalize_id(row.get("id", "")): normalize_status(row.get("状态", ""))
+        for row in (load_rows(csv_path) if csv_path.exists() else [])
+        if row.get("id")
+    }
+
+    gate_counts: dict[str, int] = {}
+    touches: dict[str, list[int]] = {}
+    buckets: dict[int, int] = {}
+    rows: dict[int, str] = {}
+    storyboard_count = 0
+    for chapter, digest, char_count, heading, foreshadow_ids in metrics:
+        run = gate_runs.get(chapter)
+        if run is None:
+            gate_cell = "未运行"
+        elif run[0] != digest:
+            gate_cell = f"已过期（上次 {run[1]}）"
+        else:
+            gate_cell = run[1]
+            if run[3] or run[2]:
+                gate_cell += f"（{run[3] or run[2]} 项）"
+        gate_key = gate_cell.split("（")[0]
+        gate_counts[gate_key] = gate_counts.get(gate_key, 0) + 1
+
+        ids = [item for item in foreshadow_ids.split(",") if item]
+        for item in ids:
+            touches.setdefault(item, []).append(chapter)
+        bucket = char_count // DASHBOARD_BUCKET_CHARS
+        buckets[bucket] = buckets.get(bucket, 0) + 1
+        has_storyboard = storyboard_file(project_dir, chapter).exists()
+        storyboard_count += has_storyboard
+        heading_cell = "匹配" if heading == chapter else "缺失" if heading is None else f"第{heading:03d}章"
+        rows[chapter] = (
+            f"| 第{chapter:03d}章 | {char_count} | {heading_cell} | {gate_cell} | "
+            f"{'有' if has_storyboard else '缺'} | {'、'.join(ids) or '-'} | "
+            f"{'已回写' if chapter in role_chapters else '未回写'} |"
+        )
+
+    total = len(metrics)
+    counts = sorted(row[2] for row in metrics)
     lines: list[str] = []
-    lines.append("# 叙事引擎门禁报告")
+    lines.append("# 全书仪表盘")
     lines.append("")
     lines.append(f"- 生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    lines.append(f"- 目标章节：第{chapter:03d}章")
-    lines.append(f"- 正文文件：{chapter_path}")
-    if char_count is not None:
-        lines.append(f"- 正文非空白字符数：{char_count}")
-    lines.append(f"- 检查结果：PASS {passed} / WARN {warned} / FAIL {failed}")
-    lines.append("")
-    lines.append("| 项目 | 状态 | 说明 |")
-    lines.append("| --- | --- | --- |")
-    for item in results:
+    lines.append(f"- 章节数：{total}")
+    if counts:
+        longest = max(metrics, key=lambda row: row[2])
+        shortest = min(metrics, key=lambda row: row[2])
         lines.append(
-            f"| {safe_cell(item.name)} | {item.status} | {safe_cell(item.detail)} |"
+            f"- 非空白字符：合计 {sum(counts)}，平均 {sum(counts) // total}，中位数 {counts[total // 2]}，"
+            f"最短 第{shortest[0]:03d}章 {shortest[2]}，最长 第{longest[0]:03d}章 {longest[2]}"
+        )
+    lines.append(
+        "- 门禁状态："
+        + " / ".join(
+            f"{label} {gate_counts.get(label, 0)}"
+            for label in ("PASS", "WARN", "FAIL", "已过期", "未运行")
         )
+    )
+    lines.append(f"- 分镜纲覆盖：{storyboard_count}/{total}")
+    lines.append(
+        f"- 角色状态回写：{sum(1 for row in metrics if row[0] in role_chapters)}/{total}"
+    )
+    unknown = sorted(item for item in touches if item not in registered)
+    untouched = sorted(
+        item
+        for item, status in registered.items()
+        if item not in touches and status not in DONE_STATUSES and status not in INACTIVE_STATUSES
+    )
+    lines.append(
+        f"- 伏笔触及：已登记 {len(registered)} 条，正文触及 {len(touches)} 条"
+        f"，未登记ID {len(unknown)} 条，未在正文出现的待回收伏笔 {len(untouched)} 条"
+    )
     lines.append("")
-    lines.append("## 结论")
+    lines.append("## 章节明细")
     lines.append("")
-    if failed > 0:
-        lines.append("- 门禁未通过：请先修复所有 `FAIL` 项。")
-    elif warned > 0:
-        lines.append("- 门禁通过（含警告）：建议修复 `WARN` 项后再交付。")
-    else:
-        lines.append("- 门禁通过：可进入交付环节。")
+    lines.extend(DASHBOARD_TABLE_HEADER)
+    lines.extend(rows.values())
+    lines.append("")
+    lines.append("## 字数分布")
+    lines.append("")
+    lines.append("| 区间 | 章节数 |")
+    lines.append("| --- | --- |")
+    for bucket in sorted(buckets):
+        low = bucket * DASHBOARD_BUCKET_CHARS
+        lines.append(f"| {low}-{low + DASHBOARD_BUCKET_CHARS - 1} | {buckets[bucket]} |")
     lines.append("")
-    report_path.parent.mkdir(parents=True, exist_ok=True)
-    report_path.write_text("\n".join(lines), encoding="utf-8", newline="\n")
+    lines.append("## 伏笔触及分布")
+    lines.append("")
+    lines.append("| ID | 状态 | 触及章节数 | 首次 | 最近 |")
+    lines.append("| --- | --- | --- | --- | --- |")
+    for item in sorted(set(registered) | set(touches)):
+        chapters = touches.get(item, [])
+        status = registered.get(item, "未登记")
+        if chapters:
+            lines.append(
+                f"| {item} | {status or '-'} | {len(chapters)} | 第{chapters[0]:03d}章 | 第{chapters[-1]:03d}章 |"
+            )
+        else:
+            lines.append(f"| {item} | {status or '-'} | 0 | - | - |")
+    lines.append("")
+    return "\n".join(lines), recomputed, rows
+
+
+def refresh_context(
+    project_dir: Path,
+    chapter: int,
+    output_path: Path,
+    layout: str,
+    force: bool,
+) -> tuple[bool, list[str], str]:
+    inputs = context_inputs(project_dir, chapter, layout)
+    changed: list[str] = []
+    if output_path.exists() and not force:
+        existing = read_utf8(output_path)
+        fingerprint = read_fingerprint(existing)
+        if fingerprint is not None and fingerprint[0] == inputs:
+            return False, changed, existing
+        if fingerprint is not None:
+            changed = changed_inputs(fingerprint[0], inputs)
+
+    markdown = embed_fingerprint(build_context_markdown(project_dir, chapter, layout), inputs)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(markdown, encoding="utf-8", newline="\n")
+    return True, changed, markdown
 
 
 def cmd_doctor(args: argparse.Namespace) -> int:
@@ -570,237 +679,266 @@ def cmd_context(args: argparse.Namespace) -> int:
     chapter_path = chapter_file(project_dir, chapter)
 
     if args.create_chapter and not chapter_path.exists():
-        skill_root = Path(__file__).resolve().parent.parent
-        template_path = skill_root / "references" / "draft-template.md"
-        if not template_path.exists():
-            print(f"[FAIL] 缺少模板文件：{template_path}")
+        error = create_chapter_from_template(chapter_path)
+        if error:
+            print(f"[FAIL] {error}")
             return 2
-        chapter_path.parent.mkdir(parents=True, exist_ok=True)
-        chapter_path.write_text(read_utf8(template_path), encoding="utf-8", newline="\n")
         print(f"[PASS] 已创建章节文件：{chapter_path}")
 
     output_path = Path(args.out).resolve() if args.out else context_file(project_dir, chapter)
-    markdown = build_context_markdown(project_dir, chapter)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(markdown, encoding="utf-8", newline="\n")
-
-    print(f"[PASS] 已生成上下文文件：{output_path}")
+    written, changed, markdown = refresh_context(
+        project_dir, chapter, output_path, args.layout, args.force
+    )
+    if not written:
+        print(f"[PASS] 上下文输入未变化，跳过重写：{output_path}")
+    elif changed:
+        print(f"[PASS] 输入已变化（{'、'.join(changed)}），已刷新上下文文件：{output_path}")
+    else:
+        print(f"[PASS] 已生成上下文文件：{output_path}")
+    previous_context_path = context_file(project_dir, chapter - 1)
+    if chapter > 1 and previous_context_path.exists():
+        shared = shared_prefix_length(read_utf8(previous_context_path), markdown)
+        ratio = shared / len(markdown) * 100.0 if markdown else 0.0
+        print(
+            f"[INFO] 与第{chapter - 1:03d}章上下文共享前缀：{shared} 字符"
+            f"（占本章 {ratio:.1f}%）"
+        )
     return 0
 
 
+def parse_chapter_range(value: str) -> tuple[int, int]:
+    match = re.fullmatch(r"\s*(\d+)\s*[-~]\s*(\d+)\s*", value)
+    if not match or int(match.group(1)) > int(match.group(2)) or int(match.group(1)) < 1:
+        raise argparse.ArgumentTypeError(f"章节范围格式应为 A-B 且 1 <= A <= B：{value}")
+    return int(match.group(1)), int(match.group(2))
+
+
+def create_chapter_from_template(chapter_path: Path) -> str | None:
+    template_path = draft_template_path()
+    if not template_path.exists():
+        return f"缺少模板文件：{template_path}"
+    chapter_path.parent.mkdir(parents=True, exist_ok=True)
+    chapter_path.write_text(read_utf8(template_path), encoding="utf-8", newline="\n")
+    return None
+
+
+def plan_storyboard(
+    project_dir: Path,
+    chapter: int,
+    output_path: Path,
+    target_chars: int,
+    force: bool,
+    shared: dict[str, Any],
+) -> tuple[str, str, str | None]:
+    inputs = storyboard_inputs(project_dir, chapter, target_chars)
+    changed: list[str] = []
+    if output_path.exists() and not force:
+        fingerprint = read_fingerprint(read_utf8(output_path))
+        if fingerprint is None:
+            return "FAIL", f"分镜纲已存在，使用 --force 覆盖：{output_path}", None
+        previous_inputs, untouched = fingerprint
+        if previous_inputs == inputs:
+            return "SKIP", f"分镜纲输入未变化，跳过重写：{output_path}", None
+        changed = changed_inputs(previous_inputs, inputs)
+        if not untouched:
+            return (
+                "FAIL",
+                f"输入已变化（{'、'.join(changed)}），但分镜纲已手工填写，使用 --force 覆盖：{output_path}",
+                None,
+            )
+
+    markdown = embed_fingerprint(
+        build_storyboard_markdown(project_dir, chapter, target_chars, shared), inputs
+    )
+    if changed:
+        return "REFRESH", f"输入已变化（{'、'.join(changed)}），已刷新分镜纲文件：{output_path}", markdown
+    return "NEW", f"已生成分镜纲文件：{output_path}", markdown
+
+
 def cmd_storyboard(args: argparse.Namespace) -> int:
     project_dir = Path(args.project).resolve()
     if not project_dir.exists():
         print(f"[FAIL] 项目目录不存在：{project_dir}")
         return 2
+    if args.range and (args.chapter is not None or args.out):
+        print("[FAIL] --range 不能与 --chapter 或 --out 同时使用。")
+        return 2
 
-    chapter_files, _ = collect_chapter_files(project_dir / "正文")
-    chapter = args.chapter if args.chapter is not None else infer_next_chapter(chapter_files)
+    if args.range:
+        chapters = list(range(args.range[0], args.range[1] + 1))
+    else:
+        chapter_files, _ = collect_chapter_files(project_dir / "正文")
+        chapters = [args.chapter if args.chapter is not None else infer_next_chapter(chapter_files)]
+    batch = args.range is not None
+
+    shared = storyboard_shared_fields(project_dir, args.target_chars)
+    pending: list[tuple[Path, str]] = []
+    counts = {"NEW": 0, "REFRESH": 0, "SKIP": 0, "FAIL": 0}
+    for chapter in chapters:
+        if args.create_context:
+            context_path = context_file(project_dir, chapter)
+            layout = "default"
+            fingerprint = None
+            existed = context_path.exists()
+            if existed:
+                fingerprint = read_fingerprint(read_utf8(context_path))
+                if fingerprint is not None:
+                    layout = fingerprint[0].get("layout", layout)
+            if existed and fingerprint is None and not args.force:
+                # 无指纹的上下文（手工编辑或旧版本生成）无法判断是否过期，保留原文件。
+                if not batch:
+                    print(f"[INFO] 上下文文件无输入指纹，保留不改（--force 可重写）：{context_path}")
+            else:
+                written, changed, _ = refresh_context(
+                    project_dir, chapter, context_path, layout, args.force
+                )
+                if written and changed and not batch:
+                    print(f"[PASS] 输入已变化（{'、'.join(changed)}），已刷新上下文文件：{context_path}")
+                elif written and existed and not batch:
+                    print(f"[PASS] 已按 --force 重写上下文文件：{context_path}")
+                elif written and not batch:
+                    print(f"[PASS] 已补生成上下文文件：{context_path}")
+
+        chapter_path = chapter_file(project_dir, chapter)
+        if args.create_chapter and not chapter_path.exists():
+            error = create_chapter_from_template(chapter_path)
+            if error:
+                print(f"[FAIL] {error}")
+                return 2
+            if not batch:
+                print(f"[PASS] 已创建章节文件：{chapter_path}")
+
+        output_path = (
+            Path(args.out).resolve() if args.out else storyboard_file(project_dir, chapter)
+        )
+        status, message, markdown = plan_storyboard(
+            project_dir, chapter, output_path, args.target_chars, args.force, shared
+        )
+        counts[status] += 1
+        if status == "FAIL":
+            print(f"[FAIL] {message}")
+        elif not batch:
+            print(f"[PASS] {message}")
+        if markdown is not None:
+            pending.append((output_path, markdown))
+
+    # 渲染全部完成后再统一落盘：渲染中途出错时不会只写出半段章节区间。
+    for output_path, markdown in pending:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(markdown, encoding="utf-8", newline="\n")
+
+    if batch:
+        print(
+            f"[{'FAIL' if counts['FAIL'] else 'PASS'}] 第{chapters[0]:03d}-{chapters[-1]:03d}章分镜纲："
+            f"新生成 {counts['NEW']}，刷新 {counts['REFRESH']}，"
+            f"未变化 {counts['SKIP']}，失败 {counts['FAIL']}"
+        )
+    return 2 if counts["FAIL"] else 0
 
-    if args.create_context and not context_file(project_dir, chapter).exists():
-        markdown = build_context_markdown(project_dir, chapter)
-        context_path = context_file(project_dir, chapter)
-        context_path.parent.mkdir(parents=True, exist_ok=True)
-        context_path.write_text(markdown, encoding="utf-8", newline="\n")
-        print(f"[PASS] 已补生成上下文文件：{context_path}")
 
-    chapter_path = chapter_file(project_dir, chapter)
-    if args.create_chapter and not chapter_path.exists():
-        skill_root = Path(__file__).resolve().parent.parent
-        template_path = skill_root / "references" / "draft-template.md"
-        if not template_path.exists():
-            print(f"[FAIL] 缺少模板文件：{template_path}")
-            return 2
-        chapter_path.parent.mkdir(parents=True, exist_ok=True)
-        chapter_path.write_text(read_utf8(template_path), encoding="utf-8", newline="\n")
-        print(f"[PASS] 已创建章节文件：{chapter_path}")
-
-    output_path = Path(args.out).resolve() if args.out else storyboard_file(project_dir, chapter)
-    if output_path.exists() and not args.force:
-        print(f"[FAIL] 分镜纲已存在，使用 --force 覆盖：{output_path}")
+def cmd_ledger(args: argparse.Namespace) -> int:
+    project_dir = Path(args.project).resolve()
+    if not (project_dir / "09-读者面信息.md").is_file():
+        print(f"[FAIL] 找不到读者面信息文件：{project_dir / '09-读者面信息.md'}")
         return 2
-
-    markdown = build_storyboard_markdown(project_dir, chapter, args.target_chars)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(markdown, encoding="utf-8", newline="\n")
-    print(f"[PASS] 已生成分镜纲文件：{output_path}")
+    if args.rebuild:
+        payload = sync_reader_ledger(project_dir, rebuild=True)
+        print(f"[PASS] 已按当前 09-读者面信息.md 重建台账，共 {len(payload['items'])} 条（此前的历史已清除）")
+        return 0
+    payload = sync_reader_ledger(project_dir)
+    items = payload["items"]
+    if args.retract:
+        targets = [normalize_id(item_id) for item_id in args.retract]
+        missing = [item_id for item_id in targets if item_id not in items]
+        for item_id in targets:
+            items.pop(item_id, None)
+        write_reader_ledger(project_dir, payload)
+        retracted = [item_id for item_id in targets if item_id not in missing]
+        if retracted:
+            print(f"[PASS] 已从台账撤回：{', '.join(retracted)}")
+        if missing:
+            print(f"[WARN] 台账中不存在：{', '.join(missing)}")
+        return 1 if missing else 0
+    for item_id, item in sorted(items.items()):
+        closed = f"第{item['closed_chapter']}章关闭" if item.get("closed_chapter") is not None else "未关闭"
+        print(
+            f"{item_id}（{'信息' if item.get('kind') == 'info' else '悬念'}，"
+            f"首次第{item.get('first_chapter', 0)}章，{closed}）：{item.get('content', '')}"
+        )
+    print(f"[INFO] 台账共 {len(items)} 条：{reader_ledger_path(project_dir)}")
     return 0
 
 
-def cmd_gate(args: argparse.Namespace) -> int:
+def cmd_roles(args: argparse.Namespace) -> int:
     project_dir = Path(args.project).resolve()
-    chapter = int(args.chapter)
-    chapter_path = chapter_file(project_dir, chapter)
-    report_path = (
-        Path(args.report).resolve()
-        if args.report
-        else project_dir / "08-叙事引擎报告.md"
-    )
-
-    results = workspace_checks(project_dir)
-    char_count: int | None = None
+    role_state_path = project_dir / "07-当前角色状态.md"
+    if not role_state_path.exists():
+        print(f"[FAIL] 找不到角色状态文件：{role_state_path}")
+        return 2
 
-    if not chapter_path.exists():
-        results.append(CheckResult("目标章节存在", "FAIL", f"找不到文件：{chapter_path}"))
-    else:
-        text = read_utf8(chapter_path)
-        char_count = count_non_whitespace(text)
-        results.append(CheckResult("目标章节存在", "PASS", str(chapter_path)))
-
-        if chapter > 1 and not chapter_file(project_dir, chapter - 1).exists():
-            results.append(
-                CheckResult(
-                    "前序章节存在",
-                    "WARN",
-                    f"缺少第{chapter - 1:03d}章，可能导致连贯性风险。",
-                )
-            )
-        else:
-            results.append(CheckResult("前序章节存在", "PASS", "前序章节可用"))
-
-        placeholders = find_placeholders(text)
-        if placeholders:
-            results.append(
-                CheckResult(
-                    "章节占位符清理",
-                    "FAIL",
-                    f"检测到占位符：{', '.join(placeholders)}",
-                )
-            )
-        else:
-            results.append(CheckResult("章节占位符清理", "PASS", "未发现模板占位符"))
-
-        heading_match = CHAPTER_HEADING_RE.search(text)
-        if heading_match and int(heading_match.group(1)) == chapter:
-            results.append(CheckResult("章节标题匹配", "PASS", "标题章节号匹配"))
-        elif heading_match:
-            results.append(
-                CheckResult(
-                    "章节标题匹配",
-                    "WARN",
-                    f"正文标题为第{int(heading_match.group(1)):03d}章，与目标章节不一致。",
-                )
-            )
-        else:
-            results.append(
-                CheckResult("章节标题匹配", "WARN", "未识别到“第N章”标题，建议补充。")
+    index = load_role_state_index(project_dir)
+    if args.chapter is not None:
+        actions = index.by_chapter.get(args.chapter, [])
+        if not actions:
+            print(f"[WARN] 未找到第{args.chapter:03d}章的行动记录。")
+            return 1
+        for action in actions:
+            print(action.raw)
+        return 0
+
+    if args.role:
+        record = index.overview.get(args.role)
+        if record is None and args.role not in index.by_role:
+            print(f"[WARN] 未找到角色：{args.role}")
+            return 1
+        if record is not None:
+            print(
+                "；".join(f"{key}：{value}" for key, value in record.fields.items() if value)
             )
+        for intel in index.intel.get(args.role, []):
+            print(f"情报 {intel.fields.get('情报ID', '') or '-'}：{intel.fields.get('情报内容', '')}")
+        for action in find_recent_role_actions(index, [args.role], args.last):
+            print(action.raw)
+        return 0
+
+    for name in index.role_names():
+        actions = index.by_role.get(name, [])
+        latest = f"第{actions[-1].chapter:03d}章" if actions else "-"
+        print(f"{name}：行动记录 {len(actions)} 条，最近 {latest}")
+    return 0
 
-        if char_count < args.min_chars:
-            results.append(
-                CheckResult(
-                    "章节长度建议",
-                    "WARN",
-                    f"当前非空白字符数 {char_count}，低于建议下限 {args.min_chars}。",
-                )
-            )
-        elif char_count > args.max_chars:
-            results.append(
-                CheckResult(
-                    "章节长度建议",
-                    "WARN",
-                    f"当前非空白字符数 {char_count}，高于建议上限 {args.max_chars}。",
-                )
-            )
-        else:
-            results.append(
-                CheckResult("章节长度建议", "PASS", f"字符数 {char_count} 在建议区间内")
-            )
 
-        suboutline_path = project_dir / "02-子大纲.md"
-        if suboutline_path.exists():
-            sections = split_suboutline_sections(read_utf8(suboutline_path))
-            if chapter in sections:
-                results.append(CheckResult("子大纲覆盖本章", "PASS", "已找到对应章节子大纲"))
-            else:
-                results.append(
-                    CheckResult("子大纲覆盖本章", "FAIL", "子大纲未找到该章节，请先补全。")
-                )
+def cmd_report(args: argparse.Namespace) -> int:
+    project_dir = Path(args.project).resolve()
+    chapters_dir = project_dir / "正文"
+    if not chapters_dir.is_dir():
+        print(f"[FAIL] 找不到正文目录：{chapters_dir}")
+        return 2
+    markdown, recomputed, rows = build_dashboard_markdown(project_dir)
+    if args.chapter is not None:
+        if args.chapter not in rows:
+            print(f"[FAIL] 未找到章节文件：{chapter_file(project_dir, args.chapter)}")
+            return 2
+        print("\n".join(DASHBOARD_TABLE_HEADER + [rows[args.chapter]]))
+        return 0
+    output_path = Path(args.out).resolve() if args.out else project_dir / "10-全书仪表盘.md"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(markdown, encoding="utf-8", newline="\n")
+    print(f"[PASS] 已写入全书仪表盘：{output_path}（重算 {recomputed} 章指标）")
+    return 0
 
-        chapter_storyboard_path = storyboard_file(project_dir, chapter)
-        if not chapter_storyboard_path.exists():
-            results.append(
-                CheckResult(
-                    "分镜纲中间件",
-                    "FAIL",
-                    f"缺少分镜纲：{chapter_storyboard_path}（先运行 storyboard 命令）",
-                )
-            )
-        else:
-            results.append(CheckResult("分镜纲中间件", "PASS", str(chapter_storyboard_path)))
-            storyboard_text = read_utf8(chapter_storyboard_path)
-            results.extend(check_storyboard_quality(storyboard_text, args.min_scenes))
-
-        csv_path = project_dir / "05-长线伏笔.csv"
-        if csv_path.exists():
-            rows = load_rows(csv_path)
-            known_ids = {normalize_id(row.get("id", "")) for row in rows if row.get("id")}
-            used_ids = {normalize_id(item) for item in FORESHADOW_ID_RE.findall(text)}
-            unknown_ids = sorted(item for item in used_ids if item not in known_ids)
-            if unknown_ids:
-                results.append(
-                    CheckResult(
-                        "伏笔ID合法性",
-                        "FAIL",
-                        f"正文出现未登记ID：{', '.join(unknown_ids)}",
-                    )
-                )
-            else:
-                results.append(CheckResult("伏笔ID合法性", "PASS", "正文中的伏笔ID均已登记"))
-
-            overdue_rows = []
-            for row in rows:
-                status = normalize_status(row.get("状态", ""))
-                if status in DONE_STATUSES or status in INACTIVE_STATUSES:
-                    continue
-                target = extract_chapter_num(row.get("计划回收章节", ""))
-                if target is not None and target <= chapter:
-                    overdue_rows.append(row)
-            if overdue_rows:
-                ids = ", ".join(
-                    normalize_id(row.get("id", "")) or "<空ID>" for row in overdue_rows[:10]
-                )
-                results.append(
-                    CheckResult(
-                        "逾期伏笔提醒",
-                        "WARN",
-                        f"存在 {len(overdue_rows)} 条逾期待回收伏笔：{ids}",
-                    )
-                )
-            else:
-                results.append(CheckResult("逾期伏笔提醒", "PASS", "无逾期待回收伏笔"))
-
-        role_state_path = project_dir / "07-当前角色状态.md"
-        if role_state_path.exists():
-            role_state_text = read_utf8(role_state_path)
-            chapter_rows = {int(match.group(1)) for match in ROLE_ACTION_ROW_RE.finditer(role_state_text)}
-            if chapter in chapter_rows:
-                results.append(CheckResult("角色状态回写", "PASS", "本章行动记录已更新"))
-            else:
-                results.append(
-                    CheckResult(
-                        "角色状态回写",
-                        "FAIL",
-                        "07-当前角色状态.md 未记录本章行动。",
-                    )
-                )
 
-    stats_ok, stats_detail = run_foreshadow_stats(project_dir, chapter)
-    if stats_ok:
-        results.append(CheckResult("长线统计刷新", "PASS", stats_detail))
-    else:
-        results.append(CheckResult("长线统计刷新", "FAIL", stats_detail))
+def parse_positive_int(value: str) -> int:
+    if not value.strip().isdigit() or int(value) <= 0:
+        raise argparse.ArgumentTypeError(f"需要正整数：{value}")
+    return int(value)
 
-    write_gate_report(report_path, chapter, chapter_path, char_count, results)
-    print_results(results)
-    print(f"[PASS] 已写入门禁报告：{report_path}")
 
-    _, warned, failed = results_summary(results)
-    if failed > 0:
-        return 2
-    if warned > 0 and args.strict:
-        return 1
-    return 0
+def parse_size(value: str) -> int:
+    match = re.fullmatch(r"(\d+)\s*([KMG]?)i?B?", value.strip().upper())
+    if not match or int(match.group(1)) <= 0:
+        raise argparse.ArgumentTypeError(f"无法识别的大小：{value}（如 512K、64M、1G）")
+    return int(match.group(1)) * SIZE_UNITS[match.group(2)]
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -823,6 +961,15 @@ def build_parser() -> argparse.ArgumentParser:
         help="如果目标章节文件不存在，则用正文模板创建。",
     )
     context.add_argument("--out", help="上下文输出文件路径。")
+    context.add_argument(
+        "--layout",
+        choices=CONTEXT_LAYOUTS,
+        default="default",
+        help="上下文布局：default 按章节阅读顺序；stable 将风格卡/设定集前置、时间戳后置，伏笔只列本章增量，便于提示词缓存复用。",
+    )
+    context.add_argument(
+        "--force", action="store_true", help="即使输入指纹未变化也重新生成上下文。"
+    )
     context.set_defaults(func=cmd_context)
 
     storyboard = subparsers.add_parser(
@@ -832,6 +979,11 @@ def build_parser() -> argparse.ArgumentParser:
     storyboard.add_argument(
         "--chapter", type=int, help="目标章节号；默认自动推断下一章。"
     )
+    storyboard.add_argument(
+        "--range",
+        type=parse_chapter_range,
+        help="章节范围 A-B；在同一进程内批量生成整段分镜纲，不能与 --chapter/--out 同用。",
+    )
     storyboard.add_argument(
         "--target-chars",
         type=int,
@@ -841,7 +993,7 @@ def build_parser() -> argparse.ArgumentParser:
     storyboard.add_argument(
         "--create-context",
         action="store_true",
-        help="若本章上下文不存在，先自动生成上下文文件。",
+        help="本章上下文不存在时先生成；已存在时仅在输入指纹变化时刷新，配合 --force 强制重写。",
     )
     storyboard.add_argument(
         "--create-chapter",
@@ -850,10 +1002,30 @@ def build_parser() -> argparse.ArgumentParser:
     )
     storyboard.add_argument("--out", help="分镜纲输出文件路径。")
     storyboard.add_argument(
-        "--force", action="store_true", help="覆盖已存在的分镜纲文件。"
+        "--force",
+        action="store_true",
+        help="覆盖已存在的分镜纲文件（包括已手工填写的分镜纲）；与 --create-context 同用时也重写上下文。",
     )
     storyboard.set_defaults(func=cmd_storyboard)
 
+    roles = subparsers.add_parser("roles", help="查询 07-当前角色状态.md 的结构化角色索引。")
+    roles.add_argument("--project", default=".", help="项目目录路径。")
+    roles.add_argument("--role", help="角色名；给出时输出该角色状态、情报与最近行动。")
+    roles.add_argument("--chapter", type=int, help="章节号；给出时输出该章全部行动记录。")
+    roles.add_argument("--last", type=int, default=5, help="输出的最近行动条数，默认 5。")
+    roles.set_defaults(func=cmd_roles)
+
+    ledger = subparsers.add_parser("ledger", help="查看、撤回或重建 09-读者面信息.md 的历史台账。")
+    ledger.add_argument("--project", default=".", help="项目目录路径。")
+    ledger_action = ledger.add_mutually_exclusive_group()
+    ledger_action.add_argument("--retract", nargs="+", metavar="ID", help="从台账中撤回误记的 I/Q 条目。")
+    ledger_action.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="丢弃台账历史，只按当前 09-读者面信息.md 重新建立。",
+    )
+    ledger.set_defaults(func=cmd_ledger)
+
     gate = subparsers.add_parser("gate", help="对指定章节执行交付前门禁检查。")
     gate.add_argument("--project", default=".", help="项目目录路径。")
     gate.add_argument("--chapter", required=True, type=int, help="目标章节号。")
@@ -879,15 +1051,142 @@ def build_parser() -> argparse.ArgumentParser:
         default=2,
         help="分镜纲至少应包含的场景数，默认 2。",
     )
+    gate.add_argument(
+        "--repeat-window",
+        type=int,
+        default=NGRAM_WINDOW_CHAPTERS,
+        help=f"跨章重复短语检查回看的章节数，默认 {NGRAM_WINDOW_CHAPTERS}。",
+    )
+    gate.add_argument(
+        "--jobs",
+        type=parse_positive_int,
+        help="并行执行门禁检查的线程数，默认由线程池自动决定；1 表示串行。",
+    )
+    gate.add_argument(
+        "--format",
+        choices=["text", "ndjson"],
+        default="text",
+        help="终端输出格式：text 为逐行文本，ndjson 为每项检查一行 JSON 并以 summary 记录结尾。",
+    )
     gate.add_argument("--strict", action="store_true", help="将 WARN 视为非通过。")
     gate.set_defaults(func=cmd_gate)
 
+    report = subparsers.add_parser("report", help="生成全书仪表盘。")
+    report.add_argument("--project", default=".", help="项目目录路径。")
+    report_scope = report.add_mutually_exclusive_group()
+    report_scope.add_argument(
+        "--all",
+        action="store_true",
+        help="汇总全书所有章节并写入仪表盘文件（默认行为；逐章指标按章节哈希增量缓存）。",
+    )
+    report_scope.add_argument(
+        "--chapter",
+        type=int,
+        help="只在终端输出指定章节的仪表盘行，不写文件。",
+    )
+    report.add_argument("--out", help="仪表盘输出路径，默认 <项目目录>/10-全书仪表盘.md。")
+    report.set_defaults(func=cmd_report)
+
+    index = subparsers.add_parser("index", help="增量更新正文全文搜索索引（SQLite FTS5 trigram）。")
+    index.add_argument("--project", default=".", help="项目目录路径。")
+    index.set_defaults(func=cmd_index)
+
+    search = subparsers.add_parser("search", help="在正文中全文搜索，返回带章节与段落位置的片段。")
+    search.add_argument("query", help="搜索词；空格分隔的多个词需同时出现在同一段。")
+    search.add_argument("--project", default=".", help="项目目录路径。")
+    search.add_argument("--limit", type=int, default=20, help="最多返回的结果数，默认 20。")
+    search.set_defaults(func=cmd_search)
+
+    importer = subparsers.add_parser("import", help="把整本 TXT 按“第N章”标题流式拆分为 正文/第NNN章.md。")
+    importer.add_argument("source", help="待导入的 TXT 文件。")
+    importer.add_argument("--project", default=".", help="项目目录路径。")
+    importer.add_argument(
+        "--encoding",
+        default="auto",
+        help="TXT 编码；默认自动识别 UTF-8 / GB18030。",
+    )
+    importer.add_argument(
+        "--batch",
+        type=int,
+        default=IMPORT_BATCH_CHAPTERS,
+        help=f"每批落盘并更新索引的章节数，默认 {IMPORT_BATCH_CHAPTERS}。",
+    )
+    importer.add_argument("--force", action="store_true", help="覆盖正文目录中已有的章节文件。")
+    importer.set_defaults(func=cmd_import)
+
+    export = subparsers.add_parser("export", help="按章节号顺序流式导出全文。")
+    export.add_argument("--project", default=".", help="项目目录路径。")
+    export.add_argument("--out", help="导出文件路径，默认 <项目目录>/全文导出.<格式扩展名>。")
+    export.add_argument(
+        "--format",
+        choices=sorted(EXPORT_FORMATS),
+        default="txt",
+        help="导出格式：txt 为增量合并的纯文本，epub 为电子书，jsonl-dataset 为每章一行的训练数据集。",
+    )
+    export.add_argument(
+        "--split-by",
+        type=parse_split_spec,
+        help="TXT 分卷导出：volume 按子大纲“第N卷”标题；chars:N 每个文件不超过约 N 个非空白字符；chapters:N 每个文件 N 章。",
+    )
+    export.add_argument(
+        "--compress",
+        choices=sorted(EXPORT_COMPRESSORS),
+        help="TXT 流式压缩导出：xz（lzma）或 gz（gzip），不生成未压缩的中间文件。",
+    )
+    export.add_argument(
+        "--level",
+        type=int,
+        choices=range(0, 10),
+        default=EXPORT_COMPRESS_LEVEL,
+        metavar="0-9",
+        help=f"压缩级别，越大越慢、文件越小，默认 {EXPORT_COMPRESS_LEVEL}。",
+    )
+    export.add_argument(
+        "--shard-size",
+        type=parse_size,
+        default=parse_size(EXPORT_SHARD_SIZE),
+        help=f"jsonl-dataset 单个分片的大小上限（如 512K、64M），默认 {EXPORT_SHARD_SIZE}。",
+    )
+    export.add_argument("--title", help="EPUB 书名，默认取项目目录名。")
+    export.add_argument("--author", default="", help="EPUB 作者。")
+    export.add_argument(
+        "--jobs",
+        type=int,
+        help=f"章节转换的进程数；默认章节数不少于 {EXPORT_PARALLEL_MIN_CHAPTERS} 时使用全部 CPU，否则单进程。",
+    )
+    export.add_argument(
+        "--full",
+        action="store_true",
+        help="忽略导出清单，整本重新导出。",
+    )
+    export.set_defaults(func=cmd_export)
+    export_actions = export.add_subparsers(dest="export_action")
+    export_diff = export_actions.add_parser(
+        "diff", help="按章节哈希比较两次导出或两个项目快照，只对改动章节做逐行比对。"
+    )
+    export_diff.add_argument("old", help="旧快照：项目目录、导出文件（需有清单）或 .manifest.json。")
+    export_diff.add_argument("new", help="新快照，形式同上。")
+    export_diff.add_argument(
+        "--context",
+        type=int,
+        default=EXPORT_DIFF_CONTEXT,
+        help=f"差异上下文行数，默认 {EXPORT_DIFF_CONTEXT}。",
+    )
+    export_diff.add_argument(
+        "--max-lines",
+        type=int,
+        default=EXPORT_DIFF_MAX_LINES,
+        help=f"每章最多显示的差异行数，默认 {EXPORT_DIFF_MAX_LINES}。",
+    )
+    export_diff.add_argument("--stat", action="store_true", help="只列出改动章节与增删行数。")
+    export_diff.set_defaults(func=cmd_export_diff)
+
     return parser
 
 
-def main() -> int:
+def main(argv: list[str] | None = None) -> int:
     parser = build_parser()
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     return int(args.func(args))
 
 
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+from init_story_workspace import build_workspace  # noqa: E402
+
+
+def chapter_body(chapter: int, paragraphs: int = 4) -> str:
+    lines = [f"# 第{chapter:03d}章 第{chapter}夜", ""]
+    for index in range(1, paragraphs + 1):
+        lines += [f"第{chapter}章第{index}段，**林舟**推开门。“你来了。”她说，雨还没有停。", ""]
+    return "\n".join(lines)
+
+
+@pytest.fixture
+def project(tmp_path: Path) -> Path:
+    return build_workspace(tmp_path, "book", force=False)
+
+
+@pytest.fixture
+def write_chapter(project: Path) -> Callable[..., Path]:
+    def write(chapter: int, text: str | None = None, paragraphs: int = 4) -> Path:
+        path = project / "正文" / f"第{chapter:03d}章.md"
+        path.write_text(
+            chapter_body(chapter, paragraphs) if text is None else text,
+            encoding="utf-8",
+            newline="\n",
+        )
+        return path
+
+    return write
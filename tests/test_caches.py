@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import os
+
+from narrative import core
+from narrative.core import (
+    cached_parse,
+    collect_chapter_files,
+    engine_cache_dir,
+    open_cache_db,
+    open_metrics_db,
+    sync_chapter_metrics,
+)
+
+SCHEMA = "CREATE TABLE items (value TEXT);"
+
+
+def counting_parser(calls: list[str]):
+    def parse(text: str) -> dict[str, int]:
+        calls.append(text)
+        return {"lines": len(text.splitlines())}
+
+    return parse
+
+
+def test_cached_parse_reuses_memo_and_disk(project):
+    source = project / "01-总大纲.md"
+    calls: list[str] = []
+    first = cached_parse(project, "outline-lines", source, counting_parser(calls))
+    assert cached_parse(project, "outline-lines", source, counting_parser(calls)) == first
+    assert (engine_cache_dir(project) / "outline-lines.json").is_file()
+    core._PARSE_MEMO.clear()
+    assert cached_parse(project, "outline-lines", source, counting_parser(calls)) == first
+    assert len(calls) == 1
+
+
+def test_cached_parse_rebuilds_on_source_change(project):
+    source = project / "01-总大纲.md"
+    calls: list[str] = []
+    cached_parse(project, "outline-lines", source, counting_parser(calls))
+    source.write_text(source.read_text(encoding="utf-8") + "\n新增一行\n", encoding="utf-8")
+    result = cached_parse(project, "outline-lines", source, counting_parser(calls))
+    assert len(calls) == 2
+    assert result == {"lines": len(calls[-1].splitlines())}
+
+
+def test_cached_parse_rebuilds_on_schema_version_change(project, monkeypatch):
+    source = project / "01-总大纲.md"
+    calls: list[str] = []
+    cached_parse(project, "outline-lines", source, counting_parser(calls))
+    monkeypatch.setattr(core, "CACHE_SCHEMA_VERSION", core.CACHE_SCHEMA_VERSION + "-next")
+    core._PARSE_MEMO.clear()
+    cached_parse(project, "outline-lines", source, counting_parser(calls))
+    assert len(calls) == 2
+
+
+def test_open_cache_db_drops_tables_when_params_change(project):
+    conn = open_cache_db(project, "probe", "a", SCHEMA)
+    conn.execute("INSERT INTO items VALUES ('x')")
+    conn.commit()
+    conn.close()
+
+    conn = open_cache_db(project, "probe", "a", SCHEMA)
+    assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 1
+    conn.close()
+
+    conn = open_cache_db(project, "probe", "b", SCHEMA)
+    assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+    conn.close()
+
+
+def test_chapter_metrics_track_changed_and_removed_chapters(project, write_chapter):
+    for chapter in range(1, 4):
+        write_chapter(chapter)
+    chapter_files, _ = collect_chapter_files(project / "正文")
+    conn = open_metrics_db(project)
+    try:
+        assert sync_chapter_metrics(conn, chapter_files) == 3
+        assert sync_chapter_metrics(conn, chapter_files) == 0
+
+        # 只改 mtime 不改内容：不算变化，但刷新记录的 stat
+        path = chapter_files[2]
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert sync_chapter_metrics(conn, chapter_files) == 0
+        row = conn.execute("SELECT mtime_ns FROM chapters WHERE chapter = 2").fetchone()
+        assert row[0] == path.stat().st_mtime_ns
+
+        write_chapter(2, paragraphs=6)
+        chapter_files[3].unlink()
+        chapter_files.pop(3)
+        assert sync_chapter_metrics(conn, chapter_files) == 2
+        assert [row[0] for row in conn.execute("SELECT chapter FROM chapters ORDER BY chapter")] == [1, 2]
+    finally:
+        conn.close()
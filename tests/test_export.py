@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import lzma
+import os
+from pathlib import Path
+
+import narrative_engine
+from narrative.export import export_manifest_path
+
+
+def export(project: Path, out: Path, *extra: str) -> int:
+    return narrative_engine.main(["export", "--project", str(project), "--out", str(out), *extra])
+
+
+def assert_matches_full(project: Path, incremental: Path) -> None:
+    full = project / "full.txt"
+    assert export(project, incremental) == 0
+    assert export(project, full, "--full") == 0
+    assert incremental.read_bytes() == full.read_bytes()
+
+
+def test_incremental_txt_export_matches_full(project, write_chapter, capsys):
+    for chapter in range(1, 7):
+        write_chapter(chapter)
+    incremental = project / "incremental.txt"
+    assert_matches_full(project, incremental)
+
+    write_chapter(3, paragraphs=6)
+    assert_matches_full(project, incremental)
+    assert "自第003章起重写，写入 4 章" in capsys.readouterr().out
+
+    write_chapter(7)
+    assert_matches_full(project, incremental)
+    assert "尾部追加，写入 1 章" in capsys.readouterr().out
+
+    (project / "正文" / "第007章.md").unlink()
+    (project / "正文" / "第006章.md").unlink()
+    assert_matches_full(project, incremental)
+    assert "尾部截断，写入 0 章" in capsys.readouterr().out
+
+
+def test_touched_chapter_is_not_rewritten(project, write_chapter, capsys):
+    for chapter in range(1, 4):
+        write_chapter(chapter)
+    output = project / "out.txt"
+    assert export(project, output) == 0
+    path = project / "正文" / "第002章.md"
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    capsys.readouterr()
+    assert export(project, output) == 0
+    assert "未变化，写入 0 章" in capsys.readouterr().out
+    assert_matches_full(project, output)
+
+
+def test_resized_output_falls_back_to_full_export(project, write_chapter, capsys):
+    for chapter in range(1, 4):
+        write_chapter(chapter)
+    output = project / "out.txt"
+    assert export(project, output) == 0
+    with output.open("ab") as handle:
+        handle.write("手改".encode("utf-8"))
+    capsys.readouterr()
+    assert_matches_full(project, output)
+    assert "全量导出" in capsys.readouterr().out
+
+
+def test_compressed_and_split_exports_match_plain_text(project, write_chapter):
+    for chapter in range(1, 6):
+        write_chapter(chapter)
+    plain = project / "plain.txt"
+    assert export(project, plain, "--full") == 0
+    packed = project / "packed.txt.xz"
+    assert export(project, packed, "--compress", "xz") == 0
+    assert lzma.decompress(packed.read_bytes()) == plain.read_bytes()
+
+    split = project / "split.txt"
+    assert export(project, split, "--split-by", "chapters:2") == 0
+    parts = sorted(project.glob("split-*.txt"))
+    assert len(parts) == 3
+    assert export_manifest_path(split, "txt-split").is_file()
+    body = plain.read_text(encoding="utf-8")
+    for chapter in range(1, 6):
+        assert f"第{chapter}章第4段" in body
+        assert sum(f"第{chapter}章第4段" in part.read_text(encoding="utf-8") for part in parts) == 1
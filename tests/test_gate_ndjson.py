@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import json
+import re
+
+import narrative_engine
+
+CHECK_ID_RE = re.compile(r"^[a-z][a-z0-9_]*/[a-z][a-z0-9_]*$")
+CHECK_FIELDS = {"type", "id", "unit", "name", "status", "detail"}
+SUMMARY_FIELDS = {"type", "chapter", "char_count", "pass", "warn", "fail", "report", "exit_code"}
+
+
+def run_gate(project, capsys, *extra: str) -> tuple[int, list[dict]]:
+    code = narrative_engine.main(
+        ["gate", "--project", str(project), "--chapter", "1", "--format", "ndjson", *extra]
+    )
+    lines = capsys.readouterr().out.splitlines()
+    return code, [json.loads(line) for line in lines]
+
+
+def test_gate_ndjson_schema(project, write_chapter, capsys):
+    write_chapter(1)
+    code, records = run_gate(project, capsys)
+    checks, summary = records[:-1], records[-1]
+
+    assert checks
+    for record in checks:
+        assert set(record) == CHECK_FIELDS
+        assert record["type"] == "check"
+        assert record["status"] in {"PASS", "WARN", "FAIL"}
+        assert CHECK_ID_RE.match(record["id"]), record["id"]
+        assert record["id"].split("/")[0] == record["unit"]
+        assert isinstance(record["name"], str) and isinstance(record["detail"], str)
+    assert len({record["id"] for record in checks}) == len(checks)
+
+    assert set(summary) == SUMMARY_FIELDS
+    assert summary["type"] == "summary"
+    assert summary["chapter"] == 1
+    statuses = [record["status"] for record in checks]
+    assert (summary["pass"], summary["warn"], summary["fail"]) == (
+        statuses.count("PASS"),
+        statuses.count("WARN"),
+        statuses.count("FAIL"),
+    )
+    assert summary["exit_code"] == code == 2
+
+
+def test_gate_ndjson_ids_are_stable(project, write_chapter, capsys):
+    write_chapter(1)
+    _, first = run_gate(project, capsys)
+    _, second = run_gate(project, capsys, "--jobs", "1")
+    assert sorted(record["id"] for record in first[:-1]) == sorted(
+        record["id"] for record in second[:-1]
+    )
+    assert {record["id"] for record in first[:-1]} >= {
+        "workspace/dir_chapters",
+        "chapter/chapter_exists",
+        "length/length_range",
+        "storyboard/storyboard_present",
+    }
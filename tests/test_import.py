@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import pytest
+
+import narrative_engine
+from narrative.importer import IMPORT_HEADING_RE, detect_text_encoding, parse_chapter_numeral
+
+NOVEL = """书名：雨夜
+作者：佚名
+
+第一卷 守夜
+第一章 开端
+林舟推开门。
+“你来了。”她说。
+第二章：来客
+雨下得很大，街上没有人。
+第4章 跳号
+钟楼停摆。
+第十二章没有标题也没有分隔
+这一行是正文而不是标题，因为它远远超过了章节标题允许的最大长度，不能被当作第N章的标题来切分。
+"""
+
+
+@pytest.mark.parametrize(
+    ("token", "number"),
+    [
+        ("1", 1),
+        ("０１２", 12),
+        ("十", 10),
+        ("十二", 12),
+        ("二十", 20),
+        ("一百零五", 105),
+        ("两千三百", 2300),
+        ("一万零一", 10001),
+        ("一〇二", 102),
+    ],
+)
+def test_parse_chapter_numeral(token, number):
+    assert parse_chapter_numeral(token) == number
+
+
+@pytest.mark.parametrize(
+    ("line", "token", "title"),
+    [
+        ("第一章 开端", "一", "开端"),
+        ("## 第 12 章：风起", "12", "风起"),
+        ("第０３章、夜行", "０３", "夜行"),
+        ("第一百零五章", "一百零五", ""),
+    ],
+)
+def test_import_heading_re(line, token, title):
+    match = IMPORT_HEADING_RE.match(line)
+    assert match is not None
+    assert (match.group(1), match.group(2)) == (token, title)
+
+
+@pytest.mark.parametrize("line", ["第一卷 守夜", "第三节 余波", "他说第一章写得不好"])
+def test_import_heading_re_rejects_non_chapters(line):
+    assert IMPORT_HEADING_RE.match(line) is None
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "gb18030"])
+def test_detect_text_encoding(tmp_path, encoding):
+    source = tmp_path / "novel.txt"
+    source.write_bytes(NOVEL.encode(encoding))
+    detected = detect_text_encoding(source, "auto")
+    assert source.read_bytes().decode(detected) == NOVEL
+    assert detect_text_encoding(source, "big5") == "big5"
+
+
+def test_detect_text_encoding_ignores_truncated_tail(tmp_path, monkeypatch):
+    # 嗅探窗口截在多字节字符中间时仍应判为 UTF-8
+    monkeypatch.setattr("narrative.importer.IMPORT_SNIFF_BYTES", len("林舟".encode("utf-8")) + 1)
+    source = tmp_path / "novel.txt"
+    source.write_bytes("林舟推门".encode("utf-8"))
+    assert detect_text_encoding(source, "auto") == "utf-8-sig"
+
+
+def test_import_splits_chapters(project, tmp_path, capsys):
+    source = tmp_path / "novel.txt"
+    source.write_bytes(NOVEL.encode("gb18030"))
+    assert narrative_engine.main(["import", str(source), "--project", str(project)]) == 0
+    out = capsys.readouterr().out
+    assert "（gb18030）" in out
+    assert "第一卷 守夜（第001章起）" in out
+    assert "第003章（原第4章）" in out
+    chapters = sorted(path.name for path in (project / "正文").glob("第*章.md"))
+    assert chapters == ["第001章.md", "第002章.md", "第003章.md", "第004章.md"]
+    assert "林舟推开门。" in (project / "正文" / "第001章.md").read_text(encoding="utf-8")
+    assert "远远超过" in (project / "正文" / "第004章.md").read_text(encoding="utf-8")
+    preface = (project / "00-导入前置内容.md").read_text(encoding="utf-8")
+    assert "书名：雨夜" in preface
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import json
+from typing import Sequence
+
+import narrative_engine
+from narrative.core import (
+    engine_cache_dir,
+    load_reader_ledger,
+    read_reader_ledger,
+    reader_ledger_path,
+    sync_reader_ledger,
+)
+
+
+def reader_info(
+    anchor: int, plans: Sequence[str], results: Sequence[str] = (), suspense: Sequence[str] = ()
+) -> str:
+    lines = [
+        "# 读者面信息",
+        "",
+        "## 当前章节锚点",
+        f"- 当前章节：第{anchor:03d}章",
+        "",
+        "## 全局设置（跨章节常驻）",
+        "| 设置项 | 全局值 |",
+        "| --- | --- |",
+        "| 单章新增悬念上限（条） | 2 |",
+        "",
+        "## 写前规划（信息预算）",
+        "| 信息ID | 类型（新增/确认/误导/保留） | 信息内容 | 预计揭示位置 |",
+        "| --- | --- | --- | --- |",
+        *plans,
+        "",
+        "## 写后回填（实际投放）",
+        "| 信息ID | 实际呈现方式 | 读者可得结论 | 状态（已兑现/延后/废弃） |",
+        "| --- | --- | --- | --- |",
+        *results,
+        "",
+        "## 章节悬念与回收计划",
+        "| 悬念ID | 本章新增悬念 | 强度（低/中/高） | 计划回应章节 | 备注 |",
+        "| --- | --- | --- | --- | --- |",
+        *suspense,
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def write_reader_info(project, *args, **kwargs) -> None:
+    (project / "09-读者面信息.md").write_text(reader_info(*args, **kwargs), encoding="utf-8")
+
+
+def test_ledger_keeps_history_across_chapters(project):
+    write_reader_info(
+        project,
+        1,
+        ["| I001 | 新增 | 林舟是守夜人 | 第3章 |"],
+        suspense=["| Q001 | 门后是谁 | 中 | 第4章 |  |"],
+    )
+    sync_reader_ledger(project)
+
+    # 第二章覆盖整份文件：第一章的行已不在文件中，台账仍需保留
+    write_reader_info(
+        project,
+        2,
+        ["| I002 | 新增 | 雨夜无人出门 | 第2章 |"],
+        ["| I002 | 旁白 | 街上很安静 | 已兑现 |"],
+        ["| Q001 | 门后是谁 | 中 | 第4章 | 已回应 |"],
+    )
+    ledger = load_reader_ledger(project)
+    assert sorted(ledger.items) == ["I001", "I002", "Q001"]
+    assert ledger.anchor == 2
+    assert ledger.settings == {"单章新增悬念上限（条）": "2"}
+    assert ledger.items["I001"].first_chapter == 1
+    assert ledger.items["I001"].closed_chapter is None
+    assert (ledger.items["I002"].first_chapter, ledger.items["I002"].closed_chapter) == (2, 2)
+    assert (ledger.items["Q001"].first_chapter, ledger.items["Q001"].closed_chapter) == (1, 2)
+    assert ledger.items["Q001"].status == "已回应"
+
+
+def test_ledger_sync_is_idempotent(project):
+    write_reader_info(project, 1, ["| I001 | 新增 | 林舟是守夜人 | 第3章 |"])
+    first = sync_reader_ledger(project)
+    path = reader_ledger_path(project)
+    before = path.read_bytes()
+    assert sync_reader_ledger(project) == first
+    assert path.read_bytes() == before
+
+
+def test_ledger_retract_and_rebuild(project, capsys):
+    write_reader_info(project, 1, ["| I001 | 新增 | 林舟是守夜人 | 第3章 |"])
+    sync_reader_ledger(project)
+    write_reader_info(project, 2, ["| I002 | 新增 | 雨夜无人出门 | 第2章 |"])
+
+    assert narrative_engine.main(["ledger", "--project", str(project), "--retract", "i001", "I009"]) == 1
+    out = capsys.readouterr().out
+    assert "[PASS] 已从台账撤回：I001" in out
+    assert "[WARN] 台账中不存在：I009" in out
+    assert sorted(read_reader_ledger(project)["items"]) == ["I002"]
+
+    write_reader_info(project, 3, ["| I003 | 新增 | 钟楼停摆 | 第5章 |"])
+    sync_reader_ledger(project)
+    assert narrative_engine.main(["ledger", "--project", str(project), "--rebuild"]) == 0
+    assert sorted(read_reader_ledger(project)["items"]) == ["I003"]
+
+
+def test_legacy_ledger_is_migrated_out_of_cache(project):
+    legacy = engine_cache_dir(project) / "reader-ledger.json"
+    legacy.parent.mkdir(parents=True)
+    legacy.write_text(
+        json.dumps(
+            {
+                "schema": "3",
+                "anchor": 1,
+                "items": {
+                    "I001": {
+                        "kind": "info",
+                        "content": "林舟是守夜人",
+                        "status": "",
+                        "first_chapter": 1,
+                        "closed_chapter": None,
+                    }
+                },
+            },
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+    write_reader_info(project, 2, ["| I002 | 新增 | 雨夜无人出门 | 第2章 |"])
+
+    payload = sync_reader_ledger(project)
+    assert sorted(payload["items"]) == ["I001", "I002"]
+    assert payload["items"]["I001"]["first_chapter"] == 1
+    assert reader_ledger_path(project).is_file()
+    assert not legacy.exists()